@@ -11,6 +11,13 @@ def reload_module(full_refresh=False):
     else:
         from imp import reload
 
+    from . import tool_dock_diagnostics
+
+    with tool_dock_diagnostics.track("reload"):
+        _reload_modules(reload, full_refresh)
+
+
+def _reload_modules(reload, full_refresh):
     from .ui import ui_utils
     from .examples import tool_dock_examples
     from . import tool_dock_utils
@@ -21,8 +28,12 @@ def reload_module(full_refresh=False):
     # wipe all the scene callbacks before losing the connections via the reloads
     tool_dock_utils.dcc_interface.remove_all_callbacks()
 
+    # the reload forgets about these without stopping them, the new module starts its own
+    tool_dock_utils.stop_command_server()
+    tool_dock_utils.stop_stall_watchdog()
+
     # custom wonky reload things here
-    for window_index, tooldock_window in ui_utils.wh.windows.items():
+    for window_index, tooldock_window in list(ui_utils.wh.windows.items()):
         to_remove = False
         try:
             if not tooldock_window.isVisible():
@@ -0,0 +1 @@
+# content
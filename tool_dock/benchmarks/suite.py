@@ -0,0 +1,346 @@
+"""
+Benchmark suite for the parts of tool_dock that scale with the number of tools
+
+Runs on a synthetic corpus of class tools, script tools in nested folders and tools with many parameters,
+with the standalone dcc interface and throw-away settings.
+Results are written as JSON, and can be compared against a stored baseline.
+Command palette searches over a large synthetic corpus also have to stay under search_latency_limit.
+
+Run from the repository root:
+    QT_QPA_PLATFORM=offscreen python -m tool_dock.benchmarks.suite --output results.json
+    QT_QPA_PLATFORM=offscreen python -m tool_dock.benchmarks.suite --baseline baseline.json
+
+Record a new baseline (on the machine the comparisons will run on):
+    QT_QPA_PLATFORM=offscreen python -m tool_dock.benchmarks.suite --save-baseline baseline.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from tool_dock.ui.ui_utils import QtCore, QtWidgets
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+from tool_dock import tool_dock_configure as tdc
+from tool_dock import tool_dock_search
+from tool_dock import tool_dock_settings as tds
+from tool_dock import tool_dock_ui as tdui
+from tool_dock import tool_dock_utils as tdu
+
+# results are allowed to be this much slower than the baseline, unless the baseline defines its own threshold
+DEFAULT_THRESHOLD = 0.25
+
+# timings this short are mostly noise, so they're never counted as regressions
+MIN_COMPARED_SECONDS = 0.001
+
+# every command palette search over the search corpus has to be faster than this, regardless of the baseline
+search_latency_limit = 0.001
+
+search_words = ("scene mirror import export curve layout rig joint mesh skin weight anim key bake camera light "
+                "render shader texture uv normal vertex edge face select create delete rename copy paste align snap "
+                "pivot transform group parent constraint ik fk blend shape deform lattice cluster wrap proxy cache "
+                "alembic fbx usd playblast frame range time offset clean fix check validate").split()
+
+# multi-word, short, partial, typo and abbreviation queries
+search_queries = ["scene mirror import", "curve layout scene", "rig_joint_mesh", "jnt", "jont skn", "sc", "s",
+                  "scene", "mirror cam", "xyzzy", "bake anim key", "skin weight copy", "uv snap", "ik fk blend",
+                  "render", "alem cach", "export fbx scene", "ren ran", "pare pr", "irror", "group pivo",
+                  "fix create", "time parent pivot", "valida cache sna", "camera ble creat"]
+
+script_template = '''"""Benchmark script {index}"""
+import math
+
+result = math.sqrt({index})
+'''
+
+# __subclasses__ only holds weak references, the generated tool classes are kept alive here for the whole run
+corpus_classes = []
+
+
+def make_class_tools(tool_count):
+    tool_classes = []
+    for i in range(tool_count):
+        def run(self):
+            pass
+
+        tool_cls = type("BenchmarkClassTool{}".format(i), (tdu.ToolDockItemBase,), {
+            "TOOL_NAME": "Benchmark Class Tool {}".format(i),
+            "TOOL_TIP": "Class tool number {} of the benchmark corpus".format(i),
+            "run": run,
+        })
+        tool_classes.append(tool_cls)
+    return tool_classes
+
+
+def make_param_tools(tool_count, param_count):
+    """Tools with a run function that has param_count arguments, so they get an auto generated parameter grid"""
+    arg_names = ["arg_{}".format(i) for i in range(param_count)]
+    run_source = "def run(self, {}):\n    pass\n".format(", ".join("{}={}".format(arg_name, i * 0.5)
+                                                               for i, arg_name in enumerate(arg_names)))
+    run_namespace = {}
+    exec(run_source, run_namespace)
+
+    tool_classes = []
+    for i in range(tool_count):
+        tool_cls = type("BenchmarkParamTool{}".format(i), (tdu.ToolDockItemBase,), {
+            "TOOL_NAME": "Benchmark Param Tool {}".format(i),
+            "run": run_namespace["run"],
+        })
+        tool_classes.append(tool_cls)
+    return tool_classes
+
+
+def make_script_corpus(root_folder, script_count, folder_depth=3, scripts_per_folder=20):
+    """Write script_count scripts to nested folders, folder_depth levels deep"""
+    for i in range(script_count):
+        folder_index = i // scripts_per_folder
+        sub_folders = ["folder_{}".format((folder_index // (4 ** depth)) % 4) for depth in range(folder_depth)]
+        script_folder = os.path.join(root_folder, *sub_folders)
+        if not os.path.exists(script_folder):
+            os.makedirs(script_folder)
+
+        with open(os.path.join(script_folder, "benchmark_script_{}.py".format(i)), "w") as fp:
+            fp.write(script_template.format(index=i))
+
+
+def make_search_corpus(tool_count, seed=0):
+    """{tool_name: [label, tooltip]} with names and tooltips made of a small set of common words"""
+    rand = random.Random(seed)
+    tool_texts = {}
+    for i in range(tool_count):
+        name_words = [rand.choice(search_words) for _ in range(rand.randint(2, 4))]
+        name_words = [word.title() if j % 2 else word for j, word in enumerate(name_words)]
+        tool_name = "{}{}".format(rand.choice(["_", " ", ""]).join(name_words), i)
+        tool_tip = " ".join(rand.choice(search_words) for _ in range(rand.randint(4, 12)))
+        tool_texts[tool_name] = [tool_name, tool_tip]
+    return tool_texts
+
+
+def run_search_benchmarks(tool_count=10000, repeat=5):
+    """
+    :return: dict of results, and list of (query, seconds) of searches slower than search_latency_limit
+    """
+    tool_texts = make_search_corpus(tool_count)
+    search_index = tool_dock_search.ToolSearchIndex()
+    results = {"search_index_build": time_call(lambda: search_index.update(tool_texts))}
+
+    search_durations = []
+    for query in search_queries:
+        search_durations.append((time_call(lambda: search_index.search(query), repeat=repeat), query))
+    search_durations.sort()
+
+    results["search_median"] = search_durations[len(search_durations) // 2][0]
+    results["search_max"] = search_durations[-1][0]
+    slow_searches = [(query, duration) for duration, query in search_durations if duration > search_latency_limit]
+    return results, slow_searches
+
+
+def reset_discovery(script_folder):
+    tdu.lk.script_folders = script_folder
+    tdu.lk.dynamic_classes = {}
+    tdu.lk.dynamic_classes_generated = False
+    tdu.lk.registry.invalidate()
+
+
+def time_call(func, repeat=1):
+    """Median duration of func in seconds"""
+    durations = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start_time)
+    durations.sort()
+    return durations[len(durations) // 2]
+
+
+def run_benchmarks(class_tool_count=200, script_tool_count=500, param_tool_count=20, param_count=30,
+                   repeat=5, resize_count=50, run_count=200):
+    results = {}
+    temp_folder = tempfile.mkdtemp(prefix="tool_dock_benchmark_")
+    try:
+        # throw-away settings, so the benchmark doesn't touch (or depend on) the user settings
+        settings_path = os.path.join(temp_folder, "benchmark_settings.json")
+        tdu.lk.settings = tdu.ToolDockSettings(tds.JsonSettingsBackend(settings_path))
+        tdu.lk.settings.setValue(tdu.lk.compact_settings_on_startup, False)
+
+        script_folder = os.path.join(temp_folder, "scripts")
+        make_script_corpus(script_folder, script_tool_count)
+        corpus_classes.extend(make_class_tools(class_tool_count))
+        corpus_classes.extend(make_param_tools(param_tool_count, param_count))
+
+        def discover():
+            reset_discovery(script_folder)
+            tdu.get_tool_classes()
+
+        results["discovery"] = time_call(discover, repeat=repeat)
+
+        def get_tool_classes_cold():
+            tdu.lk.registry.invalidate()
+            tdu.get_tool_classes()
+
+        results["get_tool_classes_cold"] = time_call(get_tool_classes_cold, repeat=repeat)
+        results["get_tool_classes_warm"] = time_call(tdu.get_tool_classes, repeat=repeat * 20)
+
+        # every tool active in the window
+        tool_names = [tool_cls.TOOL_NAME for tool_cls in tdu.get_tool_classes()]
+        tdu.lk.settings.setValue("tooldock_0/tools", tool_names)
+        results["tool_count"] = len(tool_names)
+
+        windows = []
+
+        def build_window():
+            window = tdui.ToolDockWindow(window_index=0)
+            window.show()
+            app.processEvents()
+            windows.append(window)
+
+        results["window_construction"] = time_call(build_window, repeat=repeat)
+        window = windows[-1]  # earlier windows were replaced by the later ones
+
+        results["ui_save_settings"] = time_call(window.ui_save_settings, repeat=repeat)
+        results["ui_load_settings"] = time_call(window.ui_load_settings, repeat=repeat)
+
+        def open_configure_dialog():
+            dialog = tdc.ToolDockConfigurationDialog(window, active_tools=tool_names)
+            dialog.show()
+            app.processEvents()
+            dialog.close()
+            dialog.deleteLater()
+
+        results["configure_dialog_open"] = time_call(open_configure_dialog, repeat=repeat)
+
+        def resize_storm():
+            for i in range(resize_count):
+                window.resize(400 + (i % 10) * 40, 600 + (i % 7) * 30)
+                app.processEvents()
+
+        results["resize_storm"] = time_call(resize_storm, repeat=repeat)
+
+        tool_item = window.tool_dock_widgets[0].widget()  # type: tdu.ToolDockItemBase
+
+        def run_tool():
+            for _ in range(run_count):
+                tool_item._run()
+
+        results["run_latency"] = time_call(run_tool, repeat=repeat) / run_count
+
+        window.close()
+        window.deleteLater()
+        app.processEvents()
+    finally:
+        shutil.rmtree(temp_folder, ignore_errors=True)
+
+        # don't let this corpus show up in the next run
+        del corpus_classes[:]
+        gc.collect()
+        tdu.lk.registry.invalidate()
+
+    return results
+
+
+def compare_to_baseline(results, baseline):
+    """
+    :param results: dict of benchmark name: seconds
+    :param baseline: dict with 'results' and optionally 'thresholds' per benchmark name
+    :return: list of (benchmark name, result, baseline result, allowed threshold) that regressed
+    """
+    baseline_results = baseline.get("results", {})
+    thresholds = baseline.get("thresholds", {})
+
+    regressions = []
+    for name, baseline_value in baseline_results.items():
+        if name not in results or name == "tool_count":
+            continue
+
+        threshold = thresholds.get(name, DEFAULT_THRESHOLD)
+        result = results[name]
+        if result < MIN_COMPARED_SECONDS:
+            continue
+
+        if result > baseline_value * (1.0 + threshold):
+            regressions.append((name, result, baseline_value, threshold))
+    return regressions
+
+
+def get_run_info(args):
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "qt_platform": os.environ.get("QT_QPA_PLATFORM"),
+        "arguments": vars(args),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--class-tools", type=int, default=200, help="number of class tools")
+    parser.add_argument("--script-tools", type=int, default=500, help="number of script tools")
+    parser.add_argument("--param-tools", type=int, default=20, help="number of tools with parameters")
+    parser.add_argument("--params", type=int, default=30, help="number of parameters of those tools")
+    parser.add_argument("--search-tools", type=int, default=10000, help="number of tools in the search corpus")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per benchmark, the median is reported")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare results to this baseline JSON file")
+    parser.add_argument("--save-baseline", help="write results as a baseline to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmarks(class_tool_count=args.class_tools,
+                             script_tool_count=args.script_tools,
+                             param_tool_count=args.param_tools,
+                             param_count=args.params,
+                             repeat=args.repeat)
+    search_results, slow_searches = run_search_benchmarks(tool_count=args.search_tools, repeat=args.repeat)
+    results.update(search_results)
+
+    for name, value in results.items():
+        if name == "tool_count":
+            print("{:<28}{:>12}".format(name, value))
+        else:
+            print("{:<28}{:>10.2f}ms".format(name, value * 1000))
+
+    output_data = {"info": get_run_info(args), "results": results}
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(output_data, fp, indent=2)
+
+    if args.save_baseline:
+        baseline_thresholds = {}
+        if os.path.exists(args.save_baseline):
+            with open(args.save_baseline, "r") as fp:
+                baseline_thresholds = json.load(fp).get("thresholds", {})  # keep tuned thresholds
+        output_data["thresholds"] = baseline_thresholds
+        with open(args.save_baseline, "w") as fp:
+            json.dump(output_data, fp, indent=2)
+
+    for query, duration in slow_searches:
+        print("SLOW SEARCH '{}': {:.2f}ms, limit {:.2f}ms".format(query, duration * 1000, search_latency_limit * 1000))
+
+    if args.baseline:
+        with open(args.baseline, "r") as fp:
+            baseline = json.load(fp)
+
+        regressions = compare_to_baseline(results, baseline)
+        for name, result, baseline_value, threshold in regressions:
+            print("REGRESSION {}: {:.2f}ms, baseline {:.2f}ms (+{:.0%} allowed)".format(
+                name, result * 1000, baseline_value * 1000, threshold))
+
+        if regressions:
+            sys.exit(1)
+        print("No regressions compared to: {}".format(args.baseline))
+
+    if slow_searches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
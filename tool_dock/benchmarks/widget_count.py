@@ -0,0 +1,91 @@
+"""
+Compare widget count and memory of a dock full of tools,
+with the parameter grid built lazily versus eagerly (how it used to be)
+
+Run from the repository root:
+    QT_QPA_PLATFORM=offscreen python -m tool_dock.benchmarks.widget_count --tools 200
+"""
+import argparse
+import gc
+import tracemalloc
+
+from tool_dock.ui.ui_utils import QtCore, QtWidgets
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+from tool_dock import tool_dock_utils as tdu
+
+
+def make_tool_classes(tool_count, param_tool_ratio=0.1):
+    """Create plain button tools, with every n-th tool having auto generated parameters"""
+    param_tool_interval = max(int(1.0 / param_tool_ratio), 1) if param_tool_ratio else 0
+
+    tool_classes = []
+    for i in range(tool_count):
+        if param_tool_interval and i % param_tool_interval == 0:
+            def run(self, arg_1=True, arg_2=3.0):
+                pass
+        else:
+            def run(self):
+                pass
+
+        tool_cls = type("WidgetCountTool{}".format(i), (tdu._InternalToolDockItemBase,), {
+            "TOOL_NAME": "Widget Count Tool {}".format(i),
+            "run": run,
+        })
+        tool_classes.append(tool_cls)
+    return tool_classes
+
+
+def build_dock(tool_classes, eager_param_grid=False):
+    window = QtWidgets.QMainWindow()
+    for tool_cls in tool_classes:
+        dock = QtWidgets.QDockWidget(tool_cls.TOOL_NAME, window)
+        tool_widget = tool_cls()
+        if eager_param_grid:
+            tool_widget.param_grid  # accessing the grid builds it, like every tool used to
+        tool_widget.post_init()
+        dock.setWidget(tool_widget)
+        window.addDockWidget(QtCore.Qt.LeftDockWidgetArea, dock)
+    return window
+
+
+def measure(tool_classes, eager_param_grid=False):
+    gc.collect()
+    tracemalloc.start()
+    window = build_dock(tool_classes, eager_param_grid=eager_param_grid)
+    app.processEvents()
+    python_memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "qobject_count": len(window.findChildren(QtCore.QObject)),
+        "widget_count": len(window.findChildren(QtWidgets.QWidget)),
+        "python_memory_kb": python_memory / 1024.0,
+    }
+
+    window.deleteLater()
+    app.processEvents()
+    return result
+
+
+def main(tool_count=200, param_tool_ratio=0.1):
+    tool_classes = make_tool_classes(tool_count, param_tool_ratio=param_tool_ratio)
+
+    eager = measure(tool_classes, eager_param_grid=True)
+    lazy = measure(tool_classes, eager_param_grid=False)
+
+    print("{} tools ({:.0%} with parameters)".format(tool_count, param_tool_ratio))
+    print("{:<20}{:>12}{:>12}{:>12}".format("", "eager", "lazy", "saved"))
+    for key in ("qobject_count", "widget_count", "python_memory_kb"):
+        print("{:<20}{:>12.0f}{:>12.0f}{:>12.0f}".format(key, eager[key], lazy[key], eager[key] - lazy[key]))
+
+    return {"eager": eager, "lazy": lazy}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tools", type=int, default=200, help="number of tools in the dock")
+    parser.add_argument("--param-ratio", type=float, default=0.1, help="fraction of tools that have parameters")
+    args = parser.parse_args()
+    main(tool_count=args.tools, param_tool_ratio=args.param_ratio)
@@ -1,19 +1,44 @@
+import contextlib
+import logging
+
+log = logging.getLogger(__name__)
+
+
+def get_run_context_options(tool):
+    """What the run context should do for tool, from its class attributes"""
+    return {
+        "suspend_refresh": getattr(tool, "SUSPEND_REFRESH", False),
+        "undo_chunk": getattr(tool, "UNDO_CHUNK", False),
+        "disable_autokey": getattr(tool, "DISABLE_AUTOKEY", False),
+    }
+
+
 class BaseToolDockInterface(object):
     def __init__(self):
         self.callbacks = []
 
     def remove_all_callbacks(self):
-        for callback in self.callbacks:
+        # remove_callback takes the callback out of self.callbacks, so loop over a copy
+        for callback in list(self.callbacks):
             self.remove_callback(callback)
 
     " ---------------- Methods below needs DCC implementations ---------------------- "
 
+    @contextlib.contextmanager
+    def run_context(self, tool):
+        """
+        Entered around every tool execution, see get_run_context_options for what tools can opt in to
+
+        :param tool: instance of the tool that's being run
+        """
+        yield
+
     def open_script_in_editor(self, script_path):
-        print("open_script_in_editor is not implemented for this DCC")
+        log.warning("open_script_in_editor is not implemented for this DCC")
 
     def register_scene_change_callback(self, func):
-        print("register_scene_change_callback is not implemented for this DCC")
+        log.warning("register_scene_change_callback is not implemented for this DCC")
         return []  # return a list of callbacks that can be removed later
 
     def remove_callback(self, callback):
-        print("register_scene_change_callback is not implemented for this DCC")
+        log.warning("remove_callback is not implemented for this DCC")
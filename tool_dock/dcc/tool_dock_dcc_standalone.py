@@ -1,9 +1,25 @@
+import contextlib
 import os
 
 from . import tool_dock_dcc_base as dcc_base
 
 
 class StandaloneToolDockInterface(dcc_base.BaseToolDockInterface):
+    def __init__(self):
+        super(StandaloneToolDockInterface, self).__init__()
+
+        # there's no scene to suspend or undo, so record what would have happened, for tests
+        self.run_context_log = []  # ("enter" or "exit", tool name, run context options)
+
+    @contextlib.contextmanager
+    def run_context(self, tool):
+        options = dcc_base.get_run_context_options(tool)
+        self.run_context_log.append(("enter", tool.TOOL_NAME, options))
+        try:
+            yield
+        finally:
+            self.run_context_log.append(("exit", tool.TOOL_NAME, options))
+
     def open_script_in_editor(self, script_path):
         # Here I'm assuming that this is running on Windows
         cmd_str = "notepad.exe {}".format(script_path)
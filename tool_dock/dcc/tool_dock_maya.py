@@ -1,12 +1,18 @@
+import contextlib
+import logging
 import os
 
 import maya.OpenMaya as om
 import pymel.core as pm
+from maya import cmds
 
 from . import tool_dock_dcc_base as dcc_base
 
+log = logging.getLogger(__name__)
+
 
 class MayaToolDockInterface(dcc_base.BaseToolDockInterface):
+    _refresh_suspended = False
 
     def open_script_in_editor(self, script_path):
         open_script(script_path)
@@ -18,12 +24,43 @@ class MayaToolDockInterface(dcc_base.BaseToolDockInterface):
         self.callbacks.extend(callbacks)
         return callbacks
 
+    @contextlib.contextmanager
+    def run_context(self, tool):
+        options = dcc_base.get_run_context_options(tool)
+
+        # tools running other tools shouldn't resume the refresh or close the chunk of the outer tool
+        suspend_refresh = options["suspend_refresh"] and not self._refresh_suspended
+        autokey_state = cmds.autoKeyframe(q=True, state=True) if options["disable_autokey"] else None
+
+        if suspend_refresh:
+            cmds.refresh(suspend=True)
+            self._refresh_suspended = True
+        if options["undo_chunk"]:
+            cmds.undoInfo(openChunk=True, chunkName=tool.TOOL_NAME)
+        if autokey_state:
+            cmds.autoKeyframe(state=False)
+
+        try:
+            yield
+        finally:
+            if autokey_state:
+                cmds.autoKeyframe(state=True)
+            if options["undo_chunk"]:
+                cmds.undoInfo(closeChunk=True)
+            if suspend_refresh:
+                cmds.refresh(suspend=False)
+                self._refresh_suspended = False
+                cmds.refresh()
+
     def remove_callback(self, callback):
         try:
             om.MMessage.removeCallback(callback)
-            self.callbacks.remove(callback)
         except Exception as e:
-            print(e)
+            log.warning(e)
+
+        # forget it even if maya failed to remove it, it's most likely already gone
+        if callback in self.callbacks:
+            self.callbacks.remove(callback)
 
 
 ###########################
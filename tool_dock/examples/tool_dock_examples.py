@@ -76,6 +76,17 @@ class MultiButtonExample(tdu.ToolDockItemBase):
         }
 
 
+class WarmImportsExample(tdu.ToolDockItemBase):
+    TOOL_NAME = "Warm Imports"
+
+    # modules imported in the background after startup, so the first click doesn't wait for them
+    WARM_IMPORTS = ["json"]
+
+    def run(self):
+        import json
+        print(json.dumps({"imported": "json"}))
+
+
 class OverrideWidgetExample(tdu.ToolDockItemBase):
     TOOL_NAME = "Custom Widget"
 
@@ -0,0 +1,55 @@
+"""
+Run context of the standalone dcc interface, which records instead of touching a scene
+"""
+import pytest
+
+from tool_dock.dcc import tool_dock_dcc_base as dcc_base
+from tool_dock.dcc import tool_dock_dcc_standalone as dcc_standalone
+
+
+class PlainTool(object):
+    TOOL_NAME = "PlainTool"
+
+
+class HeavyTool(object):
+    TOOL_NAME = "HeavyTool"
+    SUSPEND_REFRESH = True
+    UNDO_CHUNK = True
+    DISABLE_AUTOKEY = True
+
+
+def test_run_context_options_default_to_off():
+    assert dcc_base.get_run_context_options(PlainTool()) == {
+        "suspend_refresh": False,
+        "undo_chunk": False,
+        "disable_autokey": False,
+    }
+
+
+def test_run_context_records_enter_and_exit():
+    interface = dcc_standalone.StandaloneToolDockInterface()
+    tool = HeavyTool()
+
+    with interface.run_context(tool):
+        assert interface.run_context_log == [("enter", "HeavyTool", dcc_base.get_run_context_options(tool))]
+
+    options = {"suspend_refresh": True, "undo_chunk": True, "disable_autokey": True}
+    assert interface.run_context_log == [
+        ("enter", "HeavyTool", options),
+        ("exit", "HeavyTool", options),
+    ]
+
+
+def test_run_context_exits_when_the_tool_fails():
+    interface = dcc_standalone.StandaloneToolDockInterface()
+
+    with pytest.raises(ValueError):
+        with interface.run_context(PlainTool()):
+            raise ValueError("tool failed")
+
+    assert [entry[0] for entry in interface.run_context_log] == ["enter", "exit"]
+
+
+def test_base_run_context_does_nothing():
+    with dcc_base.BaseToolDockInterface().run_context(HeavyTool()):
+        pass
@@ -0,0 +1,106 @@
+"""
+Leak checks around window rebuilds, run with:
+    QT_QPA_PLATFORM=offscreen python -m pytest tool_dock/tests
+"""
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+pytest.importorskip("PySide2")
+
+from tool_dock.ui.ui_utils import QtWidgets
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+from tool_dock import tool_dock_diagnostics as diagnostics
+from tool_dock import tool_dock_settings as tds
+from tool_dock import tool_dock_ui as tdui
+from tool_dock import tool_dock_utils as tdu
+
+
+def make_user_tool_classes(tool_count):
+    """Tools that look like they were defined in a user module, the way most tools are"""
+    tool_classes = []
+    for i in range(tool_count):
+        if i % 2:
+            def run(self, arg_1=True, arg_2=3.0):
+                pass
+        else:
+            def run(self):
+                pass
+
+        tool_cls = type("DiagnosticsTool{}".format(i), (tdu.ToolDockItemBase,), {
+            "TOOL_NAME": "Diagnostics Tool {}".format(i),
+            "run": run,
+            "__module__": "user_tools.diagnostics_tools",
+        })
+        tool_classes.append(tool_cls)
+    return tool_classes
+
+
+@pytest.fixture
+def tool_classes(tmpdir):
+    previous_settings = tdu.lk.settings
+    previous_script_folders = tdu.lk.script_folders
+
+    # throw-away settings and an empty script folder, so nothing from the user setup is picked up
+    tdu.lk.settings = tdu.ToolDockSettings(tds.JsonSettingsBackend(str(tmpdir.join("settings.json"))))
+    tdu.lk.settings.setValue(tdu.lk.compact_settings_on_startup, False)
+    tdu.lk.script_folders = str(tmpdir.mkdir("scripts"))
+    tdu.lk.dynamic_classes = {}
+    tdu.lk.dynamic_classes_generated = False
+    tdu.lk.registry.invalidate()
+
+    # __subclasses__ only holds weak references, so keep the classes alive for the test
+    classes = make_user_tool_classes(6)
+    tdu.lk.settings.setValue("tooldock_0/tools", [tool_cls.TOOL_NAME for tool_cls in classes])
+    yield classes
+
+    del classes[:]
+    tdu.lk.settings = previous_settings
+    tdu.lk.script_folders = previous_script_folders
+    tdu.lk.dynamic_classes = {}
+    tdu.lk.dynamic_classes_generated = False
+    tdu.lk.registry.invalidate()
+
+
+def test_user_tool_instances_are_counted(tool_classes):
+    before = diagnostics.get_live_counts()
+    tool_items = [tool_cls() for tool_cls in tool_classes]
+
+    growth = diagnostics.get_growth(before, diagnostics.get_live_counts())
+    assert growth["tool_instances"] == len(tool_items)
+
+    for tool_item in tool_items:
+        tool_item.deleteLater()
+    del tool_items[:]
+    diagnostics.flush_deleted_objects()
+
+
+def test_no_leaks_after_rebuilds(tool_classes):
+    window = tdui.ToolDockWindow(window_index=0)
+    window.show()
+    app.processEvents()
+    try:
+        assert len(window.tool_dock_widgets) == len(tool_classes)
+        diagnostics.assert_no_leaks(window.ui_build_tool_widgets, cycles=100)
+    finally:
+        window.close()
+        window.deleteLater()
+        diagnostics.flush_deleted_objects()
+
+
+def test_assert_no_leaks_reports_growth():
+    tool_cls = make_user_tool_classes(1)[0]
+    kept_objects = []
+
+    def leaky_rebuild():
+        kept_objects.append(tool_cls())
+
+    with pytest.raises(AssertionError):
+        diagnostics.assert_no_leaks(leaky_rebuild, cycles=3)
+
+    for tool_item in kept_objects:
+        tool_item.deleteLater()
+    diagnostics.flush_deleted_objects()
@@ -0,0 +1,121 @@
+"""
+Command server and client talking over a local socket, without Qt
+"""
+import json
+import socket
+
+import pytest
+
+from tool_dock import tool_dock_ipc
+
+
+class RecordingTools(object):
+    """Stand-in for the registered tools, remembers every run"""
+
+    def __init__(self):
+        self.runs = []
+
+    def list_tools(self):
+        return [{"name": "AddTool"}, {"name": "FailingTool"}]
+
+    def run_tool(self, tool_name, parameters):
+        self.runs.append((tool_name, parameters))
+        if tool_name == "AddTool":
+            return parameters.get("a", 0) + parameters.get("b", 0)
+        if tool_name == "FailingTool":
+            raise RuntimeError("tool failed")
+        raise tool_dock_ipc.CommandError("Tool not found: {}".format(tool_name))
+
+
+@pytest.fixture
+def tools():
+    return RecordingTools()
+
+
+@pytest.fixture
+def server(tools, tmpdir):
+    command_handler = tool_dock_ipc.CommandHandler(tools.list_tools, tools.run_tool)
+    command_server = tool_dock_ipc.CommandServer(command_handler, port=0,
+                                                 token_path=str(tmpdir.join("command_token")))
+    command_server.start()
+    yield command_server
+    command_server.stop()
+
+
+@pytest.fixture
+def client(server):
+    with open(server.token_path, "r") as fp:
+        token = fp.read().strip()
+
+    command_client = tool_dock_ipc.CommandClient(port=server.server_address[1], timeout=5.0, token=token)
+    yield command_client
+    command_client.close()
+
+
+def test_ping(client):
+    assert client.ping() == "pong"
+
+
+def test_list_tools(client):
+    assert [tool_info["name"] for tool_info in client.list_tools()] == ["AddTool", "FailingTool"]
+
+
+def test_run_tool(client, tools):
+    assert client.run_tool("AddTool", a=1, b=2) == 3
+    assert client.run_tool("AddTool", a=3, b=4) == 7
+    assert tools.runs == [("AddTool", {"a": 1, "b": 2}), ("AddTool", {"a": 3, "b": 4})]
+
+
+def test_run_tool_errors(client):
+    with pytest.raises(tool_dock_ipc.CommandError, match="tool failed"):
+        client.run_tool("FailingTool")
+    with pytest.raises(tool_dock_ipc.CommandError, match="Tool not found"):
+        client.run_tool("MissingTool")
+
+    # the connection stays usable after a failing command
+    assert client.ping() == "pong"
+
+
+def test_batch(client, tools):
+    responses = client.batch([
+        {"command": "run_tool", "tool": "AddTool", "parameters": {"a": 1}},
+        {"command": "run_tool", "tool": "FailingTool"},
+        {"command": "ping"},
+    ])
+
+    assert [response["ok"] for response in responses] == [True, False, True]
+    assert responses[0]["result"] == 1
+    assert responses[2]["result"] == "pong"
+    assert [tool_name for tool_name, _ in tools.runs] == ["AddTool", "FailingTool"]
+
+
+def test_invalid_token_closes_connection(server, tools):
+    connection = socket.create_connection(server.server_address, timeout=5.0)
+    connection_file = connection.makefile("rwb")
+    try:
+        request = {"id": 1, "token": "not the token", "command": "run_tool", "tool": "AddTool"}
+        connection_file.write(json.dumps(request).encode("utf-8") + b"\n")
+        connection_file.flush()
+
+        response = json.loads(connection_file.readline().decode("utf-8"))
+        assert response == {"id": 1, "ok": False, "error": "Invalid token"}
+        assert connection_file.readline() == b""
+    finally:
+        connection_file.close()
+        connection.close()
+
+    assert tools.runs == []
+
+
+def test_token_file_is_removed_on_stop(tools, tmpdir):
+    token_path = tmpdir.join("command_token")
+    command_handler = tool_dock_ipc.CommandHandler(tools.list_tools, tools.run_tool)
+    command_server = tool_dock_ipc.CommandServer(command_handler, port=0, token_path=str(token_path))
+
+    command_server.start()
+    assert token_path.check()
+    assert command_server.is_running()
+
+    command_server.stop()
+    assert not token_path.check()
+    assert not command_server.is_running()
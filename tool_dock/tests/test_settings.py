@@ -0,0 +1,121 @@
+"""
+Buffered settings writes, run with:
+    QT_QPA_PLATFORM=offscreen python -m pytest tool_dock/tests
+"""
+import json
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+pytest.importorskip("PySide2")
+
+from tool_dock import tool_dock_settings as tds
+from tool_dock import tool_dock_utils as tdu
+from tool_dock.ui.ui_utils import QtWidgets
+
+
+class CountingBackend(tds.JsonSettingsBackend):
+    """Json backend that keeps track of what gets written to it"""
+
+    def __init__(self, file_path):
+        super(CountingBackend, self).__init__(file_path)
+        self.written_keys = []
+        self.sync_count = 0
+
+    def set_value(self, key, value):
+        self.written_keys.append(key)
+        super(CountingBackend, self).set_value(key, value)
+
+    def sync(self):
+        self.sync_count += 1
+        super(CountingBackend, self).sync()
+
+
+@pytest.fixture
+def app():
+    # with an application the writes are buffered until the event loop is idle
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+@pytest.fixture
+def settings_path(tmpdir):
+    return str(tmpdir.join("settings.json"))
+
+
+def read_settings_file(settings_path):
+    with open(settings_path, "r") as fp:
+        return json.load(fp)
+
+
+def test_writes_are_buffered_until_flush(app, settings_path):
+    backend = CountingBackend(settings_path)
+    settings = tdu.ToolDockSettings(backend)
+
+    settings.setValue("tooldock_0/spacer_count", 2)
+    settings.set_dict_value("tooldock_0/tool_splitters", "ToolA", {"sizes": [10, 20]})
+    settings.set_dict_value("tooldock_0/tool_splitters", "ToolB", {"sizes": [30, 40]})
+
+    assert settings.is_dirty()
+    assert backend.written_keys == []
+    assert not os.path.exists(settings_path)
+
+    # pending values are visible before they are written
+    assert settings.value("tooldock_0/spacer_count") == 2
+    assert sorted(settings.get_group("tooldock_0").keys()) == ["spacer_count", "tool_splitters"]
+
+    settings.flush()
+
+    assert not settings.is_dirty()
+    assert sorted(backend.written_keys) == ["tooldock_0/spacer_count", "tooldock_0/tool_splitters"]
+    assert backend.sync_count == 1
+    assert read_settings_file(settings_path)["tooldock_0/tool_splitters"] == {
+        "ToolA": {"sizes": [10, 20]},
+        "ToolB": {"sizes": [30, 40]},
+    }
+
+
+def test_unchanged_values_are_not_written(app, settings_path):
+    backend = CountingBackend(settings_path)
+    settings = tdu.ToolDockSettings(backend)
+    settings.setValue("tooldock_0/spacer_count", 2)
+    settings.set_dict_value("tooldock_0/param_grid", "ToolA", {"width": 100})
+    settings.flush()
+    del backend.written_keys[:]
+
+    settings.setValue("tooldock_0/spacer_count", 2)
+    settings.set_dict_value("tooldock_0/param_grid", "ToolA", {"width": 100})
+    settings.remove_dict_value("tooldock_0/param_grid", "MissingTool")
+
+    assert not settings.is_dirty()
+    settings.flush()
+    assert backend.written_keys == []
+    assert backend.sync_count == 1
+
+
+def test_remove_dict_value(app, settings_path):
+    settings = tdu.ToolDockSettings(tds.JsonSettingsBackend(settings_path))
+    settings.set_dict_value("tooldock_0/param_grid", "ToolA", {"width": 100})
+    settings.set_dict_value("tooldock_0/param_grid", "ToolB", {"width": 200})
+    settings.flush()
+
+    snapshot = settings.get_snapshot("tooldock_0/param_grid", default=dict())
+    settings.remove_dict_value("tooldock_0/param_grid", "ToolA")
+
+    # snapshots handed out earlier are not modified, new ones see the change
+    assert sorted(snapshot.keys()) == ["ToolA", "ToolB"]
+    assert list(settings.get_snapshot("tooldock_0/param_grid", default=dict()).keys()) == ["ToolB"]
+
+    settings.flush()
+    assert read_settings_file(settings_path)["tooldock_0/param_grid"] == {"ToolB": {"width": 200}}
+
+
+def test_flush_without_application(settings_path):
+    if QtWidgets.QApplication.instance() is not None:
+        pytest.skip("only without an application")
+
+    # nothing would ever process the flush timer, so values are written straight away
+    settings = tdu.ToolDockSettings(tds.JsonSettingsBackend(settings_path))
+    settings.setValue("tooldock_0/spacer_count", 3)
+    assert not settings.is_dirty()
+    assert read_settings_file(settings_path)["tooldock_0/spacer_count"] == 3
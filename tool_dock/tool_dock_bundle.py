@@ -0,0 +1,173 @@
+"""
+Zip bundles of scripts, so a script folder on a network drive can be loaded in one read
+
+A TOOL_DOCK_SCRIPT_FOLDERS entry can point at a .zip file instead of a folder.
+The bundle is read into memory once, its central directory is used to find the scripts,
+and scripts are run straight from the in-memory archive.
+
+Scripts in a bundle get paths like: D:/scripts.zip/animation/tool.py
+
+Build a bundle from a folder:
+    python -m tool_dock.tool_dock_bundle D:/scripts D:/scripts.zip
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import time
+import zipfile
+
+bundle_extension = ".zip"
+manifest_name = "tool_dock_manifest.json"
+manifest_version = 1
+
+# bundle path: ScriptBundle, shared by discovery, previews and execution
+_bundles = {}
+
+
+class ScriptBundle(object):
+    def __init__(self, bundle_path):
+        self.bundle_path = bundle_path.replace("\\", "/")
+
+        # one read of the whole file, everything after this happens in memory
+        with open(bundle_path, "rb") as fp:
+            self._data = fp.read()
+        self.mtime = os.path.getmtime(bundle_path)
+
+        self._zip_file = zipfile.ZipFile(io.BytesIO(self._data))
+        self._infos = {info.filename: info for info in self._zip_file.infolist()}
+        self._code = {}  # member name: compiled code
+
+    def get_member_names(self, extension=".py"):
+        return sorted([name for name in self._infos if name.endswith(extension)])
+
+    def get_script_paths(self):
+        return ["{}/{}".format(self.bundle_path, member_name) for member_name in self.get_member_names()]
+
+    def get_manifest(self):
+        if manifest_name not in self._infos:
+            return {}
+        return json.loads(self.read_bytes(manifest_name).decode("utf-8"))
+
+    def read_bytes(self, member_name):
+        return self._zip_file.read(member_name)
+
+    def read_text(self, member_name):
+        return self.read_bytes(member_name).decode("utf-8", errors="replace")
+
+    def get_size(self, member_name):
+        return self._infos[member_name].file_size
+
+    def get_code(self, member_name):
+        if member_name not in self._code:
+            script_path = "{}/{}".format(self.bundle_path, member_name)
+            self._code[member_name] = compile(self.read_bytes(member_name), script_path, "exec")
+        return self._code[member_name]
+
+
+def is_bundle_path(path):
+    return path.lower().endswith(bundle_extension) and os.path.isfile(path)
+
+
+def get_bundle(bundle_path):
+    """Shared bundle for path, read again if the file changed on disk"""
+    bundle = _bundles.get(bundle_path)
+    try:
+        mtime = os.path.getmtime(bundle_path)
+    except OSError:
+        return bundle  # drive is offline, keep using what was read before
+
+    if bundle is None or bundle.mtime != mtime:
+        bundle = ScriptBundle(bundle_path)
+        _bundles[bundle_path] = bundle
+    return bundle
+
+
+def split_bundle_path(script_path):
+    """
+    :return: bundle path and member name of a script inside a bundle, or None for regular script paths
+    """
+    script_path = script_path.replace("\\", "/")
+    split_index = script_path.lower().find(bundle_extension + "/")
+    if split_index == -1:
+        return None
+
+    bundle_path = script_path[:split_index + len(bundle_extension)]
+    if bundle_path not in _bundles and not is_bundle_path(bundle_path):
+        return None
+    return bundle_path, script_path[split_index + len(bundle_extension) + 1:]
+
+
+def read_script_bytes(script_path):
+    bundle_path, member_name = split_bundle_path(script_path)
+    return get_bundle(bundle_path).read_bytes(member_name)
+
+
+def get_script_mtime(script_path):
+    """Scripts in a bundle change when the bundle does"""
+    bundle_path, _ = split_bundle_path(script_path)
+    return get_bundle(bundle_path).mtime
+
+
+def run_script(script_path, init_globals=None, run_name="__main__"):
+    """Same as runpy.run_path, for a script inside a bundle"""
+    bundle_path, member_name = split_bundle_path(script_path)
+    code = get_bundle(bundle_path).get_code(member_name)
+
+    run_globals = dict(init_globals or {})
+    run_globals.update(__name__=run_name, __file__=script_path, __loader__=None, __package__=None)
+    exec(code, run_globals)
+    return run_globals
+
+
+def pack_folder(script_folder, bundle_path):
+    """
+    Write all scripts in script_folder to a bundle, along with a manifest of their sizes and hashes
+
+    :return: the manifest
+    """
+    manifest = {
+        "version": manifest_version,
+        "source_folder": script_folder.replace("\\", "/"),
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "files": {},
+    }
+
+    # write next to the target and swap it in at the end, so nobody reads a half written bundle
+    temp_bundle_path = "{}.tmp".format(bundle_path)
+    with zipfile.ZipFile(temp_bundle_path, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for folder, _, file_names in sorted(os.walk(script_folder)):
+            for file_name in sorted(file_names):
+                if not file_name.endswith(".py"):
+                    continue
+
+                file_path = os.path.join(folder, file_name)
+                member_name = os.path.relpath(file_path, script_folder).replace("\\", "/")
+                with open(file_path, "rb") as fp:
+                    file_data = fp.read()
+
+                zip_file.writestr(member_name, file_data)
+                manifest["files"][member_name] = {
+                    "size": len(file_data),
+                    "sha1": hashlib.sha1(file_data).hexdigest(),
+                }
+
+        zip_file.writestr(manifest_name, json.dumps(manifest, indent=2, sort_keys=True))
+
+    os.replace(temp_bundle_path, bundle_path)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("script_folder", help="folder with the scripts to pack")
+    parser.add_argument("bundle_path", help="zip file to write")
+    args = parser.parse_args()
+
+    manifest = pack_folder(args.script_folder, args.bundle_path)
+    print("Packed {} scripts from: {} into: {}".format(len(manifest["files"]), args.script_folder, args.bundle_path))
+
+
+if __name__ == '__main__':
+    main()
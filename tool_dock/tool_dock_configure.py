@@ -1,12 +1,21 @@
 # Standard
+import collections
+import logging
 import os
+import threading
+from xml.sax.saxutils import escape as html_escape
 
 # Tool
+from tool_dock import tool_dock_bundle
+from tool_dock import tool_dock_mirror
+from tool_dock import tool_dock_search
 from tool_dock import tool_dock_utils as tdu
 # UI
 from tool_dock.ui import ui_utils, parameter_widgets
 from tool_dock.ui.ui_utils import QtCore, QtWidgets, QtGui
 
+log = logging.getLogger(__name__)
+
 
 class ToolDockConfigurationDialog(QtWidgets.QDialog):
     """
@@ -17,7 +26,7 @@ class ToolDockConfigurationDialog(QtWidgets.QDialog):
     def __init__(self, parent=ui_utils.get_app_window(), active_tools=None, *args, **kwargs):
         super(ToolDockConfigurationDialog, self).__init__(parent=parent, *args, **kwargs)
         self.setWindowTitle("ToolDock Configuration")
-        self.setWindowIcon(ui_utils.create_qicon("configure"))
+        self.setWindowIcon(tdu.lk.registry.get_icon("configure"))
 
         self.settings = tdu.lk.settings
 
@@ -28,15 +37,33 @@ class ToolDockConfigurationDialog(QtWidgets.QDialog):
         self.ui = ToolDockConfigurationUI()
         self.setLayout(self.ui.main_layout)
 
+        self.tool_model = ToolListModel(active_tools=active_tools, seen_tools=self.seen_tools)
+        self.ui.tools_LV.setModel(self.tool_model)
+
+        # previews are loaded in the background, so browsing the list doesn't wait on file reads
+        self.preview_loader = ScriptPreviewLoader(parent=self)
+        self.preview_loader.preview_loaded.connect(self.ui.script_preview_TE.setText)
+
+        self.ui.folders_TW.set_tool_model(self.tool_model)
+
         # connect signals
-        self.ui.tools_LW.itemSelectionChanged.connect(self.preview_script)
-        self.ui.tools_LW.itemDoubleClicked.connect(ui_utils.toggle_list_widget_item_checked)
+        self.ui.tools_LV.selectionModel().selectionChanged.connect(self.preview_script)
+        self.ui.folders_TW.tool_selected.connect(self.preview_tool)
+        self.ui.tools_TAB.currentChanged.connect(self.ui.folders_TW.refresh_check_states)
+        self.ui.tools_LV.doubleClicked.connect(self.tool_model.toggle_checked)
+        self.ui.search_LE.textChanged.connect(self.update_search)
+        self.ui.fulltext_CHK.toggled.connect(self.update_search)
         self.ui.save_BTN.clicked.connect(self.save_actions)
         self.ui.add_script_BTN.clicked.connect(self.open_add_script_dialog)
 
         # fill up tool list
         self.rebuild_ui()
 
+        # bring the full text index up to date in the background
+        self._index_task_signals = _IndexTaskSignals(self)
+        self._index_task_signals.finished.connect(self.on_fulltext_index_updated)
+        start_index_task(list(self.tool_classes.values()), self._index_task_signals)
+
         # set to a nicer size
         self.resize(QtCore.QSize(700, 400))
 
@@ -58,63 +85,575 @@ class ToolDockConfigurationDialog(QtWidgets.QDialog):
         self.tool_classes = {cls.TOOL_NAME: cls for cls in tdu.get_tool_classes()}
         self.fill_tool_list()
 
-    def preview_script(self):
-        selected_items = self.ui.tools_LW.selectedItems()
-        if not selected_items:
-            return
-
-        # last selected script will be previewed
-        item = selected_items[-1]
-
-        tool_cls = self.tool_classes.get(item.data(QtCore.Qt.UserRole))  # type: tdu.ToolDockItemBase
+    def update_search(self):
+        search_text = self.ui.search_LE.text()
 
-        script_preview_text = tdu.get_preview_from_tool(tool_cls)
+        if not self.ui.fulltext_CHK.isChecked():
+            self.tool_model.set_visible_tool_names(None)
+            self.tool_model.set_filter(search_text)
+            return
 
-        self.ui.script_preview_TE.setText(script_preview_text)
+        if not search_text.strip():
+            self.tool_model.set_visible_tool_names(None)
+            return
 
-    def fill_tool_list(self):
-        """Populate ListWidget with items"""
-        self.ui.tools_LW.clear()
+        results = tdu.lk.fulltext_index.search(search_text)
+        self.tool_model.set_visible_tool_names([tool_name for tool_name, _ in results])
+        self.ui.script_preview_TE.setHtml(get_fulltext_results_html(results))
 
-        sorted_tool_names = sorted(self.tool_classes.keys())
+    def on_fulltext_index_updated(self):
+        if self.ui.fulltext_CHK.isChecked():
+            self.update_search()
 
-        new_tool_color = QtGui.QColor()
-        new_tool_color.setRgb(40, 120, 60)
+    def preview_script(self):
+        selected_indexes = self.ui.tools_LV.selectionModel().selectedIndexes()
+        if not selected_indexes:
+            return
 
-        for tool_name in sorted_tool_names:
-            tool_cls = self.tool_classes.get(tool_name)  # type: tdu.ToolDockItemBase
-            lwi = QtWidgets.QListWidgetItem(self.ui.tools_LW)
-            lwi.setData(QtCore.Qt.UserRole, tool_name)  # store proper tool name
-            display_tool_name = tool_name
+        # last selected script will be previewed
+        index = selected_indexes[-1]
+        self.preview_tool(index.data(QtCore.Qt.UserRole))
 
-            # special display for new tools
-            if len(self.seen_tools) > 0 and tool_name not in self.seen_tools:
-                lwi.setBackgroundColor(new_tool_color)
-                display_tool_name = "{} - NEW".format(tool_name)
+    def preview_tool(self, tool_name):
+        tool_cls = self.tool_classes.get(tool_name)  # type: tdu.ToolDockItemBase
+        if tool_cls is None:
+            return
 
-            lwi.setText(display_tool_name)
-            lwi.setToolTip(tdu.get_tool_tip_from_tool(tool_cls))
-            lwi.setFlags(lwi.flags() | QtCore.Qt.ItemIsUserCheckable)
-            lwi.setCheckState(QtCore.Qt.Unchecked)
+        if not self.preview_loader.is_cached(tool_cls):
+            self.ui.script_preview_TE.setText("Loading preview...")
+        self.preview_loader.request(tool_cls)
 
-            if self.active_tools and tool_name in self.active_tools:
-                lwi.setCheckState(QtCore.Qt.Checked)
+    def fill_tool_list(self):
+        """Populate tool list model, keeps the current check states"""
+        self.tool_model.set_tools(self.tool_classes)
 
     def save_actions(self):
         self.config_saved.emit(self.get_checked_tool_names())
 
     def get_checked_tool_names(self):
-        checked_tool_names = []
-        for tool_lwi in ui_utils.get_list_widget_items(self.ui.tools_LW):  # type:QtWidgets.QListWidgetItem
-            if tool_lwi.checkState() == QtCore.Qt.Checked:
-                checked_tool_names.append(tool_lwi.data(QtCore.Qt.UserRole))
-        return checked_tool_names
+        return self.tool_model.get_checked_tool_names()
 
     def closeEvent(self, e):
         self.settings.set_tools_as_viewed()
         super(ToolDockConfigurationDialog, self).closeEvent(e)
 
 
+class _PreviewTaskSignals(QtCore.QObject):
+    finished = QtCore.Signal(int, str, str)  # request id, tool name, preview text
+
+
+class _PreviewTask(QtCore.QRunnable):
+    def __init__(self, request_id, tool_cls, signals):
+        super(_PreviewTask, self).__init__()
+        self.request_id = request_id
+        self.tool_cls = tool_cls
+        self.signals = signals
+
+    def run(self):
+        try:
+            preview_text = tdu.get_preview_from_tool(self.tool_cls)
+        except Exception as e:
+            preview_text = "Failed to load preview for: {}\n\n{}".format(self.tool_cls.TOOL_NAME, e)
+        self.signals.finished.emit(self.request_id, self.tool_cls.TOOL_NAME, preview_text)
+
+
+class _IndexTaskSignals(QtCore.QObject):
+    finished = QtCore.Signal()
+
+
+class _IndexTask(QtCore.QRunnable):
+    def __init__(self, tool_classes, signals):
+        super(_IndexTask, self).__init__()
+        self.setAutoDelete(False)  # kept alive by _index_task while it runs
+        self.tool_classes = tool_classes
+        self.pending_tool_classes = None
+        self.signals_list = [signals]
+
+    def run(self):
+        global _index_task
+
+        while True:
+            try:
+                tdu.update_fulltext_index(self.tool_classes)
+            except Exception as e:
+                log.warning("Failed to update full text index: {}".format(e))
+
+            with _index_task_lock:
+                # dialogs opened while indexing may have found other tools, index those before finishing
+                if self.pending_tool_classes is not None:
+                    self.tool_classes, self.pending_tool_classes = self.pending_tool_classes, None
+                    continue
+                _index_task = None
+                signals_list, self.signals_list = self.signals_list, []
+            break
+
+        for signals in signals_list:
+            try:
+                signals.finished.emit()
+            except RuntimeError:
+                pass  # dialog was closed and deleted meanwhile
+
+
+_index_task_lock = threading.Lock()
+_index_task = None  # type: _IndexTask
+
+
+def start_index_task(tool_classes, signals):
+    """
+    Update the full text index in the background, only one update runs at a time
+
+    If an update is already running, it's reused and indexes tool_classes once it's done
+
+    :param tool_classes: tool classes to index
+    :param signals: finished is emitted once the index is up to date
+    :type signals: _IndexTaskSignals
+    """
+    global _index_task
+
+    with _index_task_lock:
+        if _index_task is not None:
+            _index_task.pending_tool_classes = tool_classes
+            _index_task.signals_list.append(signals)
+            return
+        _index_task = _IndexTask(tool_classes, signals)
+        index_task = _index_task
+
+    QtCore.QThreadPool.globalInstance().start(index_task)
+
+
+def get_fulltext_results_html(results):
+    """
+    :param results: results from FullTextIndex.search
+    :return: html with matching lines of each tool and the matches highlighted
+    """
+    if not results:
+        return "No matches"
+
+    html_lines = []
+    for tool_name, snippets in results:
+        html_lines.append("<b>{}</b>".format(html_escape(tool_name)))
+        for line_number, line, spans in snippets:
+            highlighted_line = ""
+            last_end = 0
+            for start, end in spans:
+                highlighted_line += html_escape(line[last_end:start])
+                highlighted_line += "<span style='background-color:#806020'>{}</span>".format(
+                    html_escape(line[start:end]))
+                last_end = end
+            highlighted_line += html_escape(line[last_end:])
+            html_lines.append("<code>{:>5}: {}</code>".format(line_number, highlighted_line))
+        html_lines.append("")
+
+    return "<br>".join(html_lines)
+
+
+class ScriptPreviewLoader(QtCore.QObject):
+    """
+    Loads tool previews on a background thread and keeps the most recent ones cached
+
+    Only the latest request is emitted, results of requests the selection has moved away from
+    are cached but not shown, and requests that haven't started yet are dropped.
+    """
+    preview_loaded = QtCore.Signal(str)
+    cache_size = 100
+
+    def __init__(self, *args, **kwargs):
+        super(ScriptPreviewLoader, self).__init__(*args, **kwargs)
+        self._cache = collections.OrderedDict()  # tool name: preview text, most recently used last
+        self._latest_request_id = 0
+        self._running_tasks = {}  # request id: task, keeps python reference until finished
+
+        self._thread_pool = QtCore.QThreadPool(self)
+        self._thread_pool.setMaxThreadCount(2)
+
+        self._task_signals = _PreviewTaskSignals(self)
+        self._task_signals.finished.connect(self._on_task_finished)
+
+    def is_cached(self, tool_cls):
+        return tool_cls.TOOL_NAME in self._cache
+
+    def request(self, tool_cls):
+        self._latest_request_id += 1
+
+        # selection moved on, no need to start anything that's still waiting
+        for request_id, task in list(self._running_tasks.items()):
+            if self._thread_pool.tryTake(task):
+                self._running_tasks.pop(request_id)
+
+        preview_text = self._cache.pop(tool_cls.TOOL_NAME, None)
+        if preview_text is not None:
+            self._cache[tool_cls.TOOL_NAME] = preview_text
+            self.preview_loaded.emit(preview_text)
+            return
+
+        task = _PreviewTask(self._latest_request_id, tool_cls, self._task_signals)
+        task.setAutoDelete(False)
+        self._running_tasks[self._latest_request_id] = task
+        self._thread_pool.start(task)
+
+    def _on_task_finished(self, request_id, tool_name, preview_text):
+        self._running_tasks.pop(request_id, None)
+
+        self._cache.pop(tool_name, None)
+        self._cache[tool_name] = preview_text
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+        if request_id == self._latest_request_id:
+            self.preview_loaded.emit(preview_text)
+
+
+class ToolListModel(QtCore.QAbstractListModel):
+    """
+    Checkable list of tool names
+
+    Tooltips and other role data are only generated when the view asks for them.
+    Filtering goes through an index of which substrings of up to ngram_length characters are in which tool names,
+    so only the tools that contain every trigram of a longer filter are checked.
+    """
+    ngram_length = 3
+
+    def __init__(self, active_tools=None, seen_tools=None, *args, **kwargs):
+        super(ToolListModel, self).__init__(*args, **kwargs)
+        self.checked_tools = set(active_tools or [])
+        self.seen_tools = set(seen_tools or [])
+
+        self._tool_classes = {}
+        self._script_tool_names = {}  # normalized script path: tool name, for tools made from scripts
+        self._tool_names = []  # sorted names of all tools
+        self._lower_tool_names = []
+        self._ngram_index = None  # substring: set of rows in self._tool_names, built on first filter
+
+        self._visible_rows = []  # rows of self._tool_names that pass the filter
+        self._filter_text = ""
+        self._visible_tool_names = None  # when set, only show these tools
+        self._tool_tips = {}
+
+        self._new_tool_color = QtGui.QColor()
+        self._new_tool_color.setRgb(40, 120, 60)
+
+    def set_tools(self, tool_classes):
+        """
+        :param tool_classes: {tool_name: tool_cls}
+        :type tool_classes: dict
+        """
+        self.beginResetModel()
+        self._tool_classes = tool_classes
+        self._script_tool_names = {}
+        for tool_name, tool_cls in tool_classes.items():
+            script_path = getattr(tool_cls, "SCRIPT_PATH", None)
+            if script_path:
+                self._script_tool_names[tool_dock_mirror.normalize_path(script_path)] = tool_name
+        self._tool_names = sorted(tool_classes.keys())
+        self._lower_tool_names = [tool_name.lower() for tool_name in self._tool_names]
+        self._tool_tips = {}
+        self._ngram_index = None
+
+        self._visible_rows = self._get_visible_rows()
+        self.endResetModel()
+
+    def _get_visible_rows(self):
+        if self._visible_tool_names is not None:
+            return [row for row, tool_name in enumerate(self._tool_names) if tool_name in self._visible_tool_names]
+        return self._filter_rows(self._filter_text)
+
+    def set_visible_tool_names(self, tool_names):
+        """Only show these tools, instead of filtering by name. None to go back to the name filter"""
+        if tool_names is None and self._visible_tool_names is None:
+            return
+
+        self.beginResetModel()
+        self._visible_tool_names = None if tool_names is None else set(tool_names)
+        self._visible_rows = self._get_visible_rows()
+        self.endResetModel()
+
+    def set_filter(self, filter_text):
+        filter_text = filter_text.lower().strip()
+        if filter_text == self._filter_text or self._visible_tool_names is not None:
+            return
+
+        self.beginResetModel()
+        self._filter_text = filter_text
+        self._visible_rows = self._filter_rows(filter_text)
+        self.endResetModel()
+
+    def _get_ngram_index(self):
+        if self._ngram_index is None:
+            self._ngram_index = {}
+            for row, lower_tool_name in enumerate(self._lower_tool_names):
+                for length in range(1, self.ngram_length + 1):
+                    for i in range(len(lower_tool_name) - length + 1):
+                        self._ngram_index.setdefault(lower_tool_name[i:i + length], set()).add(row)
+        return self._ngram_index
+
+    def _filter_rows(self, filter_text):
+        if not filter_text:
+            return list(range(len(self._tool_names)))
+
+        ngram_index = self._get_ngram_index()
+
+        # short filters are in the index as they are
+        if len(filter_text) <= self.ngram_length:
+            return sorted(ngram_index.get(filter_text, ()))
+
+        # rows that contain every trigram of the filter, smallest sets first
+        ngram_rows = [ngram_index.get(trigram) for trigram in tool_dock_search.get_trigrams(filter_text)]
+        if not all(ngram_rows):
+            return []
+        ngram_rows.sort(key=len)
+        matching_rows = set(ngram_rows[0])
+        for rows in ngram_rows[1:]:
+            matching_rows.intersection_update(rows)
+
+        return [row for row in sorted(matching_rows) if filter_text in self._lower_tool_names[row]]
+
+    def get_checked_tool_names(self):
+        return [tool_name for tool_name in self._tool_names if tool_name in self.checked_tools]
+
+    def set_tools_checked(self, tool_names, checked=True):
+        if checked:
+            self.checked_tools.update(tool_names)
+        else:
+            self.checked_tools.difference_update(tool_names)
+
+        if self._visible_rows:
+            self.dataChanged.emit(self.index(0), self.index(len(self._visible_rows) - 1))
+
+    def has_tool(self, tool_name):
+        return tool_name in self._tool_classes
+
+    def get_tool_class(self, tool_name):
+        return self._tool_classes.get(tool_name)
+
+    def get_script_tool_name(self, script_path):
+        """
+        Name of the tool made from this exact script, None if it isn't a tool
+
+        A script that shares its name with an earlier script isn't a tool, so this goes by the full path
+        """
+        return self._script_tool_names.get(tool_dock_mirror.normalize_path(script_path))
+
+    def get_folder_tool_names(self, folder_path):
+        """Tools made from scripts in folder and its subfolders"""
+        folder_prefix = tool_dock_mirror.normalize_path(folder_path) + "/"
+        return [tool_name for script_path, tool_name in self._script_tool_names.items()
+                if script_path.startswith(folder_prefix)]
+
+    def toggle_checked(self, index):
+        check_state = self.data(index, QtCore.Qt.CheckStateRole)
+        new_state = QtCore.Qt.Unchecked if check_state == QtCore.Qt.Checked else QtCore.Qt.Checked
+        self.setData(index, new_state, QtCore.Qt.CheckStateRole)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._visible_rows)
+
+    def flags(self, index):
+        return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsUserCheckable
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        tool_name = self._tool_names[self._visible_rows[index.row()]]
+        is_new = len(self.seen_tools) > 0 and tool_name not in self.seen_tools
+
+        if role == QtCore.Qt.DisplayRole:
+            # special display for new tools
+            return "{} - NEW".format(tool_name) if is_new else tool_name
+
+        if role == QtCore.Qt.UserRole:
+            return tool_name
+
+        if role == QtCore.Qt.CheckStateRole:
+            return QtCore.Qt.Checked if tool_name in self.checked_tools else QtCore.Qt.Unchecked
+
+        if role == QtCore.Qt.BackgroundRole:
+            return self._new_tool_color if is_new else None
+
+        if role == QtCore.Qt.ToolTipRole:
+            if tool_name not in self._tool_tips:
+                self._tool_tips[tool_name] = tdu.get_tool_tip_from_tool(self._tool_classes.get(tool_name))
+            return self._tool_tips[tool_name]
+
+        return None
+
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        if not index.isValid() or role != QtCore.Qt.CheckStateRole:
+            return False
+
+        tool_name = self._tool_names[self._visible_rows[index.row()]]
+        if value == QtCore.Qt.Checked:
+            self.checked_tools.add(tool_name)
+        else:
+            self.checked_tools.discard(tool_name)
+
+        self.dataChanged.emit(index, index)
+        return True
+
+
+class ScriptFolderTree(QtWidgets.QTreeWidget):
+    """
+    Script tools shown in the folder structure of the script folders
+
+    Tool discovery still walks the whole script folders to register the tools,
+    the tree only lists the contents of a folder and builds its items when it's expanded.
+    Whole folders can be activated as a group of tools. Check states are shared with the ToolListModel.
+    Offline script folders are listed from their local mirror.
+    """
+    tool_selected = QtCore.Signal(str)
+
+    k_path_role = QtCore.Qt.UserRole
+    k_tool_role = QtCore.Qt.UserRole + 1
+    k_populated_role = QtCore.Qt.UserRole + 2
+    k_root_role = QtCore.Qt.UserRole + 3
+
+    def __init__(self, *args, **kwargs):
+        super(ScriptFolderTree, self).__init__(*args, **kwargs)
+        self.setHeaderHidden(True)
+        self.setUniformRowHeights(True)
+        self.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
+
+        self.tool_model = None  # type: ToolListModel
+        self._tool_items = {}  # tool name: list of tree items, for the tools in folders that have been expanded
+        self._updating_check_states = False
+
+        self.itemExpanded.connect(self.populate_folder_item)
+        self.itemChanged.connect(self._on_item_changed)
+        self.currentItemChanged.connect(self._on_current_item_changed)
+        self.customContextMenuRequested.connect(self.open_context_menu)
+
+    def set_tool_model(self, tool_model):
+        self.tool_model = tool_model
+        self.clear()
+        self._tool_items = {}
+
+        for script_folder in tdu.get_script_folders():
+            if tool_dock_bundle.is_bundle_path(script_folder):
+                continue  # bundled tools are only listed in the flat list
+            self.addTopLevelItem(self._create_folder_item(script_folder, script_folder, label=script_folder))
+
+    def _create_folder_item(self, folder_path, root_folder, label=None):
+        folder_item = QtWidgets.QTreeWidgetItem([label or os.path.basename(folder_path)])
+        folder_item.setData(0, self.k_path_role, folder_path)
+        folder_item.setData(0, self.k_root_role, root_folder)
+        folder_item.setData(0, self.k_populated_role, False)
+        folder_item.setChildIndicatorPolicy(QtWidgets.QTreeWidgetItem.ShowIndicator)
+        return folder_item
+
+    def populate_folder_item(self, folder_item):
+        """Read one level of the folder, the first time it's expanded"""
+        if folder_item.data(0, self.k_populated_role) or folder_item.data(0, self.k_tool_role):
+            return
+        folder_item.setData(0, self.k_populated_role, True)
+
+        folder_path = folder_item.data(0, self.k_path_role)
+        root_folder = folder_item.data(0, self.k_root_role)
+        subfolder_paths, script_paths = self._list_folder(folder_path, root_folder)
+
+        self._updating_check_states = True
+        for subfolder_path in subfolder_paths:
+            folder_item.addChild(self._create_folder_item(subfolder_path, root_folder))
+
+        for script_path in script_paths:
+            tool_name = self.tool_model.get_script_tool_name(script_path)
+            if tool_name is None:
+                continue
+
+            tool_item = QtWidgets.QTreeWidgetItem([tool_name])
+            tool_item.setData(0, self.k_path_role, script_path)
+            tool_item.setData(0, self.k_tool_role, tool_name)
+            tool_item.setToolTip(0, tdu.get_tool_tip_from_tool(self.tool_model.get_tool_class(tool_name)))
+            tool_item.setFlags(tool_item.flags() | QtCore.Qt.ItemIsUserCheckable)
+            tool_item.setCheckState(0, self._get_check_state(tool_name))
+            folder_item.addChild(tool_item)
+            self._tool_items.setdefault(tool_name, []).append(tool_item)
+        self._updating_check_states = False
+
+        if not folder_item.childCount():
+            folder_item.setChildIndicatorPolicy(QtWidgets.QTreeWidgetItem.DontShowIndicator)
+
+    def _list_folder(self, folder_path, root_folder):
+        """
+        :return: sorted (subfolder paths, script paths) directly in the folder
+        """
+        try:
+            file_names = sorted(os.listdir(folder_path))
+        except OSError as e:
+            script_mirror = tdu.get_script_mirror(root_folder)
+            if script_mirror is None or not script_mirror.has_files():
+                log.warning("Failed to read folder: {} - {}".format(folder_path, e))
+                return [], []
+            return self._list_mirrored_folder(folder_path, script_mirror)
+
+        subfolder_paths = []
+        script_paths = []
+        for file_name in file_names:
+            file_path = os.path.join(folder_path, file_name)
+            if os.path.isdir(file_path):
+                subfolder_paths.append(file_path)
+            elif file_name.endswith(".py"):
+                script_paths.append(file_path)
+        return subfolder_paths, script_paths
+
+    @staticmethod
+    def _list_mirrored_folder(folder_path, script_mirror):
+        """Folder contents from the mirror manifest, for script folders that are offline"""
+        folder_prefix = tool_dock_mirror.normalize_path(folder_path) + "/"
+
+        subfolder_paths = set()
+        script_paths = []
+        for source_path in script_mirror.get_source_paths():
+            if not source_path.startswith(folder_prefix):
+                continue
+            child_path = source_path[len(folder_prefix):]
+            if "/" in child_path:
+                subfolder_paths.add(folder_prefix + child_path.split("/", 1)[0])
+            else:
+                script_paths.append(source_path)
+        return sorted(subfolder_paths), script_paths
+
+    def _get_check_state(self, tool_name):
+        return QtCore.Qt.Checked if tool_name in self.tool_model.checked_tools else QtCore.Qt.Unchecked
+
+    def refresh_check_states(self):
+        """Update check states of the expanded tools, after they've been changed elsewhere"""
+        self._updating_check_states = True
+        for tool_name, tool_items in self._tool_items.items():
+            check_state = self._get_check_state(tool_name)
+            for tool_item in tool_items:
+                tool_item.setCheckState(0, check_state)
+        self._updating_check_states = False
+
+    def _on_item_changed(self, item, column):
+        tool_name = item.data(0, self.k_tool_role)
+        if self._updating_check_states or not tool_name:
+            return
+        self.tool_model.set_tools_checked([tool_name], item.checkState(0) == QtCore.Qt.Checked)
+        self.refresh_check_states()
+
+    def _on_current_item_changed(self, current_item, previous_item):
+        if current_item is not None and current_item.data(0, self.k_tool_role):
+            self.tool_selected.emit(current_item.data(0, self.k_tool_role))
+
+    def set_folder_checked(self, folder_item, checked=True):
+        folder_tool_names = self.tool_model.get_folder_tool_names(folder_item.data(0, self.k_path_role))
+        self.tool_model.set_tools_checked(folder_tool_names, checked)
+        self.refresh_check_states()
+
+    def open_context_menu(self, pos):
+        item = self.itemAt(pos)
+        if item is None or item.data(0, self.k_tool_role):
+            return
+
+        action_list = [
+            {"Activate Folder": lambda: self.set_folder_checked(item, True)},
+            {"Deactivate Folder": lambda: self.set_folder_checked(item, False)},
+        ]
+        return ui_utils.build_menu_from_action_list(action_list)
+
+
 class ToolDockConfigurationUI(QtWidgets.QWidget):
     """
     Define which actions should be visible in the ToolDock
@@ -135,8 +674,25 @@ class ToolDockConfigurationUI(QtWidgets.QWidget):
         tools_widget = QtWidgets.QWidget(self)
         tools_widget.setLayout(tools_layout)
 
-        self.tools_LW = QtWidgets.QListWidget()
-        tools_layout.addWidget(self.tools_LW)
+        self.search_LE = QtWidgets.QLineEdit()
+        self.search_LE.setPlaceholderText("Search")
+        self.search_LE.setClearButtonEnabled(True)
+        self.fulltext_CHK = QtWidgets.QCheckBox("Full Text")
+        self.fulltext_CHK.setToolTip("Search the contents of the tool scripts")
+        search_layout = QtWidgets.QHBoxLayout()
+        search_layout.addWidget(self.search_LE)
+        search_layout.addWidget(self.fulltext_CHK)
+        tools_layout.addLayout(search_layout)
+
+        self.tools_LV = QtWidgets.QListView()
+        self.tools_LV.setUniformItemSizes(True)
+
+        self.folders_TW = ScriptFolderTree()
+
+        self.tools_TAB = QtWidgets.QTabWidget()
+        self.tools_TAB.addTab(self.tools_LV, "List")
+        self.tools_TAB.addTab(self.folders_TW, "Folders")
+        tools_layout.addWidget(self.tools_TAB)
 
         self.add_script_BTN = QtWidgets.QPushButton("Add Script")
         tools_layout.addWidget(self.add_script_BTN)
@@ -157,6 +713,73 @@ class ToolDockConfigurationUI(QtWidgets.QWidget):
         self.main_layout.addWidget(self.save_BTN)
 
 
+######################################################################################
+# Command Palette
+
+class CommandPaletteDialog(QtWidgets.QDialog):
+    """
+    Search all registered tools by name, label and tooltip, and run the chosen one
+
+    Meant to be kept and shown again, every time it's shown the search starts over.
+    """
+    tool_chosen = QtCore.Signal(str)
+    result_limit = 30
+
+    def __init__(self, parent=ui_utils.get_app_window(), *args, **kwargs):
+        super(CommandPaletteDialog, self).__init__(parent=parent, *args, **kwargs)
+        self.setWindowTitle("Run Tool")
+        self.setWindowFlags(QtCore.Qt.Popup)
+
+        self.search_index = tdu.get_tool_search_index()
+
+        main_layout = QtWidgets.QVBoxLayout()
+        main_layout.setContentsMargins(2, 2, 2, 2)
+        self.setLayout(main_layout)
+
+        self.search_LE = QtWidgets.QLineEdit()
+        self.search_LE.setPlaceholderText("Run tool...")
+        self.search_LE.installEventFilter(self)
+        main_layout.addWidget(self.search_LE)
+
+        self.results_LW = QtWidgets.QListWidget()
+        self.results_LW.setUniformItemSizes(True)
+        main_layout.addWidget(self.results_LW)
+
+        self.search_LE.textChanged.connect(self.update_results)
+        self.search_LE.returnPressed.connect(self.run_current)
+        self.results_LW.itemActivated.connect(self.run_current)
+
+        self.resize(QtCore.QSize(400, 300))
+
+    def update_results(self, query):
+        self.results_LW.clear()
+        self.results_LW.addItems(self.search_index.search(query, limit=self.result_limit))
+        self.results_LW.setCurrentRow(0)
+
+    def run_current(self):
+        item = self.results_LW.currentItem()
+        if item is None:
+            return
+        self.close()
+        self.tool_chosen.emit(item.text())
+
+    def eventFilter(self, obj, event):
+        # arrow keys in the search field move through the results
+        if obj is self.search_LE and event.type() == QtCore.QEvent.KeyPress:
+            if event.key() in (QtCore.Qt.Key_Up, QtCore.Qt.Key_Down):
+                row_offset = -1 if event.key() == QtCore.Qt.Key_Up else 1
+                new_row = self.results_LW.currentRow() + row_offset
+                self.results_LW.setCurrentRow(max(0, min(new_row, self.results_LW.count() - 1)))
+                return True
+        return super(CommandPaletteDialog, self).eventFilter(obj, event)
+
+    def showEvent(self, event):
+        super(CommandPaletteDialog, self).showEvent(event)
+        self.search_index = tdu.get_tool_search_index()  # only rebuilt when tools or labels changed
+        self.search_LE.clear()
+        self.search_LE.setFocus()
+
+
 ######################################################################################
 # Add User Script
 # THIS DIALOG IS CURRENTLY NOT USED. A FILE BROWSER WAS SUFFICIENT
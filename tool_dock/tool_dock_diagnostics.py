@@ -0,0 +1,161 @@
+"""
+Leak diagnostics, counts what tool_dock keeps alive around rebuilds and reloads
+
+Enable with the environment variable TOOL_DOCK_DIAGNOSTICS=1 (or enable_diagnostics()),
+the growth of each rebuild and reload is then printed and kept in history.
+
+Can be used from tests as well:
+    tool_dock_diagnostics.assert_no_leaks(window.ui_build_tool_widgets, cycles=100)
+"""
+import contextlib
+import gc
+import logging
+import os
+import sys
+
+from tool_dock.ui.ui_utils import QtCore
+
+try:
+    import shiboken2
+except ImportError:
+    shiboken2 = None
+
+log = logging.getLogger(__name__)
+
+env_diagnostics = "TOOL_DOCK_DIAGNOSTICS"
+diagnostics_enabled = os.environ.get(env_diagnostics, "") in ("1", "true", "True")
+
+# (label, growth) of every tracked rebuild or reload, most recent last
+history = []
+history_limit = 200
+
+
+def enable_diagnostics(enabled=True):
+    global diagnostics_enabled
+    diagnostics_enabled = enabled
+
+
+def _is_tool_dock_type(cls):
+    return cls.__module__.startswith("tool_dock")
+
+
+def _is_tool_instance(obj):
+    # compare by name, so instances of classes from before a module reload are counted too
+    return any(cls.__name__ == "_InternalToolDockItemBase" for cls in type(obj).__mro__)
+
+
+def _get_tool_dock_windows():
+    # looked up at call time, ui_utils is replaced on a full reload
+    wh = sys.modules["tool_dock.ui.ui_utils"].wh
+
+    windows = {}
+    for window in wh.windows.values():
+        windows[id(window)] = window
+    for class_windows in wh.live_windows.values():
+        windows.update(class_windows)
+
+    app = QtCore.QCoreApplication.instance()
+    if app is not None and hasattr(app, "topLevelWidgets"):
+        for widget in app.topLevelWidgets():
+            if _is_tool_dock_type(type(widget)):
+                windows[id(widget)] = widget
+
+    return list(windows.values())
+
+
+def get_live_counts():
+    """
+    :return: dict with the number of live tool_dock qt objects, python tool instances and dcc callbacks
+    """
+    gc.collect()
+
+    qobject_count = 0
+    for window in _get_tool_dock_windows():
+        try:
+            qobject_count += len(window.findChildren(QtCore.QObject)) + 1
+        except RuntimeError:  # underlying qt object has already been deleted
+            continue
+
+    tool_instances = 0
+    python_qobjects = 0
+    deleted_wrappers = 0
+    for obj in gc.get_objects():
+        if not isinstance(obj, QtCore.QObject):
+            continue
+
+        # tools usually come from user modules, so check those before the module of the type
+        is_tool_instance = _is_tool_instance(obj)
+        if not is_tool_instance and not _is_tool_dock_type(type(obj)):
+            continue
+
+        python_qobjects += 1
+        if is_tool_instance:
+            tool_instances += 1
+        if shiboken2 is not None and not shiboken2.isValid(obj):
+            deleted_wrappers += 1  # python object that outlived its qt object
+
+    tdu = sys.modules.get("tool_dock.tool_dock_utils")
+    dcc_callbacks = len(tdu.dcc_interface.callbacks) if tdu else 0
+
+    return {
+        "qobjects": qobject_count,
+        "python_qobjects": python_qobjects,
+        "deleted_wrappers": deleted_wrappers,
+        "tool_instances": tool_instances,
+        "dcc_callbacks": dcc_callbacks,
+    }
+
+
+def get_growth(before, after):
+    """Counts that changed between two get_live_counts results"""
+    return {key: after[key] - before.get(key, 0) for key in after if after[key] != before.get(key, 0)}
+
+
+def flush_deleted_objects():
+    """Delete objects that are waiting on deleteLater"""
+    app = QtCore.QCoreApplication.instance()
+    if app is None:
+        return
+    app.processEvents()
+    QtCore.QCoreApplication.sendPostedEvents(None, QtCore.QEvent.DeferredDelete)
+    gc.collect()
+
+
+@contextlib.contextmanager
+def track(label):
+    """Report growth of live objects and callbacks from the code in this context, if diagnostics are enabled"""
+    if not diagnostics_enabled:
+        yield
+        return
+
+    before = get_live_counts()
+    yield
+    flush_deleted_objects()
+    growth = get_growth(before, get_live_counts())
+
+    history.append((label, growth))
+    del history[:-history_limit]
+
+    if growth:
+        log.warning("tool_dock diagnostics - {}: {}".format(label, growth))
+
+
+def assert_no_leaks(func, cycles=100, tolerance=0):
+    """
+    Call func cycles times and raise AssertionError if anything grew by more than tolerance
+
+    func is called once before counting, so caches filled on first use aren't reported as leaks.
+    """
+    func()
+    flush_deleted_objects()
+    before = get_live_counts()
+
+    for _ in range(cycles):
+        func()
+        flush_deleted_objects()
+
+    growth = get_growth(before, get_live_counts())
+    leaks = {key: value for key, value in growth.items() if value > tolerance}
+    if leaks:
+        raise AssertionError("Growth after {} cycles of {}: {}".format(cycles, func, leaks))
+    return growth
@@ -0,0 +1,517 @@
+"""
+Local command server, so tools can be triggered from Stream Decks and external scripts
+
+Speaks line delimited JSON over a socket on localhost, one request per line and one response per line.
+
+Requests:
+    {"id": 1, "token": "...", "command": "ping"}
+    {"id": 2, "token": "...", "command": "list_tools"}
+    {"id": 3, "token": "...", "command": "run_tool", "tool": "ToolName", "parameters": {"value": 1}}
+    {"id": 4, "token": "...", "command": "batch", "commands": [{"command": "run_tool", "tool": "ToolName"}, ...]}
+
+Every request carries the token of the running server, which is written to a file only the user can read
+(see get_token_path). That keeps out anything that can reach the port but not the user's files, like web pages.
+The connection is closed on the first line that isn't a valid request.
+
+Responses:
+    {"id": 3, "ok": true, "result": ...}
+    {"id": 3, "ok": false, "error": "Tool not found: ToolName"}
+
+Commands run on the GUI thread, a batch is handed over in one go so it only waits for the GUI thread once.
+Only registered tools can be run, there is no way to evaluate code through the server.
+
+From a terminal:
+    python -m tool_dock.tool_dock_ipc list
+    python -m tool_dock.tool_dock_ipc run ToolName '{"value": 1}'
+"""
+import argparse
+import binascii
+import hmac
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver  # python 2
+
+log = logging.getLogger(__name__)
+
+env_command_port = "TOOL_DOCK_COMMAND_PORT"
+env_command_token_file = "TOOL_DOCK_COMMAND_TOKEN_FILE"
+default_host = "127.0.0.1"
+default_port = 50724
+
+# seconds a connection waits for the GUI thread before the command fails
+default_call_timeout = 60.0
+
+
+class CommandError(Exception):
+    pass
+
+
+def get_port(port=None):
+    """Port from the argument, the environment variable, or the default"""
+    if port:
+        return int(port)
+    return int(os.environ.get(env_command_port) or default_port)
+
+
+def get_token_path(port=None):
+    """File with the token of the server on port, in the home folder unless specified with the environment variable"""
+    env_token_path = os.environ.get(env_command_token_file)
+    if env_token_path:
+        return env_token_path
+    return os.path.join(os.path.expanduser("~"), ".tool_dock", "command_token_{}".format(get_port(port)))
+
+
+def write_token(token_path):
+    """Write a new random token that only the current user can read, and return it"""
+    token = binascii.hexlify(os.urandom(16)).decode("ascii")
+
+    token_folder = os.path.dirname(token_path)
+    if token_folder and not os.path.exists(token_folder):
+        os.makedirs(token_folder)
+
+    # start from a new file, so it's created with the restricted permissions
+    if os.path.exists(token_path):
+        os.remove(token_path)
+    token_fd = os.open(token_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(token_fd, "w") as fp:
+        fp.write(token)
+    return token
+
+
+def read_token(port=None):
+    token_path = get_token_path(port)
+    if not os.path.exists(token_path):
+        raise CommandError("No command server token found at: {}".format(token_path))
+
+    with open(token_path, "r") as fp:
+        return fp.read().strip()
+
+
+def _to_json_value(value):
+    """Tool results that can't be sent as JSON are sent as their repr"""
+    try:
+        json.dumps(value)
+    except (TypeError, ValueError):
+        return repr(value)
+    return value
+
+
+class InlineExecutor(object):
+    """Runs calls on the connection thread, for when there is no GUI event loop"""
+
+    def __init__(self):
+        self._lock = threading.Lock()  # still only one command at a time
+
+    def call(self, func):
+        with self._lock:
+            return func()
+
+
+class _PendingCall(object):
+    def __init__(self, func):
+        self.func = func
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+        self._started = False
+        self._cancelled = False
+        self._state_lock = threading.Lock()
+
+    def cancel(self):
+        """
+        Stop the call from running when it's picked up later
+
+        :return: False if it already started
+        """
+        with self._state_lock:
+            if self._started:
+                return False
+            self._cancelled = True
+            return True
+
+    def run(self):
+        with self._state_lock:
+            if self._cancelled:
+                return
+            self._started = True
+
+        try:
+            self.result = self.func()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done.set()
+
+
+def create_executor():
+    """Executor for the current session, inline when there is no QApplication at all"""
+    from tool_dock.ui.ui_utils import QtCore
+
+    if QtCore.QCoreApplication.instance() is None:
+        return InlineExecutor()
+    return create_gui_executor()
+
+
+def create_gui_executor():
+    """
+    Executor that queues calls onto the GUI thread and waits for them
+
+    Call from the GUI thread, Qt is only imported here so the server and client work without it.
+    While the event loop isn't running (eg. a script that hasn't called exec_ yet, or never will),
+    calls run on the connection thread instead, since nothing would pick them up.
+    """
+    from tool_dock.ui.ui_utils import QtCore
+
+    class GuiExecutor(QtCore.QObject):
+        # emitted from connection threads, the connection is queued because this object lives in the GUI thread
+        call_requested = QtCore.Signal(object)
+
+        def __init__(self, timeout=default_call_timeout, *args, **kwargs):
+            super(GuiExecutor, self).__init__(*args, **kwargs)
+            self.timeout = timeout
+            self.call_requested.connect(self._run_call, QtCore.Qt.QueuedConnection)
+            self._inline_executor = InlineExecutor()
+
+        def _run_call(self, pending_call):
+            pending_call.run()
+
+        @staticmethod
+        def is_event_loop_running():
+            app = QtCore.QCoreApplication.instance()
+            if app is None:
+                return False
+
+            gui_thread = app.thread()
+            if not hasattr(gui_thread, "loopLevel"):  # older bindings, assume the dcc is running it
+                return True
+            return gui_thread.loopLevel() > 0
+
+        def call(self, func):
+            if not self.is_event_loop_running():
+                return self._inline_executor.call(func)
+
+            pending_call = _PendingCall(func)
+            self.call_requested.emit(pending_call)
+            if not pending_call.done.wait(self.timeout):
+                if pending_call.cancel():
+                    raise CommandError("Timed out waiting for the GUI thread, the command was cancelled")
+                if not pending_call.done.is_set():
+                    raise CommandError("Timed out, the command is still running on the GUI thread")
+
+            if pending_call.error is not None:
+                raise pending_call.error
+            return pending_call.result
+
+    return GuiExecutor()
+
+
+class CommandHandler(object):
+    """
+    Turns requests into calls of list_tools and run_tool
+
+    :param list_tools: function returning a list of dicts describing the available tools
+    :param run_tool: function(tool_name, parameters) running a tool and returning its result
+    :param executor: where the calls are made, see create_executor
+    :param token: every request has to carry this token, see write_token
+    """
+
+    def __init__(self, list_tools, run_tool, executor=None, token=None):
+        self.list_tools = list_tools
+        self.run_tool = run_tool
+        self.executor = executor or InlineExecutor()
+        self.token = token
+
+    def handle_line(self, line):
+        """
+        :param line: one request, as JSON
+        :return: one response as JSON, and whether the connection should be closed
+        """
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise CommandError("Request must be a JSON object")
+        except ValueError as e:
+            return json.dumps({"id": None, "ok": False, "error": "Invalid JSON: {}".format(e)}), True
+        except CommandError as e:
+            return json.dumps({"id": None, "ok": False, "error": str(e)}), True
+
+        if not self.is_token_valid(request.get("token")):
+            return json.dumps({"id": request.get("id"), "ok": False, "error": "Invalid token"}), True
+
+        try:
+            commands = self._get_commands(request)
+            responses = self.executor.call(lambda: [self._run_command(command) for command in commands])
+        except Exception as e:
+            return json.dumps({"id": request.get("id"), "ok": False, "error": str(e)}), False
+
+        if request.get("command") == "batch":
+            response = {"ok": all(r["ok"] for r in responses), "result": responses}
+        else:
+            response = responses[0]
+        response["id"] = request.get("id")
+        return json.dumps(response), False
+
+    def is_token_valid(self, token):
+        if self.token is None:
+            return True
+        if not isinstance(token, type(self.token)):
+            return False
+        return hmac.compare_digest(token, self.token)
+
+    @staticmethod
+    def _get_commands(request):
+        """Validate the request, and return the commands to run"""
+        if request.get("command") != "batch":
+            return [request]
+
+        commands = request.get("commands")
+        if not isinstance(commands, list) or not all(isinstance(c, dict) for c in commands):
+            raise CommandError("'commands' must be a list of JSON objects")
+        if any(c.get("command") == "batch" for c in commands):
+            raise CommandError("Batches can't be nested")
+        return commands
+
+    def _run_command(self, command):
+        """Runs on the executor, failing commands don't stop the rest of a batch"""
+        command_name = command.get("command")
+        try:
+            if command_name == "ping":
+                result = "pong"
+            elif command_name == "list_tools":
+                result = self.list_tools()
+            elif command_name == "run_tool":
+                tool_name = command.get("tool")
+                if not tool_name:
+                    raise CommandError("'run_tool' needs a 'tool' name")
+                result = _to_json_value(self.run_tool(tool_name, command.get("parameters") or {}))
+            else:
+                raise CommandError("Unknown command: {}".format(command_name))
+        except Exception as e:
+            log.warning("Command failed: {} - {}".format(command_name, e))
+            return {"ok": False, "error": str(e)}
+        return {"ok": True, "result": result}
+
+
+class _ConnectionHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        # responses are small, don't wait to fill a packet
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        socketserver.StreamRequestHandler.setup(self)
+
+    def handle(self):
+        # a client can keep the connection open and send any number of requests
+        for line in iter(self.rfile.readline, b""):
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                line = line.decode("utf-8")
+            except UnicodeDecodeError:
+                return
+
+            response, close_connection = self.server.command_handler.handle_line(line)
+            self.wfile.write(response.encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+            # eg. the header of an http request from a web page, don't read on to its body
+            if close_connection:
+                return
+
+
+class _ThreadingServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        # on windows, keep other processes from binding the same port
+        if hasattr(socket, "SO_EXCLUSIVEADDRUSE"):
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+        socketserver.TCPServer.server_bind(self)
+
+
+class CommandServer(object):
+    """
+    :param command_handler: CommandHandler the requests are passed to
+    :param port: 0 picks a free port, see server_address after start()
+    :param token_path: where the token for this session is written, defaults to get_token_path(port)
+    """
+
+    def __init__(self, command_handler, host=default_host, port=None, token_path=None):
+        self.command_handler = command_handler
+        self.host = host
+        self.port = get_port(port) if port != 0 else 0
+        self.token_path = token_path
+
+        self._server = None
+        self._thread = None
+
+    @property
+    def server_address(self):
+        return self._server.server_address if self._server else None
+
+    def is_running(self):
+        return self._server is not None
+
+    def start(self):
+        if self._server is not None:
+            return
+
+        self._server = _ThreadingServer((self.host, self.port), _ConnectionHandler)
+        self._server.command_handler = self.command_handler
+
+        if self.token_path is None:
+            self.token_path = get_token_path(self.server_address[1])
+        try:
+            self.command_handler.token = write_token(self.token_path)
+        except (OSError, IOError):
+            self._server.server_close()
+            self._server = None
+            raise
+
+        self._thread = threading.Thread(target=self._server.serve_forever, name="tool_dock_command_server")
+        self._thread.daemon = True
+        self._thread.start()
+        log.info("Command server listening on: {}:{}".format(*self.server_address))
+
+    def stop(self):
+        if self._server is None:
+            return
+
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        self._thread = None
+
+        if os.path.exists(self.token_path):
+            os.remove(self.token_path)
+
+
+class CommandClient(object):
+    """
+    Keeps one connection open, so repeated commands don't pay for connecting each time
+
+        with CommandClient() as client:
+            client.run_tool("ToolName", value=1)
+    """
+
+    def __init__(self, host=default_host, port=None, timeout=default_call_timeout, token=None):
+        """
+        :param token: token of the server, read from get_token_path(port) when connecting if not given
+        """
+        self.host = host
+        self.port = get_port(port)
+        self.timeout = timeout
+        self.token = token
+
+        self._socket = None
+        self._file = None
+        self._request_id = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def connect(self):
+        if self._socket is not None:
+            return
+
+        if self.token is None:
+            self.token = read_token(self.port)
+        self._socket = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._socket.makefile("rwb")
+
+    def close(self):
+        if self._socket is None:
+            return
+
+        self._file.close()
+        self._socket.close()
+        self._socket = None
+        self._file = None
+
+    def send(self, request):
+        """
+        Send one request and wait for its response
+
+        :param request: dict with at least a "command"
+        :return: full response dict
+        """
+        self.connect()
+        self._request_id += 1
+        request = dict(request, id=self._request_id, token=self.token)
+
+        self._file.write(json.dumps(request).encode("utf-8") + b"\n")
+        self._file.flush()
+
+        line = self._file.readline()
+        if not line:
+            self.close()
+            raise CommandError("Connection closed by the server")
+        return json.loads(line.decode("utf-8"))
+
+    def call(self, command, **kwargs):
+        """
+        :return: result of the command
+        :raises CommandError: when the command failed
+        """
+        response = self.send(dict(kwargs, command=command))
+        if not response.get("ok"):
+            raise CommandError(response.get("error"))
+        return response.get("result")
+
+    def ping(self):
+        return self.call("ping")
+
+    def list_tools(self):
+        return self.call("list_tools")
+
+    def run_tool(self, tool_name, **parameters):
+        return self.call("run_tool", tool=tool_name, parameters=parameters)
+
+    def batch(self, commands):
+        """
+        :param commands: list of command dicts, eg. {"command": "run_tool", "tool": "ToolName"}
+        :return: list of response dicts, one per command
+        """
+        return self.send({"command": "batch", "commands": commands}).get("result")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=None, help="defaults to ${}".format(env_command_port))
+    sub_parsers = parser.add_subparsers(dest="action")
+    sub_parsers.add_parser("ping")
+    sub_parsers.add_parser("list")
+    run_parser = sub_parsers.add_parser("run")
+    run_parser.add_argument("tool", help="TOOL_NAME of the tool to run")
+    run_parser.add_argument("parameters", nargs="?", default="{}", help="JSON object of keyword arguments")
+    args = parser.parse_args()
+
+    with CommandClient(port=args.port) as client:
+        try:
+            if args.action == "list":
+                for tool_info in client.list_tools():
+                    print(tool_info["name"])
+            elif args.action == "run":
+                print(json.dumps(client.call("run_tool", tool=args.tool, parameters=json.loads(args.parameters))))
+            else:
+                print(client.ping())
+        except CommandError as e:
+            print("Error: {}".format(e))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
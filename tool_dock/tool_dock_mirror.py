@@ -0,0 +1,238 @@
+"""
+Local mirrors of script folders, so scripts on a network drive are run and previewed from a local copy
+
+Each mirror is synced on a background thread. Files are compared by content hash,
+so only changed files are copied, and files that weren't touched (same size and mtime) aren't read at all.
+When the network drive is unreachable the last mirrored version keeps working.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+env_mirror_folder = "TOOL_DOCK_MIRROR_FOLDER"
+manifest_name = "mirror_manifest.json"
+manifest_version = 1
+
+# files larger than this stay on the network drive
+max_file_size = 5 * 1024 * 1024
+
+# source folder: ScriptMirror
+_mirrors = {}
+
+
+def normalize_path(path):
+    return os.path.normpath(path).replace("\\", "/")
+
+
+class ScriptMirror(object):
+    def __init__(self, source_folder, mirror_folder):
+        self.source_folder = normalize_path(source_folder)
+        self.mirror_folder = mirror_folder
+        self.manifest_path = os.path.join(mirror_folder, manifest_name)
+        self.last_sync_time = None
+
+        self._sync_thread = None
+        self._sync_lock = threading.Lock()
+
+        # relative path: {"size", "mtime", "sha1"} of the source file that was copied
+        # replaced as a whole after each sync, so reading it from other threads is safe
+        self._files = self._read_manifest()
+
+    def _read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+
+        try:
+            with open(self.manifest_path, "r") as fp:
+                manifest = json.load(fp)
+        except ValueError as e:
+            log.warning("Failed to read mirror manifest: {} - {}".format(self.manifest_path, e))
+            return {}
+
+        if manifest.get("version") != manifest_version:
+            return {}
+        return manifest.get("files", {})
+
+    def _write_manifest(self, files):
+        manifest = {
+            "version": manifest_version,
+            "source_folder": self.source_folder,
+            "synced": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "files": files,
+        }
+        _write_file_atomic(self.manifest_path, json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+
+    def has_files(self):
+        return bool(self._files)
+
+    def is_source_reachable(self):
+        return os.path.isdir(self.source_folder)
+
+    def get_relative_path(self, script_path):
+        script_path = normalize_path(script_path)
+        if not script_path.startswith(self.source_folder + "/"):
+            return None
+        return script_path[len(self.source_folder) + 1:]
+
+    def get_local_path(self, script_path):
+        """Mirrored copy of script_path, or None if it hasn't been mirrored"""
+        relative_path = self.get_relative_path(script_path)
+        if relative_path is None or relative_path not in self._files:
+            return None
+        return os.path.join(self.mirror_folder, relative_path)
+
+    def get_source_paths(self, extension=".py"):
+        """Source paths of all mirrored files, for discovery while the source is unreachable"""
+        return ["{}/{}".format(self.source_folder, relative_path)
+                for relative_path in sorted(self._files) if relative_path.endswith(extension)]
+
+    def walk_source_folder(self):
+        """
+        Relative paths of all files in the source folder, can be passed on to sync so it doesn't walk it again
+
+        :raises OSError: when the folder, or any of its subfolders, can't be read
+        """
+        if not os.path.isdir(self.source_folder):
+            raise OSError("Folder not found: {}".format(self.source_folder))
+
+        # a folder that can't be read has to fail the sync, otherwise its files would be removed from the mirror
+        relative_paths = []
+        for folder, _, file_names in os.walk(self.source_folder, onerror=_raise_error):
+            relative_folder = os.path.relpath(folder, self.source_folder).replace("\\", "/")
+            for file_name in file_names:
+                if relative_folder == ".":
+                    relative_paths.append(file_name)
+                else:
+                    relative_paths.append("{}/{}".format(relative_folder, file_name))
+        return relative_paths
+
+    def start_sync(self, relative_paths=None):
+        """
+        Sync on a background thread, does nothing if a sync is already running
+
+        :param relative_paths: result of walk_source_folder, if the folder was just walked
+        """
+        if self._sync_thread is not None and self._sync_thread.is_alive():
+            return
+
+        self._sync_thread = threading.Thread(target=self.sync, args=(relative_paths,), name="tool_dock_mirror_sync")
+        self._sync_thread.daemon = True
+        self._sync_thread.start()
+
+    def sync(self, relative_paths=None):
+        """
+        Copy new and changed files from the source folder, and remove files that were deleted from it
+
+        :param relative_paths: result of walk_source_folder, the folder is walked again if not given
+        :return: number of copied and removed files, None if the source folder couldn't be read
+        """
+        with self._sync_lock:
+            try:
+                source_files = self._get_source_files(relative_paths)
+            except OSError as e:
+                log.warning("Script folder unreachable, using local mirror: {} - {}".format(self.source_folder, e))
+                return None
+
+            files = dict(self._files)
+            changed_count = 0
+
+            for relative_path, (size, mtime) in source_files.items():
+                known_file = files.get(relative_path)
+                if known_file and known_file["size"] == size and known_file["mtime"] == mtime:
+                    continue  # not touched since last sync
+
+                try:
+                    with open(os.path.join(self.source_folder, relative_path), "rb") as fp:
+                        file_data = fp.read()
+                except (OSError, IOError) as e:
+                    log.warning("Failed to mirror: {} - {}".format(relative_path, e))
+                    continue
+
+                sha1 = hashlib.sha1(file_data).hexdigest()
+                local_path = os.path.join(self.mirror_folder, relative_path)
+                if not known_file or known_file["sha1"] != sha1 or not os.path.exists(local_path):
+                    _write_file_atomic(local_path, file_data)
+                    changed_count += 1
+                files[relative_path] = {"size": size, "mtime": mtime, "sha1": sha1}
+
+            for relative_path in set(files).difference(source_files):
+                files.pop(relative_path)
+                local_path = os.path.join(self.mirror_folder, relative_path)
+                if os.path.exists(local_path):
+                    os.remove(local_path)
+                changed_count += 1
+
+            if changed_count or files != self._files:
+                self._write_manifest(files)
+            self._files = files
+            self.last_sync_time = time.time()
+            return changed_count
+
+    def _get_source_files(self, relative_paths=None):
+        """
+        :return: {relative path: (size, mtime)} of the files in the source folder
+        """
+        if relative_paths is None:
+            relative_paths = self.walk_source_folder()
+        elif not os.path.isdir(self.source_folder):
+            raise OSError("Folder not found: {}".format(self.source_folder))
+
+        source_files = {}
+        for relative_path in relative_paths:
+            file_path = os.path.join(self.source_folder, relative_path)
+            try:
+                file_stat = os.stat(file_path)
+            except OSError:
+                if os.path.isdir(self.source_folder) and not os.path.exists(file_path):
+                    continue  # deleted since the folder was walked
+                raise
+
+            if file_stat.st_size > max_file_size:
+                continue
+            source_files[relative_path] = (file_stat.st_size, file_stat.st_mtime)
+        return source_files
+
+
+def _raise_error(error):
+    raise error
+
+
+def _write_file_atomic(file_path, file_data):
+    folder = os.path.dirname(file_path)
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+
+    temp_path = "{}.tmp".format(file_path)
+    with open(temp_path, "wb") as fp:
+        fp.write(file_data)
+
+    os.replace(temp_path, file_path)
+
+
+def get_mirror_root(settings_path):
+    """Mirrors are stored next to the settings file, unless specified with the environment variable"""
+    return os.environ.get(env_mirror_folder) or os.path.join(os.path.dirname(settings_path), "tool_dock_mirror")
+
+
+def get_mirror(source_folder, mirror_root):
+    source_folder = normalize_path(source_folder)
+    if source_folder not in _mirrors:
+        # one mirror folder per source folder, readable name with a hash to keep them apart
+        folder_hash = hashlib.sha1(source_folder.lower().encode("utf-8")).hexdigest()[:10]
+        folder_name = "{}_{}".format(os.path.basename(source_folder) or "root", folder_hash)
+        _mirrors[source_folder] = ScriptMirror(source_folder, os.path.join(mirror_root, folder_name))
+    return _mirrors[source_folder]
+
+
+def get_local_path(script_path):
+    """Mirrored copy of script_path, or script_path itself if it isn't in any mirror"""
+    for mirror in _mirrors.values():
+        local_path = mirror.get_local_path(script_path)
+        if local_path is not None and os.path.exists(local_path):
+            return local_path
+    return script_path
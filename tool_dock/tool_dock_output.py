@@ -0,0 +1,382 @@
+"""
+Output of tools and of tool_dock itself, shown in an output panel instead of the script editor
+
+While a tool runs its stdout and stderr are captured into a ring buffer for that tool.
+Only output of the thread that runs the tool is captured, other threads keep writing to the original streams.
+tool_dock logs to the "tool_dock" logger, which writes to the same sink.
+"""
+import collections
+import contextlib
+import itertools
+import logging
+import sys
+import threading
+import traceback
+
+from tool_dock.ui.ui_utils import QtCore, QtWidgets, QtGui
+
+log = logging.getLogger("tool_dock")
+
+# channel for the output of tool_dock itself, tools use their TOOL_NAME
+internal_channel = "tool_dock"
+
+
+class OutputSink(object):
+    """Ring buffer of output lines per channel, shared by every output panel"""
+
+    def __init__(self, max_lines_per_channel=1000):
+        self.max_lines_per_channel = max_lines_per_channel
+        self.last_sequence = 0
+
+        self._channels = collections.OrderedDict()  # channel: deque of (sequence number, stream name, text)
+        self._sequence = itertools.count(1)
+        self._lock = threading.Lock()  # tools can print from other threads
+
+    def write_line(self, channel, text, stream_name="stdout"):
+        with self._lock:
+            lines = self._channels.get(channel)
+            if lines is None:
+                lines = collections.deque(maxlen=self.max_lines_per_channel)
+                self._channels[channel] = lines
+
+            self.last_sequence = next(self._sequence)
+            lines.append((self.last_sequence, stream_name, text))
+
+    def get_channels(self):
+        return list(self._channels.keys())
+
+    def get_lines_since(self, sequence, channel=None):
+        """
+        :param sequence: last_sequence from the previous call, 0 for everything
+        :param channel: only lines from this channel, all channels if None
+        :return: list of new (sequence number, channel, stream name, text) oldest first, and the new last sequence
+        """
+        with self._lock:
+            if sequence >= self.last_sequence:
+                return [], self.last_sequence
+
+            channels = [channel] if channel is not None else list(self._channels.keys())
+            new_lines = []
+            for line_channel in channels:
+                for line_sequence, stream_name, text in reversed(self._channels.get(line_channel, ())):
+                    if line_sequence <= sequence:
+                        break
+                    new_lines.append((line_sequence, line_channel, stream_name, text))
+
+            new_lines.sort()
+            return new_lines, self.last_sequence
+
+    def clear(self, channel=None):
+        with self._lock:
+            if channel is None:
+                self._channels.clear()
+            else:
+                self._channels.pop(channel, None)
+
+
+sink = OutputSink()
+
+
+class _CaptureStream(object):
+    """
+    Replacement for sys.stdout / sys.stderr that writes whole lines to the sink
+
+    sys.stdout is shared by the whole process, so writes from other threads
+    than the one that started the capture go to the original stream instead.
+    """
+    encoding = "utf-8"
+
+    def __init__(self, channel, stream_name, original_stream, passthrough=False):
+        self.channel = channel
+        self.stream_name = stream_name
+        self.original_stream = original_stream
+        self.passthrough = passthrough
+        self.thread = threading.current_thread()
+        self._buffer = ""
+
+    def write(self, text):
+        if threading.current_thread() is not self.thread:
+            self.original_stream.write(text)
+            return
+
+        if self.passthrough:
+            self.original_stream.write(text)
+
+        self._buffer += text
+        if "\n" not in self._buffer:
+            return
+
+        lines = self._buffer.split("\n")
+        self._buffer = lines.pop()
+        for line in lines:
+            sink.write_line(self.channel, line, self.stream_name)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        if self.passthrough or threading.current_thread() is not self.thread:
+            self.original_stream.flush()
+
+    def flush_buffer(self):
+        """Write the last unfinished line"""
+        if self._buffer:
+            sink.write_line(self.channel, self._buffer, self.stream_name)
+            self._buffer = ""
+
+    def isatty(self):
+        return False
+
+    def __getattr__(self, name):
+        # fileno, buffer, errors etc. come from the original stream, so tools can still hand it to subprocesses
+        if name == "original_stream":
+            raise AttributeError(name)
+        return getattr(self.original_stream, name)
+
+
+def get_original_stdout():
+    """sys.stdout as it was before any capture, which is the script editor in a DCC"""
+    stream = sys.stdout
+    while isinstance(stream, _CaptureStream):
+        stream = stream.original_stream
+    return stream
+
+
+@contextlib.contextmanager
+def capture(channel, passthrough=False):
+    """
+    Capture stdout and stderr of the current thread into the sink while in this context
+
+    :param channel: usually the TOOL_NAME of the tool that's running
+    :param passthrough: also write to the original streams
+    """
+    original_stdout, original_stderr = sys.stdout, sys.stderr
+    capture_stdout = _CaptureStream(channel, "stdout", original_stdout, passthrough=passthrough)
+    capture_stderr = _CaptureStream(channel, "stderr", original_stderr, passthrough=passthrough)
+    sys.stdout, sys.stderr = capture_stdout, capture_stderr
+    try:
+        yield
+    except Exception:
+        # the traceback would otherwise only show up in the script editor
+        capture_stderr.write(traceback.format_exc())
+        raise
+    finally:
+        capture_stdout.flush_buffer()
+        capture_stderr.flush_buffer()
+        sys.stdout, sys.stderr = original_stdout, original_stderr
+
+
+class _SinkLogHandler(logging.Handler):
+    is_tool_dock_handler = True
+
+    def emit(self, record):
+        try:
+            message = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+
+        for line in message.splitlines():
+            sink.write_line(internal_channel, line, record.levelname.lower())
+
+
+class _StdoutLogHandler(logging.Handler):
+    """Writes to sys.stdout as it was before tool output was captured, which is the script editor in a DCC"""
+    is_tool_dock_handler = True
+
+    def emit(self, record):
+        try:
+            get_original_stdout().write("{}\n".format(self.format(record)))
+        except Exception:
+            self.handleError(record)
+
+
+def get_log_level(level, default):
+    """
+    :param level: level name like "INFO", or level number
+    :return: level number, or default if level isn't a valid level
+    """
+    if isinstance(level, int) and not isinstance(level, bool):
+        return level
+
+    level_text = str(level).strip().upper()
+    if level_text.isdigit():
+        return int(level_text)
+
+    level_number = logging.getLevelName(level_text)
+    return level_number if isinstance(level_number, int) else default
+
+
+def setup_logging(level="INFO", stdout_level="WARNING"):
+    """
+    Invalid levels, eg. a typo in the settings file, fall back to INFO and WARNING
+
+    :param level: lowest level of tool_dock messages written to the output panel
+    :param stdout_level: lowest level of tool_dock messages that are also printed to stdout
+    """
+    level_number = get_log_level(level, logging.INFO)
+    stdout_level_number = get_log_level(stdout_level, logging.WARNING)
+
+    log.setLevel(logging.DEBUG)
+    log.propagate = False
+
+    # safe to call again after a reload, without doubling up on handlers
+    for handler in list(log.handlers):
+        if getattr(handler, "is_tool_dock_handler", False):
+            log.removeHandler(handler)
+
+    sink_handler = _SinkLogHandler()
+    sink_handler.setLevel(level_number)
+    sink_handler.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+    log.addHandler(sink_handler)
+
+    stdout_handler = _StdoutLogHandler()
+    stdout_handler.setLevel(stdout_level_number)
+    stdout_handler.setFormatter(logging.Formatter("tool_dock %(levelname)s: %(message)s"))
+    log.addHandler(stdout_handler)
+
+    for level_value, default_level in ((level, "INFO"), (stdout_level, "WARNING")):
+        if get_log_level(level_value, None) is None:
+            log.warning("Invalid log level: {!r}, using {} instead".format(level_value, default_level))
+
+
+setup_logging()
+
+
+class OutputListModel(QtCore.QAbstractListModel):
+    """Output lines, only the visible rows are ever drawn"""
+    error_streams = ("stderr", "warning", "error", "critical")
+
+    def __init__(self, max_lines=5000, *args, **kwargs):
+        super(OutputListModel, self).__init__(*args, **kwargs)
+        self.max_lines = max_lines
+        self.show_channel = True
+        self._lines = []  # (channel, stream name, text)
+
+    def append_lines(self, lines):
+        if not lines:
+            return
+
+        lines = lines[-self.max_lines:]
+        overflow = len(self._lines) + len(lines) - self.max_lines
+        if overflow > 0:
+            self.beginRemoveRows(QtCore.QModelIndex(), 0, overflow - 1)
+            del self._lines[:overflow]
+            self.endRemoveRows()
+
+        first_row = len(self._lines)
+        self.beginInsertRows(QtCore.QModelIndex(), first_row, first_row + len(lines) - 1)
+        self._lines.extend(lines)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._lines = []
+        self.endResetModel()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._lines)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        channel, stream_name, text = self._lines[index.row()]
+        if role == QtCore.Qt.DisplayRole:
+            if self.show_channel:
+                return "[{}] {}".format(channel, text)
+            return text
+
+        if role == QtCore.Qt.ForegroundRole and stream_name in self.error_streams:
+            return QtGui.QBrush(QtGui.QColor(230, 110, 110))
+
+        return None
+
+
+class OutputPanel(QtWidgets.QWidget):
+    """Output of tools and tool_dock, new lines are added in batches at most every flush_interval ms"""
+    all_channels_label = "All"
+    flush_interval = 100
+
+    def __init__(self, *args, **kwargs):
+        super(OutputPanel, self).__init__(*args, **kwargs)
+        self._last_sequence = 0
+        self._channel = None
+
+        self.channel_CB = QtWidgets.QComboBox()
+        self.channel_CB.addItem(self.all_channels_label)
+        self.channel_CB.currentIndexChanged.connect(self.on_channel_changed)
+
+        self.clear_BTN = QtWidgets.QPushButton("Clear")
+        self.clear_BTN.clicked.connect(self.clear)
+
+        self.output_model = OutputListModel(parent=self)
+        self.output_LV = QtWidgets.QListView()
+        self.output_LV.setUniformItemSizes(True)
+        self.output_LV.setModel(self.output_model)
+        self.output_LV.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
+        self.output_LV.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+
+        header_layout = QtWidgets.QHBoxLayout()
+        header_layout.addWidget(self.channel_CB, stretch=1)
+        header_layout.addWidget(self.clear_BTN)
+
+        main_layout = QtWidgets.QVBoxLayout()
+        main_layout.setContentsMargins(2, 2, 2, 2)
+        main_layout.addLayout(header_layout)
+        main_layout.addWidget(self.output_LV)
+        self.setLayout(main_layout)
+
+        # only poll the sink while the panel is visible
+        self.flush_timer = QtCore.QTimer(self)
+        self.flush_timer.setInterval(self.flush_interval)
+        self.flush_timer.timeout.connect(self.flush_output)
+
+    def showEvent(self, event):
+        super(OutputPanel, self).showEvent(event)
+        self.flush_output()
+        self.flush_timer.start()
+
+    def hideEvent(self, event):
+        super(OutputPanel, self).hideEvent(event)
+        self.flush_timer.stop()
+
+    def flush_output(self):
+        new_lines, self._last_sequence = sink.get_lines_since(self._last_sequence, channel=self._channel)
+        if not new_lines:
+            return
+
+        self.update_channels()
+
+        scroll_bar = self.output_LV.verticalScrollBar()
+        at_bottom = scroll_bar.value() == scroll_bar.maximum()
+
+        self.output_model.append_lines([line[1:] for line in new_lines])
+
+        if at_bottom:
+            self.output_LV.scrollToBottom()
+
+    def update_channels(self):
+        channels = sink.get_channels()
+        if len(channels) == self.channel_CB.count() - 1:
+            return
+
+        self.channel_CB.blockSignals(True)
+        for channel in channels:
+            if self.channel_CB.findText(channel) == -1:
+                self.channel_CB.addItem(channel)
+        self.channel_CB.blockSignals(False)
+
+    def on_channel_changed(self, channel_index):
+        self._channel = None if channel_index == 0 else self.channel_CB.itemText(channel_index)
+        self.output_model.show_channel = self._channel is None
+        self.output_model.clear()
+        self._last_sequence = 0
+        self.flush_output()
+
+    def clear(self):
+        sink.clear(self._channel)
+        self.output_model.clear()
@@ -0,0 +1,113 @@
+"""
+Run low priority work when the event loop is idle, in small time slices
+
+Tasks are functions, or generators that yield between steps so long tasks can be split up.
+Lower priority values run first.
+"""
+import heapq
+import itertools
+import logging
+import time
+
+from tool_dock.ui.ui_utils import QtCore
+
+log = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 50
+PRIORITY_LOW = 100
+
+
+class IdleScheduler(object):
+    """
+    :param time_slice: milliseconds of work per idle timer tick
+    """
+
+    def __init__(self, time_slice=10):
+        self.time_slice = time_slice
+
+        self._queue = []  # (priority, order, name, task), ordered with heapq
+        self._order = itertools.count()  # keeps tasks with the same priority in the order they were added
+        self._running_steps = None  # (priority, name, generator) of the task being stepped through
+        self._cancelled = set()
+        self._timer = None
+
+    def add_task(self, task, priority=PRIORITY_NORMAL, name=None):
+        """
+        :param task: function to call, if it returns a generator that is stepped through in later slices
+        :param name: used for cancelling the task and in error messages
+        """
+        if name is None:
+            name = getattr(task, "__name__", repr(task))
+        self._cancelled.discard(name)
+
+        heapq.heappush(self._queue, (priority, next(self._order), name, task))
+        self._start_timer()
+
+    def cancel(self, name):
+        self._cancelled.add(name)
+
+    def is_empty(self):
+        return not self._queue and self._running_steps is None
+
+    def _start_timer(self):
+        if self._timer is None:
+            # a zero interval timer only fires when there are no other events to process
+            self._timer = QtCore.QTimer()
+            self._timer.setInterval(0)
+            self._timer.timeout.connect(self.run_slice)
+
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def run_slice(self):
+        """Run tasks until the time slice is used up"""
+        end_time = time.time() + self.time_slice / 1000.0
+        while time.time() < end_time and not self.is_empty():
+            self._run_step()
+
+        if self.is_empty() and self._timer is not None:
+            self._timer.stop()
+            self._cancelled.clear()
+
+    def _run_step(self):
+        # a higher priority task that was added in the meantime goes before the rest of a generator task
+        if self._running_steps is not None and self._queue and self._queue[0][0] < self._running_steps[0]:
+            priority, name, steps = self._running_steps
+            self._running_steps = None
+            heapq.heappush(self._queue, (priority, next(self._order), name, lambda: steps))
+
+        if self._running_steps is None:
+            priority, _, name, task = heapq.heappop(self._queue)
+            if name in self._cancelled:
+                return
+
+            try:
+                result = task()
+            except Exception:
+                log.exception("Idle task failed: {}".format(name))
+                return
+
+            if not hasattr(result, "__next__") and not hasattr(result, "next"):
+                return  # plain function, done
+            self._running_steps = (priority, name, result)
+
+        priority, name, steps = self._running_steps
+        if name in self._cancelled:
+            self._running_steps = None
+            return
+
+        try:
+            next(steps)
+        except StopIteration:
+            self._running_steps = None
+        except Exception:
+            log.exception("Idle task failed: {}".format(name))
+            self._running_steps = None
+
+
+scheduler = IdleScheduler()
+
+
+def add_idle_task(task, priority=PRIORITY_NORMAL, name=None):
+    scheduler.add_task(task, priority=priority, name=name)
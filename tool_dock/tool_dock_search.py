@@ -0,0 +1,582 @@
+"""
+Search indexes for finding tools by name, label and tooltip
+
+Kept free of Qt so they can be built and queried anywhere.
+"""
+import bisect
+import collections
+import heapq
+import json
+import logging
+import os
+import re
+import threading
+
+log = logging.getLogger(__name__)
+
+_word_split_regex = re.compile(r"[^0-9a-z]+")
+
+# how many characters of each word are indexed, longer query words are looked up by their start
+prefix_index_length = 4
+
+# typos are rarely in the first characters of a word, this many are used to find tools for a query with a typo
+typo_prefix_length = 2
+
+# max number of tools to score when a query has no exact trigram matches
+max_fuzzy_candidates = 100
+
+# candidate sets larger than this are scored in order of name length, until the best results are certain
+max_direct_candidates = 100
+
+# max number of tools scored for a large candidate set, keeps every search under a millisecond
+max_ordered_candidates = 100
+
+
+def get_trigrams(text):
+    return set([text[i:i + 3] for i in range(len(text) - 2)])
+
+
+def get_words(text):
+    return [word for word in _word_split_regex.split(text) if word]
+
+
+class _SearchEntry(object):
+    __slots__ = ("tool_name", "texts", "lower_name", "name_word_text", "other_text", "word_text", "words",
+                 "trigrams", "name_words", "name_trigrams")
+
+    def __init__(self, tool_name, texts):
+        self.tool_name = tool_name
+        self.texts = texts
+        self.lower_name = tool_name.lower()
+        name_words = get_words(self.lower_name)
+
+        lower_texts = [text.lower() for text in texts if text]
+        self.other_text = "\n".join(lower_texts)
+
+        self.name_words = set(name_words)
+        self.name_trigrams = set()
+        for word in name_words:
+            self.name_trigrams.update(get_trigrams(word))
+
+        self.words = set(name_words)
+        self.trigrams = set(self.name_trigrams)
+        for lower_text in lower_texts:
+            for word in get_words(lower_text):
+                self.words.add(word)
+                self.trigrams.update(get_trigrams(word))
+
+        # words joined with a leading space, so " " + query_word can be used to find the start of a word
+        self.name_word_text = " " + " ".join(name_words)
+        self.word_text = " " + " ".join(self.words)
+
+
+def _intersect(sets):
+    """Tools that are in all of the sets, smallest sets first so the result shrinks as quickly as possible"""
+    sets = sorted(sets, key=len)
+    result = set(sets[0])
+    for tool_set in sets[1:]:
+        if not result:
+            break
+        result.intersection_update(tool_set)
+    return result
+
+
+class ToolSearchIndex(object):
+    """
+    Ranked fuzzy search of tools
+
+    Candidates are tools with every query word at the start of one of their words, via an index of word prefixes,
+    and tools with the query words anywhere in their name, via a trigram index of the names.
+    Tooltips are only searched by trigram when that finds too few tools, and names that share
+    enough trigrams with the query are the fallback for typos. Only candidates from the indexes are scored,
+    so a query doesn't have to look at every tool.
+
+    Common words can make most tools a candidate, so large candidate sets are scored shortest name first,
+    through an index of names by length. Scoring stops as soon as nothing later can rank higher,
+    or after max_ordered_candidates, so a search never scores more than a couple hundred tools.
+    """
+
+    def __init__(self):
+        self._entries = {}  # tool_name: _SearchEntry
+        self._trigram_index = {}  # trigram: set of tool_names
+        self._prefix_index = {}  # word prefix: set of tool_names
+        self._name_trigram_index = {}  # same as above, but only for the words of the tool names
+        self._name_prefix_index = {}
+        self._length_index = {}  # name length: set of tool_names, the order results with the same score are in
+        self._sorted_lengths = None
+        self._sorted_names = None  # sorted (lower name, tool_name) for finding names by prefix
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, tool_name):
+        return tool_name in self._entries
+
+    def update(self, tool_texts):
+        """
+        Sync index with the current tools, only tools that are new, changed or removed get (re)indexed
+
+        :param tool_texts: {tool_name: [label, tooltip, ...]}
+        :type tool_texts: dict
+        :return: number of tools that were (re)indexed or removed
+        """
+        change_count = 0
+        for tool_name in [name for name in self._entries if name not in tool_texts]:
+            self.remove(tool_name)
+            change_count += 1
+
+        for tool_name, texts in tool_texts.items():
+            entry = self._entries.get(tool_name)
+            if entry is not None and entry.texts == texts:
+                continue
+            self.add(tool_name, texts)
+            change_count += 1
+
+        if change_count:
+            self._sort_names()
+        return change_count
+
+    def add(self, tool_name, texts):
+        if tool_name in self._entries:
+            self.remove(tool_name)
+
+        entry = _SearchEntry(tool_name, list(texts))
+        self._entries[tool_name] = entry
+        self._sorted_names = None
+
+        for trigram in entry.trigrams:
+            self._trigram_index.setdefault(trigram, set()).add(tool_name)
+        for trigram in entry.name_trigrams:
+            self._name_trigram_index.setdefault(trigram, set()).add(tool_name)
+
+        for prefix in self._get_prefixes(entry.words):
+            self._prefix_index.setdefault(prefix, set()).add(tool_name)
+        for prefix in self._get_prefixes(entry.name_words):
+            self._name_prefix_index.setdefault(prefix, set()).add(tool_name)
+
+        if len(tool_name) not in self._length_index:
+            self._sorted_lengths = None
+        self._length_index.setdefault(len(tool_name), set()).add(tool_name)
+
+    def remove(self, tool_name):
+        entry = self._entries.pop(tool_name, None)
+        if entry is None:
+            return
+        self._sorted_names = None
+
+        for trigram in entry.trigrams:
+            self._trigram_index.get(trigram, set()).discard(tool_name)
+        for trigram in entry.name_trigrams:
+            self._name_trigram_index.get(trigram, set()).discard(tool_name)
+
+        for prefix in self._get_prefixes(entry.words):
+            self._prefix_index.get(prefix, set()).discard(tool_name)
+        for prefix in self._get_prefixes(entry.name_words):
+            self._name_prefix_index.get(prefix, set()).discard(tool_name)
+
+        self._length_index.get(len(tool_name), set()).discard(tool_name)
+
+    @staticmethod
+    def _get_prefixes(words):
+        prefixes = set()
+        for word in words:
+            for i in range(1, min(len(word), prefix_index_length) + 1):
+                prefixes.add(word[:i])
+        return prefixes
+
+    def search(self, query, limit=20):
+        """
+        :param query: search text
+        :param limit: max number of results
+        :return: list of tool names, best match first
+        """
+        query = query.lower().strip()
+        if not query:
+            return []
+
+        # tool names starting with the query always rank highest, if there's enough of those we're done
+        name_matches = self._get_name_prefix_matches(query)
+        if len(name_matches) >= limit:
+            return self._rank(name_matches, query, limit)
+
+        query_words = get_words(query)
+        if not query_words:
+            return self._rank(name_matches, query, limit)
+
+        query_trigrams = set()
+        for query_word in query_words:
+            query_trigrams.update(get_trigrams(query_word))
+
+        # tools with every query word in their name, also in the middle of words
+        name_candidates = self._get_name_candidates(query_words)
+
+        # tools with every query word at the start of a word, in the name or the tooltip
+        candidates = _intersect([self._prefix_index.get(query_word[:prefix_index_length], ())
+                                 for query_word in query_words])
+        candidates.update(name_candidates)
+        candidates.update(name_matches)
+        fuzzy_patterns = None
+
+        # few results, so look for the query in the middle of words in the tooltips as well
+        if len(candidates) < limit and query_trigrams:
+            candidates.update(_intersect([self._trigram_index.get(trigram, ()) for trigram in query_trigrams]))
+
+            # nothing found, probably a typo
+            if not candidates:
+                candidates, fuzzy_patterns = self._get_fuzzy_candidates(query_trigrams, query_words)
+
+        word_starts = [" " + query_word for query_word in query_words]
+        if len(candidates) <= max_direct_candidates:
+            scored = self._score_candidates(candidates, query, word_starts, fuzzy_patterns)
+            return [tool_name for _, _, tool_name in heapq.nsmallest(limit, scored)]
+
+        # names starting with the query score highest, then names that have every query word,
+        # anything else can only match in its tooltip. Each group is only scored if the ones above didn't fill the results
+        name_matches = set(name_matches)
+        scored = self._score_candidates(name_matches, query, word_starts, fuzzy_patterns)
+
+        name_candidates.difference_update(name_matches)
+        max_count = max_ordered_candidates
+        if len(scored) < limit:
+            name_scored, scored_count = self._score_in_order(name_candidates, self.max_name_score, query, word_starts,
+                                                             fuzzy_patterns, limit - len(scored), max_count)
+            scored.extend(name_scored)
+            max_count = max(max_count - scored_count, limit)
+
+        top_count = sum(1 for result in scored if -result[0] > self.max_text_score)
+        if top_count < limit:
+            text_candidates = candidates.difference(name_matches)
+            text_candidates.difference_update(name_candidates)
+            scored.extend(self._score_in_order(text_candidates, self.max_text_score, query, word_starts,
+                                               fuzzy_patterns, limit - top_count, max_count)[0])
+
+        return [tool_name for _, _, tool_name in heapq.nsmallest(limit, scored)]
+
+    def _score_candidates(self, tool_names, query, word_starts, fuzzy_patterns):
+        scored = []
+        entries = self._entries
+        for tool_name in tool_names:
+            score = self._score(entries[tool_name], query, word_starts, fuzzy_patterns)
+            if score:
+                scored.append((-score, len(tool_name), tool_name))
+        return scored
+
+    def _score_in_order(self, candidates, best_score, query, word_starts, fuzzy_patterns, limit, max_count):
+        """
+        Score candidates shortest name first, until limit of them have the best score they can get
+
+        Results with the same score are ranked by name length, so after that the rest can't make it into the results.
+        At most max_count are scored, when most candidates score lower than best_score
+        the results are the best of the shortest names.
+
+        :param candidates: set of tool names
+        :param best_score: highest score any of the candidates can get
+        :return: list of scored results, number of candidates that were scored
+        """
+        if len(candidates) <= min(max_direct_candidates, max_count):
+            return self._score_candidates(candidates, query, word_starts, fuzzy_patterns), len(candidates)
+
+        if self._sorted_lengths is None:
+            self._sorted_lengths = sorted([length for length, tool_names in self._length_index.items() if tool_names])
+
+        scored = []
+        best_count = 0
+        scored_count = 0
+        entries = self._entries
+        for length in self._sorted_lengths:
+            for tool_name in sorted(candidates.intersection(self._length_index[length])):
+                score = self._score(entries[tool_name], query, word_starts, fuzzy_patterns)
+                if score:
+                    scored.append((-score, length, tool_name))
+                    if score >= best_score:
+                        best_count += 1
+
+                scored_count += 1
+                if best_count >= limit or scored_count >= max_count:
+                    return scored, scored_count
+        return scored, scored_count
+
+    def _get_name_candidates(self, query_words):
+        """Tools that have every query word in their name, by trigram or for short words by word prefix"""
+        word_sets = []
+        for query_word in query_words:
+            if len(query_word) < 3:
+                word_sets.append(self._name_prefix_index.get(query_word, ()))
+            else:
+                word_sets.extend([self._name_trigram_index.get(trigram, ()) for trigram in get_trigrams(query_word)])
+        return _intersect(word_sets)
+
+    def _sort_names(self):
+        self._sorted_names = sorted([(entry.lower_name, entry.tool_name) for entry in self._entries.values()])
+
+    def _get_name_prefix_matches(self, query):
+        if self._sorted_names is None:
+            self._sort_names()
+
+        matches = []
+        for i in range(bisect.bisect_left(self._sorted_names, (query,)), len(self._sorted_names)):
+            lower_name, tool_name = self._sorted_names[i]
+            if not lower_name.startswith(query):
+                break
+            matches.append(tool_name)
+        return matches
+
+    @staticmethod
+    def _rank(tool_names, query, limit):
+        # exact match first, then shortest names
+        return heapq.nsmallest(limit, tool_names, key=lambda name: (name.lower() != query, len(name), name))
+
+    def _get_fuzzy_candidates(self, query_trigrams, query_words):
+        """
+        Tools for a query that nothing contains, probably a typo or an abbreviation
+
+        :return: set of candidates, and the patterns for fuzzy matching of the candidates
+        """
+        # take anything that shares enough with the query.
+        # typos are only matched against names, so only count trigrams of the names.
+        # typos are rarely in the first characters of a word, so the start of each word counts as well,
+        # and the first character for abbreviations like "jnt"
+        trigram_sets = [self._name_trigram_index.get(trigram, ()) for trigram in query_trigrams]
+        for query_word in query_words:
+            trigram_sets.append(self._name_prefix_index.get(query_word[:typo_prefix_length], ()))
+            trigram_sets.append(self._name_prefix_index.get(query_word[:1], ()))
+        trigram_sets.sort(key=len)
+
+        # trigrams that most tools have don't say much, so skip those if there's anything more specific
+        common_limit = max(len(self._entries) // 10, max_fuzzy_candidates)
+        specific_sets = [trigram_set for trigram_set in trigram_sets if 0 < len(trigram_set) <= common_limit]
+
+        trigram_counts = collections.Counter()
+        for trigram_set in specific_sets or trigram_sets:
+            trigram_counts.update(trigram_set)
+        candidates = set([tool_name for tool_name, _ in trigram_counts.most_common(max_fuzzy_candidates)])
+
+        fuzzy_patterns = [re.compile(".*?".join([re.escape(char) for char in query_word])) for query_word in query_words]
+        return candidates, fuzzy_patterns
+
+    # highest scores of a tool with every query word in its name but not at the start, and of one that only
+    # matches outside of its name, see _score
+    max_name_score = 400
+    max_text_score = 200
+
+    @staticmethod
+    def _score(entry, query, word_starts, fuzzy_patterns=None):
+        lower_name = entry.lower_name
+        if lower_name.startswith(query):
+            return 1000 if lower_name == query else 500
+
+        if query in lower_name:
+            if (" " + query) in entry.name_word_text:
+                return 400
+            return 300
+
+        # every query word found at the start of words in the name
+        name_word_text = entry.name_word_text
+        if all(word_start in name_word_text for word_start in word_starts):
+            return 250
+
+        if query in entry.other_text:
+            return 200
+
+        word_text = entry.word_text
+        if all(word_start in word_text for word_start in word_starts):
+            return 150
+
+        # typos and missing characters, every query word is a subsequence of the name
+        if fuzzy_patterns and all(pattern.search(lower_name) for pattern in fuzzy_patterns):
+            return 50
+
+        return 0
+
+
+_token_regex = re.compile(r"[0-9a-z_]{2,}")
+
+
+def get_tokens(text):
+    return _token_regex.findall(text.lower())
+
+
+class FullTextIndex(object):
+    """
+    Inverted index over the source of tools
+
+    The indexed lines are stored with the index, so snippets for results come straight from the index.
+    Sources are only re-read when their modification time changes.
+    Updating can happen on a background thread, while searches are made from the UI.
+    Results are ordered by how often the query words appear in the source.
+    """
+    version = 1
+    max_lines_per_tool = 5000
+    max_line_length = 500
+
+    def __init__(self):
+        self._docs = {}  # tool_name: {"path": source path, "mtime": modification time, "lines": [str]}
+        self._token_index = {}  # token: set of tool_names
+        self._sorted_tokens = []
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()  # one update or save at a time, searches only wait on _lock
+
+    def __len__(self):
+        return len(self._docs)
+
+    def update(self, sources):
+        """
+        Sync index with the current tool sources
+
+        :param sources: {tool_name: (source path, modification time, function that returns the source text)}
+        :type sources: dict
+        :return: number of tools that were (re)indexed or removed
+        """
+        with self._update_lock:
+            return self._update(sources)
+
+    def _update(self, sources):
+        with self._lock:
+            removed_tool_names = [tool_name for tool_name in self._docs if tool_name not in sources]
+            changed_tool_names = []
+            for tool_name, (source_path, mtime, _) in sources.items():
+                doc = self._docs.get(tool_name)
+                if doc is None or doc["path"] != source_path or doc["mtime"] != mtime:
+                    changed_tool_names.append(tool_name)
+
+        new_docs = {}
+        for tool_name in changed_tool_names:
+            source_path, mtime, read_source = sources[tool_name]
+
+            # reading happens outside of the lock, searches can still use the current index meanwhile
+            try:
+                source_text = read_source()
+            except Exception as e:
+                log.warning("Failed to index source of: {} - {}".format(tool_name, e))
+                continue
+
+            lines = [line[:self.max_line_length] for line in source_text.splitlines()[:self.max_lines_per_tool]]
+            new_docs[tool_name] = {"path": source_path, "mtime": mtime, "lines": lines}
+
+        if not removed_tool_names and not new_docs:
+            return 0
+
+        with self._lock:
+            for tool_name in removed_tool_names:
+                self._remove_doc(tool_name)
+            for tool_name, doc in new_docs.items():
+                self._remove_doc(tool_name)
+                self._add_doc(tool_name, doc)
+            self._sorted_tokens = sorted(self._token_index.keys())
+
+        return len(removed_tool_names) + len(new_docs)
+
+    def _add_doc(self, tool_name, doc):
+        self._docs[tool_name] = doc
+        for token in set(get_tokens("\n".join(doc["lines"]))):
+            self._token_index.setdefault(token, set()).add(tool_name)
+
+    def _remove_doc(self, tool_name):
+        doc = self._docs.pop(tool_name, None)
+        if doc is None:
+            return
+        for token in set(get_tokens("\n".join(doc["lines"]))):
+            tool_names = self._token_index.get(token)
+            if tool_names is None:
+                continue
+            tool_names.discard(tool_name)
+            if not tool_names:
+                self._token_index.pop(token)
+
+    def search(self, query, limit=100, snippet_count=3):
+        """
+        Find tools with source that contains every word of the query, the last word may be partial
+
+        :return: list of (tool_name, [(line_number, line, [(start, end), ...]), ...])
+        """
+        query_tokens = get_tokens(query)
+        if not query_tokens:
+            return []
+
+        with self._lock:
+            matching_tool_names = None
+            for i, query_token in enumerate(query_tokens):
+                if i == len(query_tokens) - 1:
+                    token_matches = self._get_prefix_matches(query_token)
+                else:
+                    token_matches = self._token_index.get(query_token, set())
+
+                if matching_tool_names is None:
+                    matching_tool_names = set(token_matches)
+                else:
+                    matching_tool_names &= token_matches
+
+                if not matching_tool_names:
+                    return []
+
+            highlight_regex = self._get_highlight_regex(query_tokens)
+            hit_counts = {}
+            for tool_name in matching_tool_names:
+                source_text = "\n".join(self._docs[tool_name]["lines"])
+                hit_counts[tool_name] = len(highlight_regex.findall(source_text))
+
+            results = []
+            for tool_name in sorted(matching_tool_names, key=lambda name: (-hit_counts[name], name))[:limit]:
+                snippets = self._get_snippets(self._docs[tool_name]["lines"], highlight_regex, snippet_count)
+                results.append((tool_name, snippets))
+            return results
+
+    def _get_prefix_matches(self, prefix):
+        tool_names = set()
+        for i in range(bisect.bisect_left(self._sorted_tokens, prefix), len(self._sorted_tokens)):
+            token = self._sorted_tokens[i]
+            if not token.startswith(prefix):
+                break
+            tool_names.update(self._token_index[token])
+        return tool_names
+
+    @staticmethod
+    def _get_highlight_regex(query_tokens):
+        return re.compile("|".join([re.escape(token) for token in query_tokens]), re.IGNORECASE)
+
+    @staticmethod
+    def _get_snippets(lines, highlight_regex, snippet_count):
+        snippets = []
+        for line_number, line in enumerate(lines):
+            spans = [match.span() for match in highlight_regex.finditer(line)]
+            if not spans:
+                continue
+            snippets.append((line_number + 1, line, spans))
+            if len(snippets) >= snippet_count:
+                break
+        return snippets
+
+    def save(self, file_path):
+        # the update lock keeps other saves from writing the same temp file until it's renamed
+        with self._update_lock:
+            # docs are replaced instead of modified, so a shallow copy is enough to write them without the lock,
+            # searches don't have to wait for the file to be written
+            with self._lock:
+                docs = dict(self._docs)
+
+            temp_path = "{}.tmp".format(file_path)
+            with open(temp_path, "w") as fp:
+                json.dump({"version": self.version, "docs": docs}, fp)
+            os.replace(temp_path, file_path)
+
+    def load(self, file_path):
+        if not os.path.exists(file_path):
+            return False
+
+        try:
+            with open(file_path, "r") as fp:
+                index_data = json.load(fp)
+        except ValueError as e:
+            log.warning("Failed to read full text index: {} - {}".format(file_path, e))
+            return False
+
+        if index_data.get("version") != self.version:
+            return False
+
+        with self._update_lock, self._lock:
+            self._docs = {}
+            self._token_index = {}
+            for tool_name, doc in index_data.get("docs", {}).items():
+                self._add_doc(tool_name, doc)
+            self._sorted_tokens = sorted(self._token_index.keys())
+        return True
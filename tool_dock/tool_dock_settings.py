@@ -0,0 +1,420 @@
+"""
+Storage backends for ToolDockSettings
+
+Keys are QSettings style paths, where the first section is the group (eg. "tooldock_0/window_state").
+"""
+import base64
+import copy
+import json
+import logging
+import os
+import time
+
+from tool_dock.ui.ui_utils import QtCore
+
+log = logging.getLogger(__name__)
+
+BACKEND_INI = "ini"
+BACKEND_JSON = "json"
+
+# which backend to use for the user settings, can be overridden via this environment variable
+env_settings_backend = "TOOL_DOCK_SETTINGS_BACKEND"
+default_backend = BACKEND_JSON
+
+# read-only settings files that the user settings are layered on top of, lowest priority first
+env_studio_settings = "TOOL_DOCK_STUDIO_SETTINGS"
+env_project_settings = "TOOL_DOCK_PROJECT_SETTINGS"
+
+_bytes_key = "__bytes__"
+_missing = object()
+
+
+class SettingsBackend(object):
+    """Interface for where and how settings values are stored"""
+
+    def value(self, key, default=None):
+        raise NotImplementedError("value not implemented for: {}".format(self.__class__))
+
+    def set_value(self, key, value):
+        raise NotImplementedError("set_value not implemented for: {}".format(self.__class__))
+
+    def remove(self, key):
+        raise NotImplementedError("remove not implemented for: {}".format(self.__class__))
+
+    def contains(self, key):
+        raise NotImplementedError("contains not implemented for: {}".format(self.__class__))
+
+    def keys(self, prefix=""):
+        """All full keys, or only the keys in the prefix group if specified"""
+        raise NotImplementedError("keys not implemented for: {}".format(self.__class__))
+
+    def group(self, prefix):
+        """
+        Values in prefix group
+
+        :param prefix: group name, eg. "tooldock_0"
+        :return: dict of {key relative to group: value}
+        """
+        group_prefix = "{}/".format(prefix.rstrip("/"))
+        return {key[len(group_prefix):]: self.value(key) for key in self.keys(prefix)}
+
+    def sync(self):
+        pass
+
+    def file_name(self):
+        return ""
+
+
+class IniSettingsBackend(SettingsBackend):
+    """QSettings INI file, how settings have always been stored"""
+
+    def __init__(self, file_path=None, organization=None, application=None):
+        if file_path:
+            self._q_settings = QtCore.QSettings(file_path, QtCore.QSettings.IniFormat)
+        else:
+            self._q_settings = QtCore.QSettings(QtCore.QSettings.IniFormat, QtCore.QSettings.UserScope,
+                                                organization, application)
+
+    def value(self, key, default=None):
+        return self._q_settings.value(key, defaultValue=default)
+
+    def set_value(self, key, value):
+        self._q_settings.setValue(key, value)
+
+    def remove(self, key):
+        self._q_settings.remove(key)
+
+    def contains(self, key):
+        return self._q_settings.contains(key)
+
+    def keys(self, prefix=""):
+        if not prefix:
+            return self._q_settings.allKeys()
+
+        prefix = prefix.rstrip("/")
+        self._q_settings.beginGroup(prefix)
+        group_keys = self._q_settings.allKeys()
+        self._q_settings.endGroup()
+        return ["{}/{}".format(prefix, key) for key in group_keys]
+
+    def sync(self):
+        self._q_settings.sync()
+
+    def file_name(self):
+        return self._q_settings.fileName()
+
+
+class JsonSettingsBackend(SettingsBackend):
+    """
+    Settings stored as plain JSON
+
+    Values are kept decoded in memory, so nested dicts and lists don't have to be parsed on every read.
+    Keys are indexed by group, so reading the settings of one tooldock doesn't scan every key.
+    """
+
+    def __init__(self, file_path, migrate_from=None):
+        self._file_path = file_path
+        self._data = {}
+        self._groups = {}
+        self._dirty = False
+        self._sync_scheduled = False
+
+        if os.path.exists(file_path):
+            self._read()
+        elif migrate_from and os.path.exists(migrate_from):
+            migrate_settings(IniSettingsBackend(migrate_from), self)
+            self.sync()
+            log.info("Migrated tool_dock settings from: {} to: {}".format(migrate_from, file_path))
+
+    def _read(self):
+        try:
+            with open(self._file_path, "r") as fp:
+                data = json.load(fp)
+        except ValueError as e:
+            log.warning("Failed to read settings file: {} - {}".format(self._file_path, e))
+            data = {}
+
+        self._data = {key: decode_value(val) for key, val in data.items()}
+        self._groups = {}
+        for key in self._data.keys():
+            self._add_to_group(key)
+
+    def _add_to_group(self, key):
+        if "/" in key:
+            self._groups.setdefault(key.split("/", 1)[0], set()).add(key)
+
+    def _remove_from_group(self, key):
+        if "/" in key:
+            self._groups.get(key.split("/", 1)[0], set()).discard(key)
+
+    def value(self, key, default=None):
+        if key not in self._data:
+            return default
+        val = self._data[key]
+
+        # callers are free to modify what they get back
+        if isinstance(val, (dict, list)):
+            return copy.deepcopy(val)
+        return val
+
+    def set_value(self, key, value):
+        self._data[key] = decode_value(encode_value(value))
+        self._add_to_group(key)
+        self._set_dirty()
+
+    def remove(self, key):
+        # same as QSettings, removing a group removes all keys in it
+        keys_to_remove = [key] if key in self._data else []
+        keys_to_remove.extend(self.keys(key))
+        for key_to_remove in keys_to_remove:
+            self._data.pop(key_to_remove, None)
+            self._remove_from_group(key_to_remove)
+
+        if keys_to_remove:
+            self._set_dirty()
+
+    def contains(self, key):
+        return key in self._data
+
+    def keys(self, prefix=""):
+        if not prefix:
+            return list(self._data.keys())
+
+        prefix = prefix.rstrip("/")
+        group_name = prefix.split("/", 1)[0]
+        group_prefix = "{}/".format(prefix)
+        return [key for key in self._groups.get(group_name, ()) if key.startswith(group_prefix)]
+
+    def _set_dirty(self):
+        self._dirty = True
+
+        # write on next event loop, similar to how QSettings defers writing to disk
+        if self._sync_scheduled:
+            return
+
+        if QtCore.QCoreApplication.instance() is None:
+            self.sync()
+            return
+
+        self._sync_scheduled = True
+        QtCore.QTimer.singleShot(0, self.sync)
+
+    def sync(self):
+        self._sync_scheduled = False
+        if not self._dirty:
+            return
+
+        settings_folder = os.path.dirname(self._file_path)
+        if settings_folder and not os.path.exists(settings_folder):
+            os.makedirs(settings_folder)
+
+        # write to temp file first so a crash can't leave half a settings file
+        temp_path = "{}.tmp".format(self._file_path)
+        with open(temp_path, "w") as fp:
+            json.dump({key: encode_value(val) for key, val in self._data.items()}, fp, indent=1, sort_keys=True)
+
+        os.replace(temp_path, self._file_path)
+
+        self._dirty = False
+
+    def file_name(self):
+        return self._file_path
+
+
+class LayeredSettingsBackend(SettingsBackend):
+    """
+    User settings on top of read-only studio and project settings files
+
+    Dict values are merged per entry, other values are overridden by the highest layer that defines them.
+    All writes go to the user backend, and only what differs from the read-only layers is stored there.
+    The merged read-only layers are cached, and re-read when the modification time of a layer file changes.
+    """
+    mtime_check_interval = 2.0  # seconds between checking whether layer files have changed
+
+    def __init__(self, user_backend, layer_paths):
+        """
+        :param user_backend: backend that all values are written to
+        :type user_backend: SettingsBackend
+        :param layer_paths: read-only settings files, lowest priority first
+        :type layer_paths: list
+        """
+        self.user_backend = user_backend
+        self.layer_paths = list(layer_paths)
+
+        self._merged_layers = {}
+        self._layer_mtimes = None
+        self._last_mtime_check = 0.0
+
+    def _get_layer_mtimes(self):
+        return tuple(os.path.getmtime(path) if os.path.exists(path) else None for path in self.layer_paths)
+
+    def _get_merged_layers(self):
+        now = time.time()
+        if self._layer_mtimes is not None and now - self._last_mtime_check < self.mtime_check_interval:
+            return self._merged_layers
+        self._last_mtime_check = now
+
+        layer_mtimes = self._get_layer_mtimes()
+        if layer_mtimes == self._layer_mtimes:
+            return self._merged_layers
+
+        merged_layers = {}
+        for layer_path, layer_mtime in zip(self.layer_paths, layer_mtimes):
+            if layer_mtime is None:
+                continue
+
+            layer_backend = backend_from_path(layer_path)
+            for key in layer_backend.keys():
+                merged_layers[key] = merge_values(merged_layers.get(key, _missing), layer_backend.value(key))
+
+        self._merged_layers = merged_layers
+        self._layer_mtimes = layer_mtimes
+        return self._merged_layers
+
+    def value(self, key, default=None):
+        layer_val = self._get_merged_layers().get(key, _missing)
+        user_val = self.user_backend.value(key, default=_missing)
+
+        val = merge_values(layer_val, user_val)
+        if val is _missing:
+            return default
+
+        if val is layer_val and isinstance(val, (dict, list)):
+            return copy.deepcopy(val)
+        return val
+
+    def set_value(self, key, value):
+        layer_val = self._get_merged_layers().get(key, _missing)
+
+        # only store the entries that differ from the read-only layers
+        if isinstance(layer_val, dict) and isinstance(value, dict):
+            value = {k: v for k, v in value.items() if k not in layer_val or layer_val[k] != v}
+            if not value and not self.user_backend.contains(key):
+                return
+
+        elif layer_val is not _missing and layer_val == value:
+            if self.user_backend.contains(key):
+                self.user_backend.remove(key)
+            return
+
+        self.user_backend.set_value(key, value)
+
+    def remove(self, key):
+        # read-only layers still define the value, so this resets the key to the layered default
+        self.user_backend.remove(key)
+
+    def contains(self, key):
+        return key in self._get_merged_layers() or self.user_backend.contains(key)
+
+    def keys(self, prefix=""):
+        layer_keys = self._get_merged_layers().keys()
+        if prefix:
+            group_prefix = "{}/".format(prefix.rstrip("/"))
+            layer_keys = [key for key in layer_keys if key.startswith(group_prefix)]
+        return list(set(layer_keys).union(self.user_backend.keys(prefix)))
+
+    def sync(self):
+        self.user_backend.sync()
+
+    def file_name(self):
+        return self.user_backend.file_name()
+
+
+def merge_values(lower_value, upper_value):
+    """Upper value overrides lower value, unless both are dicts in which case they're merged per entry"""
+    if upper_value is _missing:
+        return lower_value
+
+    if isinstance(lower_value, dict) and isinstance(upper_value, dict):
+        merged_value = copy.deepcopy(lower_value)
+        merged_value.update(upper_value)
+        return merged_value
+
+    return upper_value
+
+
+def get_layer_paths():
+    """Read-only settings files defined via environment variables, lowest priority first"""
+    layer_paths = []
+    for env_var in (env_studio_settings, env_project_settings):
+        layer_paths.extend([path for path in os.environ.get(env_var, "").split(";") if path])
+    return layer_paths
+
+
+def encode_value(value):
+    """Convert value to something json serializable"""
+    if isinstance(value, dict):
+        return {str(key): encode_value(val) for key, val in value.items()}
+
+    if isinstance(value, (list, tuple)):
+        return [encode_value(val) for val in value]
+
+    if isinstance(value, QtCore.QByteArray):
+        value = bytes(value.data())
+
+    if isinstance(value, (bytes, bytearray)) and not isinstance(value, str):
+        return {_bytes_key: base64.b64encode(bytes(value)).decode("ascii")}
+
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+
+    # Qt enums and similar
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def decode_value(value):
+    """Convert json value back to the value that was stored"""
+    if isinstance(value, dict):
+        if len(value) == 1 and _bytes_key in value:
+            return QtCore.QByteArray(base64.b64decode(value[_bytes_key]))
+        return {key: decode_value(val) for key, val in value.items()}
+
+    if isinstance(value, list):
+        return [decode_value(val) for val in value]
+
+    return value
+
+
+def migrate_settings(source_backend, target_backend):
+    """Copy all values from one backend to another"""
+    for key in source_backend.keys():
+        target_backend.set_value(key, source_backend.value(key))
+
+
+def get_default_ini_path(organization, application):
+    return QtCore.QSettings(QtCore.QSettings.IniFormat, QtCore.QSettings.UserScope,
+                            organization, application).fileName()
+
+
+def create_backend(organization, application, backend_type=None):
+    """
+    Create backend for the user settings
+
+    INI settings files from before the JSON backend existed are migrated the first time it's used.
+    """
+    if backend_type is None:
+        backend_type = os.environ.get(env_settings_backend, default_backend).lower()
+
+    ini_path = get_default_ini_path(organization, application)
+
+    if backend_type == BACKEND_INI:
+        user_backend = IniSettingsBackend(organization=organization, application=application)
+    else:
+        json_path = "{}.json".format(os.path.splitext(ini_path)[0])
+        user_backend = JsonSettingsBackend(json_path, migrate_from=ini_path)
+
+    layer_paths = get_layer_paths()
+    if layer_paths:
+        return LayeredSettingsBackend(user_backend, layer_paths)
+
+    return user_backend
+
+
+def backend_from_path(file_path):
+    """Backend for standalone settings files, the type is decided by the file extension"""
+    if os.path.splitext(file_path)[-1].lower() == ".json":
+        return JsonSettingsBackend(file_path)
+    return IniSettingsBackend(file_path)
@@ -3,15 +3,21 @@ __created__ = "2021-03-13"
 __modified__ = "2021-03-13"
 
 # Standard
+import logging
+from functools import partial
 
 # Tool
 
 from tool_dock import tool_dock_configure as tdc
+from tool_dock import tool_dock_diagnostics as tdd
+from tool_dock import tool_dock_output as tdo
 from tool_dock import tool_dock_utils as tdu
 # UI
 from tool_dock.ui import ui_utils
 from tool_dock.ui.ui_utils import QtCore, QtWidgets, QtGui
 
+log = logging.getLogger(__name__)
+
 try:
     # subclasses defined in here will be read on window initialization
     from tool_dock.examples import tool_dock_examples
@@ -24,13 +30,16 @@ try:
     # os.environ["TOOL_DOCK_EXTRA_MODULES"] = "a_module;another_module"
 
 except Exception as e:
-    print(e)
+    log.exception(e)
 
 
 class ToolDockWindow(ui_utils.DockableWidget, QtWidgets.QMainWindow):
     docking_object_name = "ToolDock"
 
-    def __init__(self, window_index=0, *args, **kwargs):
+    def __init__(self, window_index=0, staged=False, *args, **kwargs):
+        """
+        :param staged: only build the window itself, the tools are built by stepping through iter_staged_restore()
+        """
         super(ToolDockWindow, self).__init__(*args, **kwargs)
         self.window_index = window_index
         self.setWindowTitle("ToolDockWindow_{}".format(self.window_index))
@@ -58,7 +67,7 @@ class ToolDockWindow(ui_utils.DockableWidget, QtWidgets.QMainWindow):
         self.addToolBar(QtCore.Qt.TopToolBarArea, self.tool_bar)
 
         # configure tools action
-        configure_action = QtWidgets.QAction(ui_utils.create_qicon("configure"), "Configure", self)
+        configure_action = QtWidgets.QAction(tdu.lk.registry.get_icon("configure"), "Configure", self)
         configure_action.triggered.connect(self.configure_tooldock)
         self.tool_bar.addAction(configure_action)
 
@@ -69,7 +78,7 @@ class ToolDockWindow(ui_utils.DockableWidget, QtWidgets.QMainWindow):
         # Layout button
         layout_tool_button = QtWidgets.QToolButton(self)
         layout_tool_button.setText("Layout")
-        layout_tool_button.setIcon(ui_utils.create_qicon("layout"))
+        layout_tool_button.setIcon(tdu.lk.registry.get_icon("layout"))
         layout_tool_button.setToolButtonStyle(QtCore.Qt.ToolButtonTextBesideIcon)
 
         # add layout menu
@@ -86,13 +95,34 @@ class ToolDockWindow(ui_utils.DockableWidget, QtWidgets.QMainWindow):
         layout_menu.addSeparator()
         layout_menu.addAction("Save Layout File", self.save_settings_to_file)
         layout_menu.addAction("Load Layout File", self.load_settings_from_file)
+        layout_menu.addSeparator()
+        layout_menu.addAction("Save Layout Snapshot", self.ui_save_layout_snapshot)
+        self.switch_snapshot_menu = layout_menu.addMenu("Switch Layout Snapshot")
+        self.delete_snapshot_menu = layout_menu.addMenu("Delete Layout Snapshot")
+        layout_menu.aboutToShow.connect(self.ui_fill_layout_snapshot_menus)
+        layout_menu.addSeparator()
+        layout_menu.addAction("Compact Settings", lambda: tdu.compact_settings())
         self.tool_bar.addWidget(layout_tool_button)
 
         # Extra actions
+        run_tool_action = QtWidgets.QAction("Run Tool", self, triggered=self.open_command_palette)
+        run_tool_action.setShortcut(QtGui.QKeySequence(
+            self.settings.get_value(tdu.lk.command_palette_hotkey, default="Ctrl+Space")))
+        run_tool_action.setShortcutContext(QtCore.Qt.WidgetWithChildrenShortcut)
+        self.tool_bar.addAction(run_tool_action)
+        self.addAction(run_tool_action)
         self.tool_bar.addAction(QtWidgets.QAction("Set Name", self, triggered=self.ui_set_window_title))
         self.tool_bar.addAction(QtWidgets.QAction("Add Spacer", self, triggered=self.ui_add_spacer))
         self.tool_bar.addAction(QtWidgets.QAction("Set Text Padding", self, triggered=self.set_button_padding))
 
+        # output of tools and tool_dock, not one of the tool docks so it's left alone by rebuilds
+        self.output_dock_widget = QtWidgets.QDockWidget("Output", self)
+        self.output_dock_widget.setObjectName("ToolDockOutput_QtObject")  # restored with the window state
+        self.output_dock_widget.setWidget(tdo.OutputPanel())
+        self.addDockWidget(QtCore.Qt.BottomDockWidgetArea, self.output_dock_widget)
+        self.output_dock_widget.hide()
+        self.tool_bar.addAction(self.output_dock_widget.toggleViewAction())
+
         # setting strings
         self.active_tooldock = "tooldock_{}".format(self.window_index)
         self.k_active_tools = "{}/tools".format(self.active_tooldock)
@@ -102,6 +132,13 @@ class ToolDockWindow(ui_utils.DockableWidget, QtWidgets.QMainWindow):
         self.k_tool_splitters = "{}/tool_splitters".format(self.active_tooldock)
         self.k_param_grid_ui = "{}/param_grid".format(self.active_tooldock)
         self.k_spacer_count = "{}/spacer_count".format(self.active_tooldock)
+        self.k_layout_snapshots = "{}/layout_snapshots".format(self.active_tooldock)
+        self.k_active_layout_snapshot = "{}/active_layout_snapshot".format(self.active_tooldock)
+
+        # last saved ui settings per tool, used to only write tools that changed since then
+        self._saved_tool_ui_settings = {}
+
+        self.command_palette = None  # type: tdc.CommandPaletteDialog
 
         # a timer can also be used for triggering the load settings
         # for some reason this sometimes works better than any qt refresh option
@@ -115,6 +152,25 @@ class ToolDockWindow(ui_utils.DockableWidget, QtWidgets.QMainWindow):
                                                  default=ui_utils.ContentResizeButton.TEXT_PADDING_MULTIPLIER)
         ui_utils.ContentResizeButton.TEXT_PADDING_MULTIPLIER = button_padding
 
+        # clean out settings of tools that don't exist anymore, once per session.
+        # it needs tool discovery, so it waits for the event loop to be idle instead of slowing down startup
+        if not tdu.lk.settings_compacted:
+            tdu.lk.settings_compacted = True
+            if self.settings.get_value(tdu.lk.compact_settings_on_startup, default=True):
+                tdu.schedule_compact_settings(self.settings)
+
+        # session wide services, started by whichever window comes first (also when it's restored staged)
+        if self.settings.get_value(tdu.lk.stall_watchdog, default=False):
+            tdu.start_stall_watchdog()
+
+        if self.settings.get_value(tdu.lk.command_server, default=False):
+            tdu.start_command_server(run_tool_func=run_docked_tool)
+
+        if staged:
+            return
+
+        self.schedule_warmup()
+
         # build dock widgets for all configured tools
         self.ui_build_tool_widgets()
         self.ui_load_settings_timer.start(0)
@@ -122,68 +178,122 @@ class ToolDockWindow(ui_utils.DockableWidget, QtWidgets.QMainWindow):
         # after initialization, update UI if new tools are available
         self.ui_update_new_tools_display()
 
+    def iter_staged_restore(self):
+        """Build the tools of a window that was created with staged=True, yields after each tool"""
+        for _ in self._iter_build_tool_widgets():
+            yield
+
+        self.ui_load_settings()
+        self.ui_update_new_tools_display()
+        self.schedule_warmup()
+
+    def schedule_warmup(self):
+        """Preload what tools need on first use, once the window is up and the event loop is idle"""
+        if not tdu.lk.warmup_scheduled and self.settings.get_value(tdu.lk.idle_warmup, default=True):
+            tdu.schedule_warmup()
+
     def ui_build_tool_widgets(self):
+        # a full build replaces whatever a staged restore was going to build
+        ui_utils.wh.restore_queue.discard(self)
+
+        with tdd.track("rebuild {}".format(self.active_tooldock)):
+            for _ in self._iter_build_tool_widgets():
+                pass
+
+    def _iter_build_tool_widgets(self):
         # remove any existing tooldock dock widgets
-        for dock_widget in self.tool_dock_widgets + self.spacer_dock_widgets:  # type: QtWidgets.QDockWidget
-            tool_cls = dock_widget.widget()  # type: tdu.ToolDockItemBase
-            if isinstance(tool_cls, tdu.ToolDockItemBase):
-                tool_cls._remove_callbacks()
-            dock_widget.close()
-            dock_widget.deleteLater()
+        old_dock_widgets = self.tool_dock_widgets + self.spacer_dock_widgets
+        for dock_widget in old_dock_widgets:  # type: QtWidgets.QDockWidget
+            self._delete_dock_widget(dock_widget)
         self.tool_dock_widgets = []
         self.spacer_dock_widgets = []
 
         # wait for deleteLater to finish
-        ui_utils.process_q_events()
+        if old_dock_widgets:
+            ui_utils.process_q_events()
 
         active_tools = self.settings.value(self.k_active_tools)
         if not active_tools:
             return
 
+        # only build for selected window actions
+        active_tools = set(active_tools)
         for tool_item_cls in tdu.get_tool_classes():  # type: type(tdu.ToolDockItemBase)
-            if tool_item_cls.TOOL_NAME not in active_tools:  # only build for selected window actions
+            if tool_item_cls.TOOL_NAME not in active_tools:
                 continue
-
-            dock = QtWidgets.QDockWidget(tool_item_cls.TOOL_NAME, self)
-
-            clean_tool_name = tool_item_cls.TOOL_NAME.replace(" ", "_")
-            dock_object_name = "{0}_QtObject".format(clean_tool_name)
-            dock.setObjectName(dock_object_name)
-
-            tool_widget = tool_item_cls()  # type:tdu.ToolDockItemBase
-            tool_widget.post_init()
-            dock.setWidget(tool_widget)
-            dock.setToolTip(tdu.get_tool_tip_from_tool(tool_item_cls))
-
-            self.addDockWidget(QtCore.Qt.LeftDockWidgetArea, dock)
-            self.tool_dock_widgets.append(dock)
+            self._add_tool_dock_widget(tool_item_cls)
+            yield
 
         # add spacer widgets
         spacer_count = self.settings.get_value(self.k_spacer_count, default=0)
         for _ in range(spacer_count):
             self.ui_add_spacer()
 
-    def ui_load_settings(self):
-        print("loading ui settings: {}".format(self.active_tooldock))
+    def _add_tool_dock_widget(self, tool_item_cls):
+        dock = QtWidgets.QDockWidget(tool_item_cls.TOOL_NAME, self)
+
+        clean_tool_name = tool_item_cls.TOOL_NAME.replace(" ", "_")
+        dock_object_name = "{0}_QtObject".format(clean_tool_name)
+        dock.setObjectName(dock_object_name)
+
+        tool_widget = tool_item_cls()  # type:tdu.ToolDockItemBase
+        tool_widget.post_init()
+        dock.setWidget(tool_widget)
+        dock.setToolTip(tdu.get_tool_tip_from_tool(tool_item_cls))
+
+        self.addDockWidget(QtCore.Qt.LeftDockWidgetArea, dock)
+        self.tool_dock_widgets.append(dock)
+        return dock
+
+    def _delete_dock_widget(self, dock_widget):
+        tool_cls = dock_widget.widget()  # type: tdu.ToolDockItemBase
+        if isinstance(tool_cls, tdu.ToolDockItemBase):
+            tool_cls._remove_callbacks()
+        self.title_bar_widgets.pop(dock_widget, None)
+        dock_widget.close()
+        dock_widget.deleteLater()
 
+    def ui_load_settings(self):
+        log.debug("loading ui settings: {}".format(self.active_tooldock))
+        self._saved_tool_ui_settings.clear()
+
+        ui_settings = {
+            "window_geometry": self.settings.value(self.k_win_geometry),
+            "window_state": self.settings.value(self.k_win_state),
+            "tool_splitters": self.settings.value(self.k_tool_splitters),
+            "param_grid": self.settings.value(self.k_param_grid_ui),
+            "layout_locked": self.settings.get_value(self.k_layout_locked, default=False),
+        }
+        self.ui_apply_ui_settings(ui_settings)
+
+    def ui_apply_ui_settings(self, ui_settings):
+        """
+        Restore window layout, splitters and parameter grids
+
+        :param ui_settings: dict with keys window_geometry, window_state, tool_splitters, param_grid, layout_locked
+        :type ui_settings: dict
+        """
         # restore dock widget layouts
-        window_geometry = self.settings.value(self.k_win_geometry)
-        window_state = self.settings.value(self.k_win_state)
+        window_geometry = ui_settings.get("window_geometry")
+        window_state = ui_settings.get("window_state")
         if window_geometry and window_state:
             self.restoreGeometry(window_geometry)
             self.restoreState(window_state)
 
         # restore splitters between parameter_grid and run button
-        dock_splitters = self.settings.value(self.k_tool_splitters)
+        dock_splitters = ui_settings.get("tool_splitters")
         if dock_splitters:
             for dock_widget in self.tool_dock_widgets:
                 tool_item = dock_widget.widget()  # type:tdu.ToolDockItemBase
+                if not tool_item.has_param_grid():
+                    continue
+
                 splitter_data = dock_splitters.get(tool_item.TOOL_NAME)
                 if not splitter_data:
                     continue
 
                 if not isinstance(splitter_data, dict):
-                    print("Could not restore splitter ui from: {}".format(splitter_data))
+                    log.warning("Could not restore splitter ui from: {}".format(splitter_data))
                     continue
 
                 s_sizes = splitter_data.get("sizes")
@@ -193,47 +303,196 @@ class ToolDockWindow(ui_utils.DockableWidget, QtWidgets.QMainWindow):
                 tool_item.main_splitter.setOrientation(s_orientation)
 
         # restore parameter_grid header sizes
-        parameter_grid_ui_settings = self.settings.value(self.k_param_grid_ui)
+        parameter_grid_ui_settings = ui_settings.get("param_grid")
         if parameter_grid_ui_settings:
             for dock_widget in self.tool_dock_widgets:
                 tool_item = dock_widget.widget()  # type:tdu.ToolDockItemBase
+                if not tool_item.has_param_grid():
+                    continue
+
                 tool_param_grid = parameter_grid_ui_settings.get(tool_item.TOOL_NAME)
                 if not tool_param_grid:
                     continue
                 tool_item.param_grid.set_ui_settings(tool_param_grid)
 
-        if self.settings.get_value(self.k_layout_locked, default=False):
+        if ui_settings.get("layout_locked"):
             self.ui_lock_layout()
+        elif self.title_bar_widgets:
+            self.ui_unlock_layout()
 
     def ui_save_settings(self):
+        # a half restored window would save a half empty layout
+        ui_utils.wh.restore_queue.finish(self)
+
         # store dock widget layouts
         self.settings.setValue(self.k_win_geometry, self.saveGeometry())
         self.settings.setValue(self.k_win_state, self.saveState())
 
         # store splitter size between parameter_grid and run button
         # store size of parameter_grid header sections
-        tool_splitters = {}
-        parameter_grids = {}
         for dock_widget in self.tool_dock_widgets:  # type: QtWidgets.QDockWidget
             tool_item = dock_widget.widget()  # type:tdu.ToolDockItemBase
+            if not tool_item.has_param_grid():
+                continue
 
-            # save parameter_grid settings
-            parameter_grids[tool_item.TOOL_NAME] = tool_item.param_grid.get_ui_settings()
+            # skip tools that haven't changed since last save
+            tool_ui_settings = self._get_tool_ui_settings(tool_item)
+            if self._saved_tool_ui_settings.get(tool_item.TOOL_NAME) == tool_ui_settings:
+                continue
+            self._saved_tool_ui_settings[tool_item.TOOL_NAME] = tool_ui_settings
 
-            # save main_splitter settings
-            splitter_data = dict()
-            splitter_data["sizes"] = tool_item.main_splitter.sizes()
-            splitter_data["orientation"] = tool_item.main_splitter.orientation()
-            tool_splitters[tool_item.TOOL_NAME] = splitter_data
+            parameter_grid_data, splitter_data = tool_ui_settings
+            self.settings.set_dict_value(self.k_param_grid_ui, tool_item.TOOL_NAME, parameter_grid_data)
+            self.settings.set_dict_value(self.k_tool_splitters, tool_item.TOOL_NAME, splitter_data)
+
+        # drop the settings of tools that are no longer docked in this window
+        docked_tool_names = set(dock_widget.widget().TOOL_NAME for dock_widget in self.tool_dock_widgets)
+        for settings_key in (self.k_param_grid_ui, self.k_tool_splitters):
+            saved_tool_names = list(self.settings.get_snapshot(settings_key, default=dict()).keys())
+            for tool_name in saved_tool_names:
+                if tool_name not in docked_tool_names:
+                    self.settings.remove_dict_value(settings_key, tool_name)
+
+        for tool_name in list(self._saved_tool_ui_settings.keys()):
+            if tool_name not in docked_tool_names:
+                self._saved_tool_ui_settings.pop(tool_name)
 
-        self.settings.setValue(self.k_tool_splitters, tool_splitters)
-        self.settings.setValue(self.k_param_grid_ui, parameter_grids)
         self.settings.setValue(self.k_spacer_count, len(self.spacer_dock_widgets))
-        print("Saved UI settings {}".format(self.active_tooldock))
+        tdu.save_recent_tools()
+        log.info("Saved UI settings {}".format(self.active_tooldock))
+
+    @staticmethod
+    def _get_tool_ui_settings(tool_item):
+        """
+        :type tool_item: tdu.ToolDockItemBase
+        :return: parameter_grid settings and main_splitter settings
+        """
+        parameter_grid_data = tool_item.param_grid.get_ui_settings()
+
+        splitter_data = dict()
+        splitter_data["sizes"] = tool_item.main_splitter.sizes()
+        splitter_data["orientation"] = int(tool_item.main_splitter.orientation())
+
+        return parameter_grid_data, splitter_data
+
+    ######################################################################
+    # Layout snapshots
+
+    def get_layout_snapshot(self):
+        """Everything needed to restore the current layout of this window"""
+        snapshot = {
+            "tools": [dock.widget().TOOL_NAME for dock in self.tool_dock_widgets],
+            "spacer_count": len(self.spacer_dock_widgets),
+            "window_geometry": self.saveGeometry(),
+            "window_state": self.saveState(),
+            "layout_locked": bool(self.title_bar_widgets),
+            "tool_splitters": {},
+            "param_grid": {},
+        }
+
+        for dock_widget in self.tool_dock_widgets:
+            tool_item = dock_widget.widget()  # type:tdu.ToolDockItemBase
+            if not tool_item.has_param_grid():
+                continue
+            parameter_grid_data, splitter_data = self._get_tool_ui_settings(tool_item)
+            snapshot["param_grid"][tool_item.TOOL_NAME] = parameter_grid_data
+            snapshot["tool_splitters"][tool_item.TOOL_NAME] = splitter_data
+
+        return snapshot
+
+    def get_layout_snapshot_names(self):
+        return sorted(self.settings.get_value(self.k_layout_snapshots, default=dict()).keys())
+
+    def save_layout_snapshot(self, snapshot_name):
+        self.settings.set_dict_value(self.k_layout_snapshots, snapshot_name, self.get_layout_snapshot())
+        self.settings.setValue(self.k_active_layout_snapshot, snapshot_name)
+
+    def delete_layout_snapshot(self, snapshot_name):
+        layout_snapshots = self.settings.get_value(self.k_layout_snapshots, default=dict())
+        if layout_snapshots.pop(snapshot_name, None) is not None:
+            self.settings.setValue(self.k_layout_snapshots, layout_snapshots)
+
+    def switch_layout_snapshot(self, snapshot_name):
+        """
+        Switch to a saved layout snapshot
+
+        Tools that are in both the current and the new layout keep their widgets,
+        the rest of the layout is applied in one pass with updates disabled.
+        """
+        snapshot = self.settings.get_value(self.k_layout_snapshots, default=dict()).get(snapshot_name)
+        if not snapshot:
+            log.warning("Layout snapshot not found: {}".format(snapshot_name))
+            return
+
+        # store changes of the layout we're switching away from
+        current_snapshot_name = self.settings.value(self.k_active_layout_snapshot)
+        if current_snapshot_name and current_snapshot_name != snapshot_name:
+            self.save_layout_snapshot(current_snapshot_name)
+
+        self.setUpdatesEnabled(False)
+        try:
+            # title bars of locked docks get swapped out, so unlock while docks are added and removed
+            if self.title_bar_widgets:
+                self.ui_unlock_layout()
+
+            snapshot_tools = snapshot.get("tools") or list()
+
+            # remove tools that aren't in the new layout
+            for dock_widget in list(self.tool_dock_widgets):
+                if dock_widget.widget().TOOL_NAME not in snapshot_tools:
+                    self._delete_dock_widget(dock_widget)
+                    self.tool_dock_widgets.remove(dock_widget)
+
+            # add tools that aren't built yet
+            existing_tools = [dock.widget().TOOL_NAME for dock in self.tool_dock_widgets]
+            for tool_item_cls in tdu.get_tool_classes():
+                if tool_item_cls.TOOL_NAME in snapshot_tools and tool_item_cls.TOOL_NAME not in existing_tools:
+                    self._add_tool_dock_widget(tool_item_cls)
+
+            # match spacer count
+            spacer_count = snapshot.get("spacer_count", 0)
+            while len(self.spacer_dock_widgets) > spacer_count:
+                self.ui_delete_spacer(self.spacer_dock_widgets[-1])
+            while len(self.spacer_dock_widgets) < spacer_count:
+                self.ui_add_spacer()
+
+            self.ui_apply_ui_settings(snapshot)
+        finally:
+            self.setUpdatesEnabled(True)
+
+        # the snapshot is now the active layout of this tooldock
+        self.settings.setValue(self.k_active_tools, snapshot_tools)
+        self.settings.setValue(self.k_active_layout_snapshot, snapshot_name)
+        self.ui_save_settings()
+
+    def ui_save_layout_snapshot(self):
+        current_name = self.settings.value(self.k_active_layout_snapshot) or ""
+        snapshot_name, ok = QtWidgets.QInputDialog.getText(self, "Save Layout Snapshot", "Snapshot Name",
+                                                           QtWidgets.QLineEdit.Normal,
+                                                           text=current_name)
+        if ok and snapshot_name:
+            self.save_layout_snapshot(snapshot_name)
+
+    def ui_fill_layout_snapshot_menus(self):
+        self.switch_snapshot_menu.clear()
+        self.delete_snapshot_menu.clear()
+
+        active_snapshot_name = self.settings.value(self.k_active_layout_snapshot)
+        for snapshot_name in self.get_layout_snapshot_names():
+            switch_action = self.switch_snapshot_menu.addAction(snapshot_name,
+                                                                partial(self.switch_layout_snapshot, snapshot_name))
+            switch_action.setCheckable(True)
+            switch_action.setChecked(snapshot_name == active_snapshot_name)
+
+            self.delete_snapshot_menu.addAction(snapshot_name, partial(self.delete_layout_snapshot, snapshot_name))
 
     def configure_tooldock(self):
         """Choose which tools should be displayed for this tooldock"""
         active_tools = self.settings.value(self.k_active_tools, defaultValue=list())
+
+        # pick up tool classes that were defined since the tools were last discovered
+        tdu.lk.registry.invalidate()
+
         win = tdc.ToolDockConfigurationDialog(self, active_tools=active_tools)
         win.config_saved.connect(self.save_user_tooldock)
 
@@ -252,6 +511,35 @@ class ToolDockWindow(ui_utils.DockableWidget, QtWidgets.QMainWindow):
         self.ui_build_tool_widgets()
         self.ui_load_settings_timer.start(1)
 
+    def open_command_palette(self):
+        """Search all registered tools and run the chosen one"""
+        # one palette per window, closing the popup only hides it
+        if self.command_palette is None:
+            self.command_palette = tdc.CommandPaletteDialog(self)
+            self.command_palette.tool_chosen.connect(self.run_tool)
+
+        # show below the toolbar
+        self.command_palette.move(self.mapToGlobal(self.tool_bar.geometry().bottomLeft()))
+        self.command_palette.show()
+        return self.command_palette
+
+    def get_docked_tool(self, tool_name):
+        for dock_widget in self.tool_dock_widgets:
+            tool_item = dock_widget.widget()  # type:tdu.ToolDockItemBase
+            if tool_item.TOOL_NAME == tool_name:
+                return tool_item
+
+    def run_tool(self, tool_name, parameters=None):
+        """Run tool by name, tools that aren't docked in this window get a temporary instance"""
+        tool_item = self.get_docked_tool(tool_name)
+        if tool_item is not None:
+            return tool_item._execute(parameters=parameters)
+
+        try:
+            return tdu.run_tool(tool_name, parameters=parameters)
+        except ValueError as e:
+            log.warning(e)
+
     def ui_set_window_title(self):
         val, ok = QtWidgets.QInputDialog.getText(self, "New Window Title", "Enter New Title",
                                                  QtWidgets.QLineEdit.Normal,
@@ -308,7 +596,7 @@ class ToolDockWindow(ui_utils.DockableWidget, QtWidgets.QMainWindow):
             try:
                 dock.setTitleBarWidget(dock_title_bar)
             except RuntimeError as e:
-                print(e)
+                log.debug(e)
         self.title_bar_widgets.clear()
         self.settings.setValue(self.k_layout_locked, False)
 
@@ -320,9 +608,10 @@ class ToolDockWindow(ui_utils.DockableWidget, QtWidgets.QMainWindow):
 
     def save_settings_to_file(self):
         self.ui_save_settings()
+        self.settings.flush()
         new_path = tdu.save_tooldock_settings(self.settings, current_tooldock=self.active_tooldock)
         if new_path:
-            print("Saved Layout to: {}".format(new_path))
+            log.info("Saved Layout to: {}".format(new_path))
 
     def load_settings_from_file(self):
         load_success = tdu.load_tooldock_settings(target_settings=self.settings,
@@ -339,7 +628,7 @@ class ToolDockWindow(ui_utils.DockableWidget, QtWidgets.QMainWindow):
             # self.load_ui_settings()
 
     def are_new_tools_available(self):
-        last_viewed_tools = self.settings.get_value(tdu.lk.last_viewed_tools, default=list())
+        last_viewed_tools = set(self.settings.get_snapshot(tdu.lk.last_viewed_tools, default=list()))
 
         # tools have never been shown, so all tools are new
         if len(last_viewed_tools) == 0:
@@ -353,9 +642,20 @@ class ToolDockWindow(ui_utils.DockableWidget, QtWidgets.QMainWindow):
     # TODO: this event doesn't seem to trigger when using MayaQWidgetDockableMixin
     def closeEvent(self, event):
         self.ui_save_settings()
+        self.settings.flush()
         super(ToolDockWindow, self).closeEvent(event)
 
 
+def run_docked_tool(tool_name, parameters=None):
+    """Run tool with the settings of the first window it's docked in, used by the command server"""
+    for window in ui_utils.wh.live_windows.get(str(ToolDockWindow), {}).values():
+        tool_item = window.get_docked_tool(tool_name)
+        if tool_item is not None:
+            return tool_item._execute(parameters=parameters)
+
+    return tdu.run_tool(tool_name, parameters=parameters)
+
+
 def main(restore=False, force_refresh=False, index=None):
     restore_script = "import tool_dock; tool_dock.main(restore=True, index={})"
 
@@ -363,7 +663,11 @@ def main(restore=False, force_refresh=False, index=None):
                                            restore=restore,
                                            restore_script=restore_script,
                                            force_refresh=force_refresh,
-                                           window_index=index
+                                           window_index=index,
+                                           staged_restore=tdu.lk.settings.get_value(tdu.lk.staged_restore,
+                                                                                    default=True),
+                                           restore_step_budget=tdu.lk.settings.get_value(
+                                               tdu.lk.staged_restore_step_budget, default=10),
                                            )
 
 
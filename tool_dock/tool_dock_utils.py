@@ -1,14 +1,25 @@
 import collections
 import importlib
 import inspect
+import json
+import logging
+import mmap
 import os
-import runpy
+import socket
 import sys
-import traceback
+import time
 from copy import copy
 from functools import partial
 
 from tool_dock import dcc
+from tool_dock import tool_dock_bundle
+from tool_dock import tool_dock_ipc
+from tool_dock import tool_dock_mirror
+from tool_dock import tool_dock_output
+from tool_dock import tool_dock_scheduler
+from tool_dock import tool_dock_search
+from tool_dock import tool_dock_settings as tds
+from tool_dock import tool_dock_watchdog
 from tool_dock.ui import parameter_grid
 from tool_dock.ui import ui_utils
 from tool_dock.ui.ui_utils import QtCore, QtWidgets, QtGui
@@ -16,6 +27,7 @@ from tool_dock.ui.ui_utils import QtCore, QtWidgets, QtGui
 PY_2 = sys.version_info[0] < 3
 background_form = "background-color:rgb({0}, {1}, {2})"
 dcc_interface = dcc.Interface()
+log = logging.getLogger(__name__)
 
 
 class RequiresValueType(object):
@@ -23,9 +35,117 @@ class RequiresValueType(object):
     pass
 
 
-class ToolDockSettings(QtCore.QSettings):
-    def __init__(self, *args, **kwargs):
-        super(ToolDockSettings, self).__init__(*args, **kwargs)
+class ToolDockSettings(object):
+    """
+    Settings interface used throughout the tool
+
+    Mirrors the parts of the QSettings API that are used, the actual storage is handled by a SettingsBackend.
+    Writes are buffered and flushed to the backend in one batch when the event loop is idle,
+    after flush_interval milliseconds, or when flush() is called.
+    """
+    k_flush_interval = "settings_flush_interval"
+
+    def __init__(self, backend):
+        self.backend = backend  # type: tds.SettingsBackend
+
+        # dirty keys, waiting to be written to the backend
+        self._pending = {}
+        self._flush_timer = None
+
+        # shared read-only values, see get_snapshot
+        self._snapshots = {}
+
+        # 0 means flush as soon as the event loop is idle
+        self.flush_interval = int(self.backend.value(self.k_flush_interval, 0) or 0)
+
+    def value(self, key, defaultValue=None):
+        if key in self._pending:
+            pending_val = self._pending[key]
+            return copy(pending_val) if isinstance(pending_val, (dict, list)) else pending_val
+
+        return self.backend.value(key, default=defaultValue)
+
+    def setValue(self, key, value):
+        # nothing changed, so nothing to write
+        if self.value(key) == value:
+            return
+        self._pending[key] = copy(value) if isinstance(value, (dict, list)) else value
+        self._snapshots.pop(key, None)
+        self._schedule_flush()
+
+    def set_dict_value(self, key, sub_key, value):
+        """Set a single entry of a dict setting, without writing the rest of the dict again"""
+        dict_value = self._pending.get(key)
+        if not isinstance(dict_value, dict):
+            dict_value = self.get_value(key, default=dict())
+
+        if sub_key in dict_value and dict_value[sub_key] == value:
+            return
+
+        dict_value[sub_key] = value
+        self._pending[key] = dict_value
+        self._snapshots.pop(key, None)
+        self._schedule_flush()
+
+    def remove(self, key):
+        # removing a key can also remove a whole group, easiest to let the backend deal with that
+        self.flush()
+        self.backend.remove(key)
+        self._snapshots.clear()
+
+    def contains(self, key):
+        return key in self._pending or self.backend.contains(key)
+
+    def allKeys(self):
+        return list(set(self.backend.keys()).union(self._pending.keys()))
+
+    def is_dirty(self):
+        return bool(self._pending)
+
+    def flush(self):
+        """Write all pending values to the backend"""
+        if self._flush_timer is not None:
+            self._flush_timer.stop()
+
+        pending = self._pending
+        self._pending = {}
+        for key, val in pending.items():
+            self.backend.set_value(key, val)
+
+        if pending:
+            self.backend.sync()
+
+    def sync(self):
+        self.flush()
+
+    def _schedule_flush(self):
+        app = QtCore.QCoreApplication.instance()
+        if app is None:
+            self.flush()
+            return
+
+        if self._flush_timer is None:
+            self._flush_timer = QtCore.QTimer()
+            self._flush_timer.setSingleShot(True)
+            self._flush_timer.timeout.connect(self.flush)
+            app.aboutToQuit.connect(self.flush)
+
+        if not self._flush_timer.isActive():
+            self._flush_timer.start(self.flush_interval)
+
+    def fileName(self):
+        return self.backend.file_name()
+
+    def get_group(self, prefix):
+        """Get all values in group as a dict of {relative key: value}"""
+        group_values = self.backend.group(prefix)
+
+        group_prefix = "{}/".format(prefix.rstrip("/"))
+        for key, val in self._pending.items():
+            if key.startswith(group_prefix):
+                group_values[key[len(group_prefix):]] = val
+
+        return group_values
 
     def get_value(self, key, default=None):
         data_type = None
@@ -56,21 +176,103 @@ class ToolDockSettings(QtCore.QSettings):
 
         return settings_val
 
+    def get_snapshot(self, key, default=None):
+        """
+        Same as get_value, but the value is shared between all callers until the key is written again
+
+        Saves decoding and copying the same setting for every tool in every window. Don't modify the returned value.
+        """
+        if key not in self._snapshots:
+            self._snapshots[key] = self.get_value(key, default=default)
+        return self._snapshots[key]
+
+    def clear_snapshots(self):
+        self._snapshots.clear()
+
+    def remove_dict_value(self, key, sub_key):
+        """Remove a single entry from a dict setting"""
+        dict_value = self._pending.get(key)
+        if not isinstance(dict_value, dict):
+            dict_value = self.get_value(key, default=dict())
+
+        if sub_key not in dict_value:
+            return
+
+        dict_value.pop(sub_key)
+        self._pending[key] = dict_value
+        self._snapshots.pop(key, None)
+        self._schedule_flush()
+
     def set_user_color(self, tool_name, color):
-        user_colors = self.get_value(lk.user_colors, default=dict())
-        user_colors[tool_name] = color
-        self.setValue(lk.user_colors, user_colors)
+        # None means no override, so there's no need to store it
+        if color is None:
+            self.remove_dict_value(lk.user_colors, tool_name)
+        else:
+            self.set_dict_value(lk.user_colors, tool_name, color)
 
     def set_user_label(self, tool_name, label):
-        user_labels = self.get_value(lk.user_labels, default=dict())
-        user_labels[tool_name] = label
-        self.setValue(lk.user_labels, user_labels)
+        if label is None:
+            self.remove_dict_value(lk.user_labels, tool_name)
+        else:
+            self.set_dict_value(lk.user_labels, tool_name, label)
 
     def set_tools_as_viewed(self):
         available_tools = [cls.TOOL_NAME for cls in get_tool_classes()]
         self.setValue(lk.last_viewed_tools, available_tools)
 
 
+class ToolRegistry(object):
+    """
+    Everything the windows need to know about the available tools, shared by all ToolDockWindows in the session
+
+    Discovery, run signatures and icons are only worked out once,
+    so additional windows only pay for building the widgets of their own tools.
+    """
+
+    def __init__(self):
+        self._tool_classes = None
+        self._tool_classes_by_name = {}
+        self._func_arguments = {}
+        self.generation = 0  # goes up every time the registry is invalidated
+
+    def invalidate(self):
+        """Rediscover tools on next access, call after tools were added or modules were reloaded"""
+        self.generation += 1
+        self._tool_classes = None
+        self._tool_classes_by_name = {}
+        self._func_arguments = {}
+        lk.settings.clear_snapshots()
+
+    def get_tool_classes(self):
+        if self._tool_classes is None:
+            if not lk.dynamic_classes_generated:
+                lk.generate_dynamic_classes()
+
+            # get all base sub classes
+            tool_classes = list(all_subclasses(ToolDockItemBase))
+            tool_classes.extend(lk.dynamic_classes.values())
+
+            self._tool_classes = tool_classes
+            self._tool_classes_by_name = {tool_cls.TOOL_NAME: tool_cls for tool_cls in tool_classes}
+
+        return list(self._tool_classes)
+
+    def get_tool_class(self, tool_name):
+        if self._tool_classes is None:
+            self.get_tool_classes()
+        return self._tool_classes_by_name.get(tool_name)
+
+    def get_func_arguments(self, func):
+        func_key = getattr(func, "__func__", func)  # same entry for the bound methods of every instance
+        if func_key not in self._func_arguments:
+            self._func_arguments[func_key] = get_func_arguments(func)
+        return collections.OrderedDict(self._func_arguments[func_key])
+
+    def get_icon(self, icon_path):
+        """QIcon from an image path or the name of an icon in the icons folder"""
+        return ui_utils.icon_cache.get_icon(icon_path)
+
+
 class LocalConstants(object):
     # generate custom py scripts from folder
     dynamic_classes_generated = False
@@ -86,10 +288,60 @@ class LocalConstants(object):
     user_labels = "user_labels"
     last_viewed_tools = "last_viewed_tools"  # list of tools seen in tool
     button_text_padding_multiplier = "button_text_padding_multiplier"
+    tool_last_seen = "tool_last_seen"  # time stored tools were first found missing from the registry
+    compact_settings_on_startup = "compact_settings_on_startup"
+    compact_settings_grace_days = "compact_settings_grace_days"
+    staged_restore = "staged_restore"  # fill restored windows when the dcc is idle, instead of during startup
+    staged_restore_step_budget = "staged_restore_step_budget"  # milliseconds per idle step
+    mirror_script_folders = "mirror_script_folders"  # run and preview scripts from a local copy
+    idle_warmup = "idle_warmup"  # preload icons, imports and scripts when the event loop is idle
+    idle_task_time_slice = "idle_task_time_slice"  # milliseconds of idle work per event loop pass
+    warmup_scheduled = False
+    recent_tools = "recent_tools"  # names of the most recently run tools, most recent first
+    recent_tool_count = 20
+    recent_tool_names = None  # kept in memory while tools run, written with the window settings and on quit
+    script_code_cache = {}  # script path: (mtime, compiled code)
+
+    stall_watchdog = "stall_watchdog"  # log the stack of the GUI thread when it stops responding
+    stall_watchdog_threshold = "stall_watchdog_threshold"  # seconds
+
+    log_level = "log_level"  # lowest level of tool_dock messages shown in the output panel
+    stdout_log_level = "stdout_log_level"  # lowest level of tool_dock messages also printed to the script editor
+    tool_output_to_script_editor = "tool_output_to_script_editor"  # print tool output in the script editor as well
+
+    command_server = "command_server"  # accept commands from external devices and scripts, see tool_dock_ipc
+    command_server_port = "command_server_port"
+    command_server_instance = None
+
+    # TOOL_NAME of the tool that's currently running, reported by the stall watchdog
+    current_tool_name = None
+    watchdog = None
+
+    # per tooldock dict settings with an entry per tool
+    tooldock_tool_dict_keys = ("tool_splitters", "param_grid")
+
+    settings_compacted = False
+
+    # script previews only read the start of each file
+    preview_max_bytes = 64 * 1024
+    preview_mmap_threshold = 1024 * 1024
+
+    # tool classes, signatures and icons, shared by every window
+    registry = ToolRegistry()
+
+    # search index of all tools, shared by every window
+    tool_search_index = tool_dock_search.ToolSearchIndex()
+    tool_search_index_source = None  # (registry generation, user labels) the index was last updated with
+
+    # index of the source code of all tools, saved next to the settings file
+    fulltext_index = tool_dock_search.FullTextIndex()
+    fulltext_index_loaded = False
+    fulltext_max_bytes = 256 * 1024
+    command_palette_hotkey = "command_palette_hotkey"
 
     # only make one settings instance for use everywhere
-    settings = ToolDockSettings(QtCore.QSettings.IniFormat, QtCore.QSettings.UserScope,
-                                'tool_dock', '{dcc}_tool_dock'.format(dcc=ui_utils.dcc_name.lower()))
+    settings = ToolDockSettings(tds.create_backend('tool_dock',
+                                                   '{dcc}_tool_dock'.format(dcc=ui_utils.dcc_name.lower())))
 
     # a base scripts folder can be defined via this environment variable
     # script files in this folder structure will be added as dynamic classes
@@ -99,28 +351,46 @@ class LocalConstants(object):
         if not self.script_folders:
             return
 
-        for script_folder in self.script_folders.split(";"):
-            if not script_folder:  # ignore empty strings
-                continue
-
-            if not os.path.exists(script_folder):
-                continue
-
+        for script_folder in get_script_folders():
             self.dynamic_classes_from_script_folder(script_folder)
 
         if len(self.dynamic_classes.keys()) > 0:
-            print("Generated: {} tool(s) from files in: {}".format(len(self.dynamic_classes), self.script_folders))
+            log.info("Generated: {} tool(s) from files in: {}".format(len(self.dynamic_classes), self.script_folders))
 
         # generate classes user specified script paths
         user_script_classes = self.dynamic_classes_from_user_settings()
         if len(user_script_classes):
-            print("Generated: {} tool(s) from user scripts".format(len(user_script_classes)))
+            log.info("Generated: {} tool(s) from user scripts".format(len(user_script_classes)))
 
         self.dynamic_classes_generated = True
 
     def dynamic_classes_from_script_folder(self, script_folder):
-        """Find all scripts in folder structure and add them as tool classes"""
-        for script_path in get_paths_in_folder(script_folder, extension_filter=".py"):
+        """
+        Find all scripts in folder structure (or zip bundle) and add them as tool descriptors
+
+        The whole folder structure is walked to find the tool names, but the scripts themselves
+        aren't read until a tool is shown or run.
+        """
+        script_mirror = get_script_mirror(script_folder)
+        if tool_dock_bundle.is_bundle_path(script_folder):
+            script_paths = tool_dock_bundle.get_bundle(script_folder).get_script_paths()
+        elif script_mirror:
+            # the same walk is used to find the tools and to sync the mirror
+            try:
+                relative_paths = script_mirror.walk_source_folder()
+            except OSError:
+                relative_paths = None
+
+            if relative_paths is None:
+                script_paths = script_mirror.get_source_paths()  # last mirrored version
+            else:
+                script_paths = ["{}/{}".format(script_mirror.source_folder, relative_path)
+                                for relative_path in relative_paths if relative_path.endswith(".py")]
+            script_mirror.start_sync(relative_paths)
+        else:
+            script_paths = get_paths_in_folder(script_folder, extension_filter=".py")
+
+        for script_path in script_paths:
             self.dynamic_class_from_script(script_path)
 
     def dynamic_classes_from_user_settings(self):
@@ -128,7 +398,7 @@ class LocalConstants(object):
         script_classes = []
         for user_script_path in self.settings.get_value(lk.user_script_paths, default=list()):
             if not os.path.exists(user_script_path):
-                print("Script path does not exist: {}".format(user_script_path))
+                log.warning("Script path does not exist: {}".format(user_script_path))
                 continue
 
             script_cls = self.dynamic_class_from_script(user_script_path)
@@ -147,14 +417,17 @@ class LocalConstants(object):
             return
 
         script_path = script_path.replace("\\", "/")  # backslash safety
-        script_cls = make_class_from_script(script_path, tool_name=script_name)
+        script_cls = ScriptToolDescriptor(script_path, tool_name=script_name)
 
         self.dynamic_classes[script_name] = script_cls
+        self.registry.invalidate()
 
         return script_cls
 
 
 lk = LocalConstants()
+tool_dock_output.setup_logging(level=lk.settings.get_value(lk.log_level, default="INFO"),
+                               stdout_level=lk.settings.get_value(lk.stdout_log_level, default="WARNING"))
 
 
 class _InternalToolDockItemBase(QtWidgets.QWidget):
@@ -167,6 +440,12 @@ class _InternalToolDockItemBase(QtWidgets.QWidget):
     BACKGROUND_COLOR = None
     ICON = None
     REGISTER_SCENE_CALLBACK = False
+    WARM_IMPORTS = []  # module names to import when the event loop is idle, so the first run isn't slowed down
+
+    # run context, see dcc_interface.run_context
+    SUSPEND_REFRESH = False  # don't redraw the viewport while the tool runs
+    UNDO_CHUNK = False  # undo everything the tool did in one step
+    DISABLE_AUTOKEY = False  # turn off autokey while the tool runs
 
     SCRIPT_PATH = None  # used by dynamically generated classes
     IS_USER_SCRIPT = False  # is set to true for dynamically generated user scripts
@@ -191,13 +470,17 @@ class _InternalToolDockItemBase(QtWidgets.QWidget):
             {"Set Label": self.open_button_label_editor},
             {"Set Background Color": self.open_background_color_picker},
             "-",
-            {"Set Splitter - Vertical": partial(self.set_splitter_orientation, True)},
-            {"Set Splitter - Horizontal": partial(self.set_splitter_orientation, False)},
-            "-",
             {"Reset Label": self.reset_tool_label},
             {"Reset Background Color": self.reset_background_color},
         ]
 
+        # only shown when the tool has a parameter grid
+        self._splitter_context_menu_actions = [
+            "-",
+            {"Set Splitter - Vertical": partial(self.set_splitter_orientation, True)},
+            {"Set Splitter - Horizontal": partial(self.set_splitter_orientation, False)},
+        ]
+
         if self.SCRIPT_PATH:
             self.context_menu_actions.insert(
                 0, {"Open in Script Editor": partial(dcc_interface.open_script_in_editor, self.SCRIPT_PATH)}
@@ -213,30 +496,21 @@ class _InternalToolDockItemBase(QtWidgets.QWidget):
         self._tool_actions = self.get_tool_actions()
         self._parameters_auto_generated = False
 
-        # Splitter between parameter_grid and 'run' buttons
-        self.main_splitter = QtWidgets.QSplitter()
+        # parameter grid and the splitter between it and the 'run' buttons are only built on first access
+        # most tools are plain buttons, so this saves a fair amount of widgets in larger docks
+        self._param_grid = None
+        self._main_splitter = None
+        self._background_color = None
 
-        # parameter grid
-        self.param_grid = parameter_grid.ParameterGrid()
-        self.param_grid.setSizePolicy(QtWidgets.QSizePolicy.Ignored, QtWidgets.QSizePolicy.Ignored)
-        self.param_grid.setHeaderHidden(True)
-        self.param_grid.setEditTriggers(self.param_grid.NoEditTriggers)
-        self.main_splitter.addWidget(self.param_grid)
-
-        # build run buttons and add to splitter
+        # build run buttons
         self.main_ui_widget = self.build_ui_widget()
-        self.main_splitter.addWidget(self.main_ui_widget)
-
-        # default hide parameter grid
-        self.main_splitter.handle(1).setEnabled(False)
-        self.main_splitter.setSizes([0, 100])
-        self.main_layout.addWidget(self.main_splitter)
+        self.main_layout.addWidget(self.main_ui_widget)
 
         ####################################################################
         # get user color override
         self._default_background_color = self.BACKGROUND_COLOR
 
-        user_colors = self.settings.get_value(lk.user_colors, default=dict())
+        user_colors = self.settings.get_snapshot(lk.user_colors, default=dict())
         user_color_override = user_colors.get(self.TOOL_NAME)
         if user_color_override:
             self.BACKGROUND_COLOR = user_color_override
@@ -248,21 +522,61 @@ class _InternalToolDockItemBase(QtWidgets.QWidget):
         # get user label override
         self._default_label = self.TOOL_LABEL
 
-        user_labels = self.settings.get_value(lk.user_labels, default=dict())
+        user_labels = self.settings.get_snapshot(lk.user_labels, default=dict())
         user_label_override = user_labels.get(self.TOOL_NAME)
         if user_label_override is not None:
             self.TOOL_LABEL = user_label_override
         self.set_tool_label(self.TOOL_LABEL)
 
+    @property
+    def param_grid(self):
+        """ParameterGrid of the tool, created (along with main_splitter) the first time it's accessed"""
+        if self._param_grid is None:
+            self._build_param_grid()
+        return self._param_grid
+
+    @property
+    def main_splitter(self):
+        """Splitter between parameter_grid and 'run' buttons, None if the tool has no parameter grid"""
+        return self._main_splitter
+
+    def has_param_grid(self):
+        return self._param_grid is not None
+
+    def _build_param_grid(self):
+        # Splitter between parameter_grid and 'run' buttons
+        self._main_splitter = QtWidgets.QSplitter()
+
+        # parameter grid
+        self._param_grid = parameter_grid.ParameterGrid()
+        self._param_grid.setSizePolicy(QtWidgets.QSizePolicy.Ignored, QtWidgets.QSizePolicy.Ignored)
+        self._param_grid.setHeaderHidden(True)
+        self._param_grid.setEditTriggers(self._param_grid.NoEditTriggers)
+        self._main_splitter.addWidget(self._param_grid)
+
+        # move run buttons from main layout into splitter
+        self.main_layout.removeWidget(self.main_ui_widget)
+        self._main_splitter.addWidget(self.main_ui_widget)
+
+        # default hide parameter grid
+        self._main_splitter.handle(1).setEnabled(False)
+        self._main_splitter.setSizes([0, 100])
+        self.main_layout.addWidget(self._main_splitter)
+
+        # grid was created after the background color was set
+        self._set_param_grid_color(self._background_color)
+
     def open_context_menu(self):
         action_list = copy(self.context_menu_actions)
         action_list.append("-")
         action_list.extend(self._internal_context_menu_actions)
+        if self.has_param_grid():
+            action_list.extend(self._splitter_context_menu_actions)
         return ui_utils.build_menu_from_action_list(action_list)
 
     def auto_populate_parameters(self):
         """Convenience function for generating parameters based on arguments of 'run'"""
-        run_arguments = get_func_arguments(self.run)
+        run_arguments = lk.registry.get_func_arguments(self.run)
 
         if not run_arguments:
             return
@@ -281,6 +595,8 @@ class _InternalToolDockItemBase(QtWidgets.QWidget):
             self._parameters_auto_generated = True
 
     def set_splitter_orientation(self, vertical=True):
+        if self.main_splitter is None:
+            return
         orientation = QtCore.Qt.Vertical if vertical else QtCore.Qt.Horizontal
         self.main_splitter.setOrientation(orientation)
 
@@ -312,8 +628,9 @@ class _InternalToolDockItemBase(QtWidgets.QWidget):
             if self.ICON:
                 # if it's a string, assume it's a path to an icon image
                 if isinstance(self.ICON, str):
-                    self.ICON = QtGui.QIcon(self.ICON)
-                btn.setIcon(self.ICON)
+                    btn.set_icon_path(self.ICON)
+                else:
+                    btn.setIcon(self.ICON)
 
             main_widget = btn
 
@@ -338,12 +655,25 @@ class _InternalToolDockItemBase(QtWidgets.QWidget):
         if isinstance(color, QtGui.QColor):
             color = color.getRgb()[:3]
 
-        param_grid_header = self.param_grid.header()  # type: QtWidgets.QHeaderView
+        self._background_color = color
 
         # reset colors
         if color is None:
             self.main_ui_widget.setStyleSheet("")
-            self.param_grid.setStyleSheet("")
+        else:
+            self.main_ui_widget.setStyleSheet(background_form.format(*color))
+
+        self._set_param_grid_color(color)
+
+    def _set_param_grid_color(self, color):
+        if self._param_grid is None:
+            return
+
+        param_grid_header = self._param_grid.header()  # type: QtWidgets.QHeaderView
+
+        # reset colors
+        if color is None:
+            self._param_grid.setStyleSheet("")
             param_grid_header.setStyleSheet("")
             return
 
@@ -353,9 +683,7 @@ class _InternalToolDockItemBase(QtWidgets.QWidget):
         col.setHsv(col.hue(), col.saturation() * 0.5, col.value() * 0.5)
         subtle_color = col.getRgb()[:3]
 
-        # set colors on widgets
-        self.main_ui_widget.setStyleSheet(background_form.format(*color))
-        self.param_grid.setStyleSheet("QTreeView{{background-color:rgb({},{},{})}}".format(*subtle_color))
+        self._param_grid.setStyleSheet("QTreeView{{background-color:rgb({},{},{})}}".format(*subtle_color))
         param_grid_header.setStyleSheet(background_form.format(*color))
 
     def reset_background_color(self):
@@ -398,9 +726,13 @@ class _InternalToolDockItemBase(QtWidgets.QWidget):
     def post_init(self):
         # auto generate parameter widgets if run function has arguments
         # skip if parameters have been manually defined
-        if not self.param_grid.parameters:
+        if not self.has_param_grid() or not self.param_grid.parameters:
             self.auto_populate_parameters()
 
+        # no parameters defined or generated, so there's no grid to show
+        if not self.has_param_grid():
+            return
+
         # show parameter grid if parameters are defined
         if self.param_grid.parameters:
             self.main_splitter.handle(1).setEnabled(True)
@@ -410,20 +742,42 @@ class _InternalToolDockItemBase(QtWidgets.QWidget):
 
     def _on_scene_change(self, *args, **kwargs):
         """internal method because maya callbacks sends args and I don't want to have to define that everywhere"""
-        self.on_scene_change()
+        previous_tool_name, lk.current_tool_name = lk.current_tool_name, self.TOOL_NAME
+        try:
+            self.on_scene_change()
+        finally:
+            lk.current_tool_name = previous_tool_name
 
     def _run(self, func=None):
-        kwargs = {}  # maybe put something in here by default? not sure
-        if func:
-            func(**kwargs)
-        else:
-            if self._parameters_auto_generated:
-                kwargs = self.param_grid.as_data()
-            self.run(**kwargs)
+        return self._execute(func=func)
+
+    def _execute(self, func=None, parameters=None):
+        """
+        :param func: function to run instead of run
+        :param parameters: keyword arguments for run, on top of the values in the parameter grid
+        :return: what the tool returned
+        """
+        previous_tool_name, lk.current_tool_name = lk.current_tool_name, self.TOOL_NAME
+        add_recent_tool(self.TOOL_NAME)
+        try:
+            kwargs = {}  # maybe put something in here by default? not sure
+            passthrough = lk.settings.get_snapshot(lk.tool_output_to_script_editor, default=False)
+            with tool_dock_output.capture(self.TOOL_NAME, passthrough=passthrough):
+                with dcc_interface.run_context(self):
+                    if func:
+                        return func(**kwargs)
+
+                    if self._parameters_auto_generated:
+                        kwargs = self.param_grid.as_data()
+                    if parameters:
+                        kwargs.update(parameters)
+                    return self.run(**kwargs)
+        finally:
+            lk.current_tool_name = previous_tool_name
 
     # to overwrite
     def run(self, *args, **kwargs):
-        print("'run' not implemented: {}".format(self.TOOL_NAME))
+        log.warning("'run' not implemented: {}".format(self.TOOL_NAME))
 
     def get_tool_actions(self):
         return {}
@@ -482,9 +836,12 @@ def import_extra_modules(refresh=False):
 
         try:
             importlib.import_module(module_import_str)
-            print("Imported tool_dock extension: {}".format(module_import_str))
+            log.info("Imported tool_dock extension: {}".format(module_import_str))
         except Exception as e:
-            traceback.print_exc()
+            log.exception("Failed to import tool_dock extension: {}".format(module_import_str))
+
+    # new tool classes might have been defined by the imported modules
+    lk.registry.invalidate()
 
 
 def get_func_arguments(func):
@@ -510,32 +867,256 @@ def all_subclasses(cls):
 
 
 def get_tool_classes():
-    if not lk.dynamic_classes_generated:
-        lk.generate_dynamic_classes()
+    return lk.registry.get_tool_classes()
+
+
+def get_current_tool_name():
+    return lk.current_tool_name
+
+
+def start_stall_watchdog(threshold=None):
+    """Start logging stalls of the GUI thread, once per session. Call from the GUI thread"""
+    if lk.watchdog is not None:
+        return lk.watchdog
+
+    if threshold is None:
+        threshold = lk.settings.get_value(lk.stall_watchdog_threshold, default=2.0)
+
+    log_path = tool_dock_watchdog.get_default_log_path(lk.settings.fileName())
+    tool_dock_watchdog.setup_log_file(log_path)
+
+    lk.watchdog = tool_dock_watchdog.StallWatchdog(threshold=threshold, get_current_tool=get_current_tool_name)
+    lk.watchdog.start()
+    log.info("Started stall watchdog, logging to: {}".format(log_path))
+    return lk.watchdog
+
+
+def stop_stall_watchdog():
+    if lk.watchdog is None:
+        return
+    lk.watchdog.stop()
+    lk.watchdog = None
+
+
+def run_tool(tool_name, parameters=None):
+    """
+    Run a tool on a temporary instance, for when it isn't docked anywhere
+
+    :param parameters: keyword arguments for the run function of the tool
+    :return: what the tool returned
+    """
+    tool_item_cls = lk.registry.get_tool_class(tool_name)
+    if tool_item_cls is None:
+        raise ValueError("Tool not found: {}".format(tool_name))
+
+    tool_item = tool_item_cls()  # type:ToolDockItemBase
+    tool_item.post_init()
+    try:
+        return tool_item._execute(parameters=parameters)
+    finally:
+        tool_item.deleteLater()
+
+
+def get_tool_infos():
+    """Name, label and tooltip of all available tools, as sent by the command server"""
+    user_labels = lk.settings.get_snapshot(lk.user_labels, default=dict())
+    tool_infos = []
+    for tool_cls in sorted(lk.registry.get_tool_classes(), key=lambda cls: cls.TOOL_NAME):
+        tool_infos.append({
+            "name": tool_cls.TOOL_NAME,
+            "label": user_labels.get(tool_cls.TOOL_NAME) or tool_cls.TOOL_LABEL or tool_cls.TOOL_NAME,
+            "tooltip": tool_cls.TOOL_TIP,
+        })
+    return tool_infos
+
+
+def start_command_server(run_tool_func=None, port=None, executor=None):
+    """
+    Start accepting commands over a local socket, once per session. Call from the GUI thread
+
+    :param run_tool_func: function(tool_name, parameters) used to run tools, defaults to run_tool
+    :param port: defaults to the command_server_port setting, or the TOOL_DOCK_COMMAND_PORT environment variable
+    :param executor: defaults to the GUI thread, or the connection thread when there's no QApplication
+    """
+    if lk.command_server_instance is not None:
+        return lk.command_server_instance
+
+    if port is None:
+        port = lk.settings.get_value(lk.command_server_port, default=None)
+
+    command_handler = tool_dock_ipc.CommandHandler(list_tools=get_tool_infos,
+                                                   run_tool=run_tool_func or run_tool,
+                                                   executor=executor or tool_dock_ipc.create_executor())
+    server = tool_dock_ipc.CommandServer(command_handler, port=port)
+    try:
+        server.start()
+    except (OSError, socket.error) as e:
+        log.warning("Failed to start command server on port: {} - {}".format(server.port, e))
+        return None
+
+    lk.command_server_instance = server
+    return server
+
 
-    # get all base sub classes
-    subclasses = list(all_subclasses(ToolDockItemBase))
-    subclasses.extend(lk.dynamic_classes.values())
-    return subclasses
+def stop_command_server():
+    if lk.command_server_instance is None:
+        return
+    lk.command_server_instance.stop()
+    lk.command_server_instance = None
+
+
+def compact_settings(settings=None, grace_period_days=None):
+    """
+    Remove settings entries for tools that no longer exist, and overrides that are set to None
 
+    Tools that aren't found in the registry are kept for grace_period_days after they were first found missing,
+    so a script folder being offline for a day doesn't wipe all user colors and labels.
+    Only missing tools are timestamped, so compacting doesn't grow the settings with an entry per registered tool.
 
-def get_preview_from_script_path(script_path, max_line_count=None):
+    :param settings: defaults to the shared settings
+    :type settings: ToolDockSettings
+    :param grace_period_days: defaults to the value in settings, or 30 days
+    :return: dict with info about what was removed and the size of the compacted settings
+    """
+    if settings is None:
+        settings = lk.settings
+
+    if grace_period_days is None:
+        grace_period_days = settings.get_value(lk.compact_settings_grace_days, default=30.0)
+
+    settings.flush()
+
+    # dict settings with an entry per tool
+    tool_dict_keys = [lk.user_colors, lk.user_labels]
+    for key in settings.allKeys():
+        if "/" in key and key.split("/", 1)[-1] in lk.tooldock_tool_dict_keys:
+            tool_dict_keys.append(key)
+
+    tool_dicts = {key: settings.get_value(key, default=dict()) for key in tool_dict_keys}
+    last_viewed_tools = settings.get_value(lk.last_viewed_tools, default=list())
+    last_seen = settings.get_value(lk.tool_last_seen, default=dict())
+
+    size_before = _get_settings_size(list(tool_dicts.values()), last_viewed_tools, last_seen)
+
+    # every tool mentioned in the settings
+    stored_tool_names = set(last_viewed_tools)
+    for tool_dict in tool_dicts.values():
+        stored_tool_names.update(tool_dict.keys())
+
+    # only tools that are missing get a timestamp, it's removed again when they come back
+    now = time.time()
+    registered_tool_names = set([tool_cls.TOOL_NAME for tool_cls in get_tool_classes()])
+    for tool_name in [name for name in last_seen if name in registered_tool_names or name not in stored_tool_names]:
+        last_seen.pop(tool_name)
+
+    # find tools that have been missing from the registry for longer than the grace period
+    stale_tool_names = set()
+    for tool_name in stored_tool_names.difference(registered_tool_names):
+        if tool_name not in last_seen:
+            last_seen[tool_name] = now  # start grace period
+        elif now - last_seen[tool_name] > grace_period_days * 86400:
+            stale_tool_names.add(tool_name)
+
+    removed_entry_count = 0
+    for key, tool_dict in tool_dicts.items():
+        compacted_dict = {tool_name: val for tool_name, val in tool_dict.items()
+                          if val is not None and tool_name not in stale_tool_names}
+        if len(compacted_dict) != len(tool_dict):
+            removed_entry_count += len(tool_dict) - len(compacted_dict)
+            tool_dicts[key] = compacted_dict
+            settings.setValue(key, compacted_dict)
+
+    compacted_viewed_tools = [tool_name for tool_name in last_viewed_tools if tool_name not in stale_tool_names]
+    if len(compacted_viewed_tools) != len(last_viewed_tools):
+        removed_entry_count += len(last_viewed_tools) - len(compacted_viewed_tools)
+        settings.setValue(lk.last_viewed_tools, compacted_viewed_tools)
+
+    for tool_name in stale_tool_names:
+        last_seen.pop(tool_name, None)
+    settings.setValue(lk.tool_last_seen, last_seen)
+
+    settings.flush()
+    size_after = _get_settings_size(list(tool_dicts.values()), compacted_viewed_tools, last_seen)
+
+    compact_info = {
+        "removed_tools": sorted(stale_tool_names),
+        "removed_entries": removed_entry_count,
+        "size_before": size_before,
+        "size_after": size_after,
+        "size_saved": size_before - size_after,
+    }
+    log.info("Compacted tool_dock settings: removed {} entries for {} stale tool(s), saved {} bytes".format(
+        removed_entry_count, len(stale_tool_names), compact_info["size_saved"]))
+    return compact_info
+
+
+def _get_settings_size(*values):
+    """Approximate size in bytes of the values as they're stored"""
+    return len(json.dumps(tds.encode_value(list(values))))
+
+
+def read_script_head(script_path, max_bytes=None):
+    """
+    Read the start of a script file, large files are memory mapped so only the head is read from disk
+
+    :param script_path: script file path
+    :param max_bytes: max number of bytes to read, defaults to lk.preview_max_bytes
+    :return: script text and whether it was truncated
+    """
+    if max_bytes is None:
+        max_bytes = lk.preview_max_bytes
+
+    if tool_dock_bundle.split_bundle_path(script_path):
+        script_data = tool_dock_bundle.read_script_bytes(script_path)
+        file_size = len(script_data)
+        script_data = script_data[:max_bytes]
+    else:
+        script_data, file_size = _read_file_head(tool_dock_mirror.get_local_path(script_path), max_bytes)
+
+    truncated = file_size > max_bytes
+    if truncated and b"\n" in script_data:
+        script_data = script_data[:script_data.rindex(b"\n") + 1]  # don't end on half a line
+
+    return script_data.decode("utf-8", "replace"), truncated
+
+
+def _read_file_head(script_path, max_bytes):
+    """
+    :return: the first max_bytes of the file and the size of the whole file
+    """
+    with open(script_path, "rb") as fp:
+        file_size = os.fstat(fp.fileno()).st_size
+        if file_size > lk.preview_mmap_threshold:
+            mapped_file = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                script_data = mapped_file[:max_bytes]
+            finally:
+                mapped_file.close()
+        else:
+            script_data = fp.read(max_bytes)
+
+    return script_data, file_size
+
+
+def get_preview_from_script_path(script_path, max_line_count=None, max_bytes=None):
     """
     Open file and read a couple of lines
     :param script_path: script file path
     :type script_path: str
     :param max_line_count: truncate preview to a certain line count
     :type max_line_count: int
+    :param max_bytes: only read this much of the file, defaults to lk.preview_max_bytes
+    :type max_bytes: int
     :return:
     """
-    with open(script_path, "r") as fp:
-        script_lines = fp.readlines()
+    script_text, truncated = read_script_head(script_path, max_bytes=max_bytes)
+    script_lines = script_text.splitlines(True)
 
     if max_line_count is None:
         max_line_count = len(script_lines)
 
     script_code = "".join(script_lines[:max_line_count])
-    if len(script_lines) > max_line_count:
+    if truncated or len(script_lines) > max_line_count:
         script_code = "{}......".format(script_code)  # indicators that script is truncated
 
     preview_str = "{}\n\n{}\n".format(script_path, script_code)
@@ -556,10 +1137,131 @@ def get_preview_from_tool(tool_cls):
     return script_preview_text
 
 
+def get_fulltext_index_path():
+    settings_path = lk.settings.fileName()
+    return "{}_fulltext_index.json".format(os.path.splitext(settings_path)[0])
+
+
+def get_tool_source_info(tool_cls):
+    """
+    :return: source path, modification time, function that returns the source text
+    """
+    if tool_cls.SCRIPT_PATH:
+        source_path = tool_cls.SCRIPT_PATH
+        read_source = partial(_read_script_text, source_path)
+        if tool_dock_bundle.split_bundle_path(source_path):
+            return source_path, tool_dock_bundle.get_script_mtime(source_path), read_source
+        return source_path, os.path.getmtime(tool_dock_mirror.get_local_path(source_path)), read_source
+    else:
+        source_path = inspect.getsourcefile(tool_cls)
+        read_source = partial(inspect.getsource, tool_cls)
+
+    return source_path, os.path.getmtime(source_path), read_source
+
+
+def _read_script_text(script_path):
+    return read_script_head(script_path, max_bytes=lk.fulltext_max_bytes)[0]
+
+
+def update_fulltext_index(tool_classes):
+    """
+    Index source of tools that changed since the index was last saved, safe to call from a background thread
+
+    :param tool_classes: tool classes to index, other tools are removed from the index
+    :return: the updated index
+    """
+    index_path = get_fulltext_index_path()
+    if not lk.fulltext_index_loaded:
+        lk.fulltext_index.load(index_path)
+        lk.fulltext_index_loaded = True
+
+    sources = {}
+    for tool_cls in tool_classes:
+        try:
+            sources[tool_cls.TOOL_NAME] = get_tool_source_info(tool_cls)
+        except (OSError, IOError, TypeError):
+            continue  # source not available, eg. script on an offline drive or a builtin
+
+    if lk.fulltext_index.update(sources):
+        lk.fulltext_index.save(index_path)
+
+    return lk.fulltext_index
+
+
 def get_tool_tip_from_tool(tool_cls):
     return "{}\n{}".format(tool_cls.TOOL_NAME, tool_cls.TOOL_TIP)
 
 
+def get_tool_search_index():
+    """Search index of all registered tools, updated with tools that were added, removed or relabeled"""
+    user_labels = lk.settings.get_snapshot(lk.user_labels, default=dict())
+
+    # the labels snapshot is the same object until the labels are changed
+    index_source = lk.tool_search_index_source
+    if index_source is not None and index_source[0] == lk.registry.generation and index_source[1] is user_labels:
+        return lk.tool_search_index
+
+    tool_texts = {}
+    for tool_cls in get_tool_classes():
+        texts = [tool_cls.TOOL_LABEL, user_labels.get(tool_cls.TOOL_NAME), tool_cls.TOOL_TIP]
+        tool_texts[tool_cls.TOOL_NAME] = [text for text in texts if isinstance(text, str)]
+
+    lk.tool_search_index.update(tool_texts)
+    lk.tool_search_index_source = (lk.registry.generation, user_labels)
+    return lk.tool_search_index
+
+
+class ScriptToolDescriptor(object):
+    """
+    Discovered script, stands in for its tool class until the tool is docked or run
+
+    Reads like a tool class to everything that only looks at the class attributes (configure dialog, search, previews),
+    and calling it makes an instance of the real tool class, which is only created on first use.
+    """
+    __slots__ = ("TOOL_NAME", "SCRIPT_PATH", "IS_USER_SCRIPT", "BACKGROUND_COLOR", "_tool_class")
+
+    TOOL_LABEL = None
+    ICON = None
+    WARM_IMPORTS = ()
+
+    def __init__(self, script_path, tool_name):
+        self.TOOL_NAME = tool_name
+        self.SCRIPT_PATH = script_path
+        self.IS_USER_SCRIPT = False
+        self.BACKGROUND_COLOR = None
+        self._tool_class = None
+
+    def __repr__(self):
+        return "<ScriptToolDescriptor {}: {}>".format(self.TOOL_NAME, self.SCRIPT_PATH)
+
+    def __call__(self, *args, **kwargs):
+        return self.get_tool_class()(*args, **kwargs)
+
+    def __setattr__(self, name, value):
+        super(ScriptToolDescriptor, self).__setattr__(name, value)
+
+        # properties set after the tool class was made, eg. BACKGROUND_COLOR, apply to it as well
+        tool_class = getattr(self, "_tool_class", None)
+        if tool_class is not None and name.isupper():
+            setattr(tool_class, name, value)
+
+    @property
+    def TOOL_TIP(self):
+        return self.SCRIPT_PATH
+
+    def is_activated(self):
+        return self._tool_class is not None
+
+    def get_tool_class(self):
+        """The tool class, created the first time it's needed"""
+        if self._tool_class is None:
+            tool_class = make_class_from_script(self.SCRIPT_PATH, tool_name=self.TOOL_NAME)
+            tool_class.IS_USER_SCRIPT = self.IS_USER_SCRIPT
+            tool_class.BACKGROUND_COLOR = self.BACKGROUND_COLOR
+            self._tool_class = tool_class
+        return self._tool_class
+
+
 def make_class_from_script(script_path, tool_name):
     class DynamicClass(_InternalToolDockItemBase):
         TOOL_NAME = tool_name
@@ -567,11 +1269,191 @@ def make_class_from_script(script_path, tool_name):
         SCRIPT_PATH = script_path
 
         def run(self):
-            return runpy.run_path(script_path, init_globals=globals(), run_name="__main__")
+            if tool_dock_bundle.split_bundle_path(script_path):
+                return tool_dock_bundle.run_script(script_path, init_globals=globals(), run_name="__main__")
+            local_script_path = tool_dock_mirror.get_local_path(script_path)
+            return run_script_file(local_script_path, init_globals=globals(), run_name="__main__")
 
     return DynamicClass
 
 
+def get_script_code(script_path):
+    """Compiled code of script, cached until the file changes"""
+    mtime = os.path.getmtime(script_path)
+    cached_code = lk.script_code_cache.get(script_path)
+    if cached_code and cached_code[0] == mtime:
+        return cached_code[1]
+
+    with open(script_path, "rb") as fp:
+        code = compile(fp.read(), script_path, "exec")
+    lk.script_code_cache[script_path] = (mtime, code)
+    return code
+
+
+def run_script_file(script_path, init_globals=None, run_name="__main__"):
+    """Same as runpy.run_path for a script file, but with the compiled code cached"""
+    code = get_script_code(script_path)
+
+    run_globals = dict(init_globals or {})
+    run_globals.update(__name__=run_name, __file__=script_path, __loader__=None, __package__=None)
+
+    # some scripts look at argv, same as runpy
+    argv_0 = sys.argv[0] if sys.argv else None
+    if sys.argv:
+        sys.argv[0] = script_path
+    try:
+        exec(code, run_globals)
+    finally:
+        if sys.argv:
+            sys.argv[0] = argv_0
+    return run_globals
+
+
+def schedule_warmup(tool_classes=None):
+    """Queue work that makes the first use of tools faster, it runs when the event loop is idle"""
+    lk.warmup_scheduled = True
+    if tool_classes is None:
+        tool_classes = get_tool_classes()
+
+    scheduler = tool_dock_scheduler.scheduler
+    scheduler.time_slice = lk.settings.get_value(lk.idle_task_time_slice, default=10)
+    scheduler.add_task(partial(_iter_load_tool_icons, tool_classes),
+                       priority=tool_dock_scheduler.PRIORITY_HIGH, name="load_tool_icons")
+    scheduler.add_task(partial(_iter_warm_imports, tool_classes),
+                       priority=tool_dock_scheduler.PRIORITY_NORMAL, name="warm_imports")
+    scheduler.add_task(get_tool_search_index,
+                       priority=tool_dock_scheduler.PRIORITY_LOW, name="tool_search_index")
+    scheduler.add_task(partial(_iter_compile_scripts, tool_classes),
+                       priority=tool_dock_scheduler.PRIORITY_LOW, name="compile_scripts")
+
+
+def schedule_compact_settings(settings=None):
+    """Compact settings when the event loop is idle, see compact_settings"""
+    tool_dock_scheduler.add_idle_task(partial(compact_settings, settings),
+                                      priority=tool_dock_scheduler.PRIORITY_LOW, name="compact_settings")
+
+
+def _iter_load_tool_icons(tool_classes):
+    for tool_cls in tool_classes:
+        if isinstance(tool_cls.ICON, str):
+            ui_utils.icon_cache.request_icon(tool_cls.ICON, _on_warmup_icon_loaded)
+            yield
+
+
+def _on_warmup_icon_loaded(icon):
+    pass  # nothing to do, the icon is in the cache now
+
+
+def _iter_warm_imports(tool_classes):
+    module_names = []
+    for tool_cls in tool_classes:
+        module_names.extend([module_name for module_name in tool_cls.WARM_IMPORTS if module_name not in module_names])
+
+    for module_name in module_names:
+        if module_name in sys.modules:
+            continue
+
+        try:
+            importlib.import_module(module_name)
+        except Exception as e:
+            log.warning("Failed to pre-import: {} for tools - {}".format(module_name, e))
+        yield
+
+
+def get_recent_tools():
+    """Names of the most recently run tools, most recent first"""
+    if lk.recent_tool_names is None:
+        lk.recent_tool_names = list(lk.settings.get_value(lk.recent_tools, default=list()))
+
+        app = QtCore.QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(_save_recent_tools_on_quit)
+    return lk.recent_tool_names
+
+
+def add_recent_tool(tool_name):
+    """
+    Remember tool as recently run, so its script is compiled ahead of time on the next startup
+
+    Only kept in memory, so running a tool doesn't write the settings file, see save_recent_tools
+    """
+    recent_tools = get_recent_tools()
+    if recent_tools[:1] == [tool_name]:
+        return
+
+    if tool_name in recent_tools:
+        recent_tools.remove(tool_name)
+    recent_tools.insert(0, tool_name)
+    del recent_tools[lk.recent_tool_count:]
+
+
+def save_recent_tools():
+    if lk.recent_tool_names is not None:
+        lk.settings.setValue(lk.recent_tools, lk.recent_tool_names)
+
+
+def _save_recent_tools_on_quit():
+    save_recent_tools()
+    lk.settings.flush()  # the flush timer won't get to run anymore
+
+
+def get_docked_tool_names():
+    """Names of the tools docked in any of the tool dock windows"""
+    tool_names = set()
+    for key in lk.settings.allKeys():
+        if key.endswith("/tools"):
+            tool_names.update(lk.settings.get_value(key, default=list()))
+    return tool_names
+
+
+def _iter_compile_scripts(tool_classes):
+    """Compile scripts of docked and recently run tools, the others are compiled when they're first run"""
+    warm_tool_names = get_docked_tool_names()
+    warm_tool_names.update(get_recent_tools())
+
+    for tool_cls in tool_classes:
+        if not tool_cls.SCRIPT_PATH or tool_cls.TOOL_NAME not in warm_tool_names:
+            continue
+
+        try:
+            bundle_split = tool_dock_bundle.split_bundle_path(tool_cls.SCRIPT_PATH)
+            if bundle_split:
+                tool_dock_bundle.get_bundle(bundle_split[0]).get_code(bundle_split[1])
+            else:
+                get_script_code(tool_dock_mirror.get_local_path(tool_cls.SCRIPT_PATH))
+        except (OSError, IOError, SyntaxError, ValueError):
+            pass  # will show up as an error when the tool is run
+        yield
+
+
+def get_script_folders():
+    """Script folders that exist on disk, or have a local mirror"""
+    if not lk.script_folders:
+        return []
+
+    script_folders = []
+    for script_folder in lk.script_folders.split(";"):
+        if not script_folder:  # ignore empty strings
+            continue
+
+        script_mirror = get_script_mirror(script_folder)
+        if os.path.exists(script_folder) or (script_mirror and script_mirror.has_files()):
+            script_folders.append(script_folder)
+    return script_folders
+
+
+def get_script_mirror(script_folder):
+    """Local mirror of script folder, None if mirroring is turned off"""
+    if not lk.settings.get_snapshot(lk.mirror_script_folders, default=False):
+        return None
+
+    if script_folder.lower().endswith(tool_dock_bundle.bundle_extension):
+        return None  # bundles are already read into memory
+
+    mirror_root = tool_dock_mirror.get_mirror_root(lk.settings.fileName())
+    return tool_dock_mirror.get_mirror(script_folder, mirror_root)
+
+
 def get_paths_in_folder(root_folder, extension_filter=""):
     for folder, _, file_names in os.walk(root_folder):
         for file_name in file_names:
@@ -581,7 +1463,7 @@ def get_paths_in_folder(root_folder, extension_filter=""):
 
 def browse_for_settings_path(save=False):
     dialog = QtWidgets.QFileDialog(ui_utils.get_app_window())
-    dialog.setNameFilter("*.ini")
+    dialog.setNameFilter("*.ini *.json")
 
     if save:
         dialog.setAcceptMode(dialog.AcceptSave)
@@ -607,14 +1489,13 @@ def save_tooldock_settings(settings, current_tooldock, settings_path=None):
     if not settings_path:
         return
 
-    out_settings = ToolDockSettings(settings_path, QtCore.QSettings.IniFormat)
+    out_settings = ToolDockSettings(tds.backend_from_path(settings_path))
 
-    for setting_key in settings.allKeys():  # type: str
-        if not setting_key.startswith(current_tooldock):
-            continue
-        out_settings.setValue(setting_key, settings.get_value(setting_key))
+    for setting_key, setting_value in settings.get_group(current_tooldock).items():
+        out_settings.setValue("{}/{}".format(current_tooldock, setting_key), setting_value)
 
     out_settings.setValue("tooldock", current_tooldock)
+    out_settings.sync()
     return settings_path
 
 
@@ -634,17 +1515,12 @@ def load_tooldock_settings(target_settings=None, target_tooldock="", source_sett
         return
 
     if not isinstance(source_settings, ToolDockSettings):
-        source_settings = ToolDockSettings(source_settings, QtCore.QSettings.IniFormat)
+        source_settings = ToolDockSettings(tds.backend_from_path(source_settings))
 
     settings_tooldock = source_settings.get_value("tooldock")
 
-    for setting_key in source_settings.allKeys():  # type: str
-        if not setting_key.startswith(settings_tooldock):
-            continue
-
+    for setting_key, setting_value in source_settings.get_group(settings_tooldock).items():
         # save data in current tooldock
-        key = setting_key.replace(settings_tooldock, target_tooldock)
-
-        target_settings.setValue(key, source_settings.get_value(setting_key))
+        target_settings.setValue("{}/{}".format(target_tooldock, setting_key), setting_value)
 
     return True
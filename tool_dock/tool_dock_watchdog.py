@@ -0,0 +1,124 @@
+"""
+Watchdog that reports when the GUI thread stops responding
+
+The GUI thread sends a heartbeat from a timer, when that stops for longer than the threshold
+the watchdog thread captures the Python stack of the GUI thread and logs it, along with the tool that was running.
+"""
+import logging
+import logging.handlers
+import os
+import platform
+import sys
+import threading
+import time
+import traceback
+
+from tool_dock.ui.ui_utils import QtCore
+
+env_watchdog_log = "TOOL_DOCK_WATCHDOG_LOG"
+
+log = logging.getLogger("tool_dock.watchdog")
+log.propagate = False
+
+
+class StallWatchdog(threading.Thread):
+    """
+    :param threshold: seconds without heartbeat before a stall is reported
+    :param heartbeat_interval: seconds between heartbeats from the GUI thread
+    :param get_current_tool: function returning the TOOL_NAME of the tool that's currently running, or None
+    """
+
+    def __init__(self, threshold=2.0, heartbeat_interval=0.25, get_current_tool=None):
+        super(StallWatchdog, self).__init__(name="tool_dock_stall_watchdog")
+        self.daemon = True
+
+        self.threshold = threshold
+        self.heartbeat_interval = heartbeat_interval
+        self.get_current_tool = get_current_tool
+
+        self._gui_thread_id = None
+        self._last_heartbeat = time.time()
+        self._stall_start = None  # time of the last heartbeat before the current stall
+        self._stop_event = threading.Event()
+        self._heartbeat_timer = None
+
+    def start(self):
+        """Call from the GUI thread"""
+        self._gui_thread_id = threading.current_thread().ident
+        self._last_heartbeat = time.time()
+
+        self._heartbeat_timer = QtCore.QTimer()
+        self._heartbeat_timer.timeout.connect(self.heartbeat)
+        self._heartbeat_timer.start(int(self.heartbeat_interval * 1000))
+
+        super(StallWatchdog, self).start()
+
+    def stop(self):
+        if self._heartbeat_timer is not None:
+            self._heartbeat_timer.stop()
+        self._stop_event.set()
+
+    def heartbeat(self):
+        self._last_heartbeat = time.time()
+
+    def run(self):
+        check_interval = min(self.heartbeat_interval, self.threshold / 2.0)
+        while not self._stop_event.wait(check_interval):
+            last_heartbeat = self._last_heartbeat
+            stalled_for = time.time() - last_heartbeat
+
+            if stalled_for < self.threshold:
+                if self._stall_start is not None:
+                    log.warning("GUI thread responsive again after {:.1f}s".format(
+                        last_heartbeat - self._stall_start))
+                    self._stall_start = None
+                continue
+
+            # only report each stall once
+            if self._stall_start is not None:
+                continue
+            self._stall_start = last_heartbeat
+            self.report_stall(stalled_for)
+
+    def get_gui_thread_stack(self):
+        frame = sys._current_frames().get(self._gui_thread_id)
+        if frame is None:
+            return "GUI thread stack not available"
+        return "".join(traceback.format_stack(frame))
+
+    def report_stall(self, stalled_for):
+        tool_name = None
+        if self.get_current_tool is not None:
+            tool_name = self.get_current_tool()
+
+        log.warning("GUI thread stalled for {:.1f}s, running tool: {}\n{}".format(
+            stalled_for, tool_name, self.get_gui_thread_stack()))
+
+
+def get_default_log_path(settings_path):
+    """Log file next to the settings file, unless specified with the environment variable"""
+    env_log_path = os.environ.get(env_watchdog_log)
+    if env_log_path:
+        return env_log_path
+    return os.path.join(os.path.dirname(settings_path), "tool_dock_stalls.log")
+
+
+def setup_log_file(log_path, max_bytes=1024 * 1024, backup_count=5):
+    """Write watchdog reports to a rotating log file"""
+    for handler in list(log.handlers):
+        if isinstance(handler, logging.handlers.RotatingFileHandler):
+            if handler.baseFilename == os.path.abspath(log_path):
+                return handler
+            log.removeHandler(handler)
+            handler.close()
+
+    log_folder = os.path.dirname(log_path)
+    if log_folder and not os.path.exists(log_folder):
+        os.makedirs(log_folder)
+
+    handler = logging.handlers.RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backup_count)
+    handler.setFormatter(logging.Formatter(
+        "%(asctime)s %(levelname)s [{} %(process)d] %(message)s".format(platform.node())))
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+    return handler
@@ -1,8 +1,11 @@
+import logging
 from collections import OrderedDict
 
 from . import parameter_widgets
 from .ui_utils import QtWidgets, QtCore, QtGui, get_app_window, delete_window
 
+log = logging.getLogger(__name__)
+
 
 class ParameterGrid(QtWidgets.QTreeView):
     def __init__(self, *args, **kwargs):
@@ -53,14 +56,14 @@ class ParameterGrid(QtWidgets.QTreeView):
         }
 
         if not isinstance(data, (dict, OrderedDict)):
-            print("data is not of type dict: {}".format(type(data)))
+            log.warning("data is not of type dict: {}".format(type(data)))
             return
 
         for key, val in data.items():
             type_as_str = type(val).__name__
             param_cls = type_param_map.get(type_as_str)
             if not param_cls:
-                print("param_cls not found: {}".format(type_as_str))
+                log.warning("param_cls not found: {}".format(type_as_str))
                 continue
 
             # generate instance
@@ -1,7 +1,11 @@
 # Standard
+import collections
 import functools
+import logging
 import os
 import sys
+import time
+import traceback
 
 if sys.version_info[0] >= 3:
     long = int
@@ -12,6 +16,8 @@ from PySide2 import QtGui
 from PySide2 import QtUiTools
 from PySide2 import QtWidgets
 
+log = logging.getLogger(__name__)
+
 UI_FILES_FOLDER = os.path.dirname(__file__)
 ICON_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), "icons")
 Q_APP = QtWidgets.QApplication.instance()  # type: QtWidgets.QApplication
@@ -57,7 +63,7 @@ def get_app_window():
                 break
 
         if mb_window is None:
-            print("No motionbuilder window instance found")
+            log.warning("No motionbuilder window instance found")
         else:
             return mb_window
 
@@ -65,15 +71,13 @@ def get_app_window():
 
 
 def delete_window(object_to_delete):
-    qApp = QtWidgets.QApplication.instance()
-    if not qApp:
-        return
-
-    for widget in qApp.topLevelWidgets():
-        if "__class__" in dir(widget):
-            if str(widget.__class__) == str(object_to_delete.__class__):
-                widget.deleteLater()
-                widget.close()
+    """Close the live windows of the same class as object_to_delete, see WindowHandler.register_window"""
+    for widget in wh.pop_live_windows(object_to_delete.__class__):
+        try:
+            widget.deleteLater()
+            widget.close()
+        except RuntimeError:  # underlying qt object has already been deleted
+            pass
 
 
 def load_ui_file(ui_file_name):
@@ -91,19 +95,182 @@ def load_ui_file(ui_file_name):
 
 
 def create_qicon(icon_path):
-    icon_path = icon_path.replace("\\", "/")
-    if "/" not in icon_path:
-        icon_path = os.path.join(ICON_FOLDER, icon_path + ".png")  # find in icons folder if not full path
-        if not os.path.exists(icon_path):
+    return icon_cache.get_icon(icon_path)
+
+
+class _IconTask(QtCore.QRunnable):
+    def __init__(self, icon_path, cache):
+        super(_IconTask, self).__init__()
+        self.icon_path = icon_path
+        self.cache = cache
+
+    def run(self):
+        # QImage is safe to use outside the main thread, QPixmap isn't
+        self.cache.image_loaded.emit(self.icon_path, QtGui.QImage(self.icon_path))
+
+
+class IconCache(QtCore.QObject):
+    """
+    Icons shared by every tool and window in the process
+
+    Images can be loaded on a background thread with request_icon.
+    Scaled pixmaps are cached per size bucket (powers of two).
+    Images, icons and pixmaps share one memory budget,
+    the least recently used ones are dropped when they take up more than memory_budget bytes.
+    """
+    image_loaded = QtCore.Signal(str, QtGui.QImage)  # full icon path, loaded image
+
+    min_bucket_size = 16
+    max_bucket_size = 512
+
+    def __init__(self, memory_budget=32 * 1024 * 1024, *args, **kwargs):
+        super(IconCache, self).__init__(*args, **kwargs)
+        self.memory_budget = memory_budget
+
+        self._full_paths = {}  # icon path or name: full path, None if the image doesn't exist
+
+        # least recently used first, (value, size in bytes) for
+        # (full path, "image"): QImage, source of the scaled pixmaps
+        # (full path, "icon"): QIcon
+        # (full path, bucket size): QPixmap
+        self._cache = collections.OrderedDict()
+        self._cache_bytes = 0
+        self._callbacks = {}  # full path: callbacks waiting for the image to load
+
+        self.image_loaded.connect(self._on_image_loaded)
+
+    def get_full_path(self, icon_path):
+        """Full path of an image path or the name of an icon in the icons folder, None if it doesn't exist"""
+        if icon_path not in self._full_paths:
+            full_path = icon_path.replace("\\", "/")
+            if not os.path.isfile(full_path) and "/" not in full_path:
+                full_path = os.path.join(ICON_FOLDER, full_path + ".png")  # find in icons folder if not full path
+            self._full_paths[icon_path] = full_path if os.path.isfile(full_path) else None
+        return self._full_paths[icon_path]
+
+    def get_icon(self, icon_path):
+        """Shared QIcon of icon_path, the image is loaded right away if it isn't cached"""
+        full_path = self.get_full_path(icon_path)
+        if full_path is None:
+            return
+
+        icon = self._get_cached((full_path, "icon"))
+        if icon is None:
+            icon = self._set_image(full_path, QtGui.QImage(full_path))
+        return icon
+
+    def request_icon(self, icon_path, callback):
+        """Load image on a background thread, then call callback with the shared QIcon"""
+        full_path = self.get_full_path(icon_path)
+        if full_path is None:
+            return
+
+        icon = self._get_cached((full_path, "icon"))
+        if icon is not None:
+            callback(icon)
+            return
+
+        # only start one load per image, no matter how many tools use it
+        callbacks = self._callbacks.setdefault(full_path, [])
+        callbacks.append(callback)
+        if len(callbacks) == 1:
+            QtCore.QThreadPool.globalInstance().start(_IconTask(full_path, self))
+
+    def _on_image_loaded(self, full_path, image):
+        icon = self._get_cached((full_path, "icon"))
+        if icon is None:
+            icon = self._set_image(full_path, image)
+
+        for callback in self._callbacks.pop(full_path, []):
+            try:
+                callback(icon)
+            except RuntimeError:  # widget was deleted while the image was loading
+                pass
+
+    def _set_image(self, full_path, image):
+        icon = QtGui.QIcon(QtGui.QPixmap.fromImage(image))
+        image_bytes = self._get_image_bytes(image)
+        self._add_cached((full_path, "image"), image, image_bytes)
+        self._add_cached((full_path, "icon"), icon, image_bytes)  # holds a full size pixmap of the image
+        return icon
+
+    def is_loaded(self, icon_path):
+        return (self.get_full_path(icon_path), "image") in self._cache
+
+    def get_bucket_size(self, size):
+        bucket_size = self.min_bucket_size
+        while bucket_size < size and bucket_size < self.max_bucket_size:
+            bucket_size *= 2
+        return bucket_size
+
+    def get_pixmap(self, icon_path, size):
+        """Pixmap of the image, scaled to the size bucket of size. None while the image is loading"""
+        full_path = self.get_full_path(icon_path)
+        if full_path is None:
+            return
+
+        pixmap_key = (full_path, self.get_bucket_size(size))
+        pixmap = self._get_cached(pixmap_key)
+        if pixmap is not None:
+            return pixmap
+
+        if full_path in self._callbacks:
             return
 
-    return QtGui.QIcon(icon_path)
+        image = self._get_cached((full_path, "image"))
+        if image is None:  # dropped from the cache since it was loaded
+            image = QtGui.QImage(full_path)
+            self._set_image(full_path, image)
+        if image.isNull():
+            return
+
+        bucket_size = pixmap_key[1]
+        pixmap = QtGui.QPixmap.fromImage(image.scaled(bucket_size, bucket_size,
+                                                      QtCore.Qt.KeepAspectRatio,
+                                                      QtCore.Qt.SmoothTransformation))
+        self._add_cached(pixmap_key, pixmap, self._get_image_bytes(pixmap))
+        return pixmap
+
+    @staticmethod
+    def _get_image_bytes(image):
+        """Approximate size of a QImage or QPixmap"""
+        return image.width() * image.height() * max(image.depth() // 8, 1)
+
+    def _get_cached(self, key):
+        cached = self._cache.pop(key, None)
+        if cached is None:
+            return
+        self._cache[key] = cached  # move to most recently used
+        return cached[0]
+
+    def _add_cached(self, key, value, size_bytes):
+        old_cached = self._cache.pop(key, None)
+        if old_cached is not None:
+            self._cache_bytes -= old_cached[1]
+
+        self._cache[key] = (value, size_bytes)
+        self._cache_bytes += size_bytes
+        self._trim_cache()
+
+    def _trim_cache(self):
+        while self._cache_bytes > self.memory_budget and len(self._cache) > 1:
+            _, (_, size_bytes) = self._cache.popitem(last=False)
+            self._cache_bytes -= size_bytes
+
+    def clear(self):
+        self._full_paths.clear()
+        self._cache.clear()
+        self._cache_bytes = 0
+
+
+icon_cache = IconCache()
 
 
 class BaseWindow(QtWidgets.QMainWindow):
     def __init__(self, parent=get_app_window(), ui_file_name=None):
         delete_window(self)
         super(BaseWindow, self).__init__(parent)
+        wh.register_window(self)
 
         self.ui = None
         if ui_file_name:
@@ -139,9 +306,108 @@ QT UTILS END
 """
 
 
+class StagedRestoreQueue(object):
+    """
+    Fills restored windows a bit at a time when the event loop is idle, so the DCC is interactive sooner
+
+    Windows are added as empty shells, then the generators from their iter_staged_restore() are stepped
+    until step_budget milliseconds have passed, visible windows first.
+    """
+
+    def __init__(self, step_budget=10):
+        self.step_budget = step_budget
+        self._pending = collections.OrderedDict()  # window: restore generator
+        self._step_scheduled = False
+
+    def add(self, window, step_budget=None):
+        if step_budget is not None:
+            self.step_budget = step_budget
+
+        self._pending[window] = window.iter_staged_restore()
+        window.destroyed.connect(lambda *args: self.discard(window))
+        self._schedule_step()
+
+    def is_pending(self, window):
+        return window in self._pending
+
+    def discard(self, window):
+        self._pending.pop(window, None)
+
+    def finish(self, window):
+        """Run the remaining restore steps of window right away"""
+        restore_steps = self._pending.pop(window, None)
+        if restore_steps is None:
+            return
+
+        for _ in restore_steps:
+            pass
+
+    def _schedule_step(self):
+        if self._pending and not self._step_scheduled:
+            self._step_scheduled = True
+            QtCore.QTimer.singleShot(0, self._step)
+
+    def _get_next_window(self):
+        for window in list(self._pending.keys()):
+            try:
+                if window.isVisible():
+                    return window
+            except RuntimeError:  # underlying qt object has already been deleted
+                self.discard(window)
+
+        if self._pending:
+            return next(iter(self._pending))
+
+    def _step(self):
+        self._step_scheduled = False
+
+        end_time = time.time() + self.step_budget / 1000.0
+        while self._pending and time.time() < end_time:
+            window = self._get_next_window()
+            if window is None:
+                break
+
+            try:
+                next(self._pending[window])
+            except StopIteration:
+                self.discard(window)
+            except Exception:
+                log.exception("Failed to restore window: {}".format(window))
+                self.discard(window)
+
+        self._schedule_step()
+
+
 class WindowHandler(object):
     windows = {}
     window_index_limit = 100
+    restore_queue = StagedRestoreQueue()
+
+    # live windows per class, so windows can be replaced without scanning all top level widgets
+    live_windows = collections.defaultdict(dict)  # str(window class): {id(window): window}
+
+    def register_window(self, window):
+        """Track window until it's destroyed"""
+        # compare by class string, so windows made before a module reload are still found
+        window_key = str(window.__class__)
+        window_id = id(window)
+        self.live_windows[window_key][window_id] = window
+
+        # don't reference the window itself in the callback, it's being destroyed when this is called
+        window.destroyed.connect(lambda *args: self.unregister_window(window_key, window_id))
+
+    def unregister_window(self, window_key, window_id):
+        class_windows = self.live_windows.get(window_key)
+        if class_windows is None:
+            return
+
+        class_windows.pop(window_id, None)
+        if not class_windows:
+            self.live_windows.pop(window_key)
+
+    def pop_live_windows(self, window_cls):
+        """Stop tracking and return all live windows of window_cls"""
+        return list(self.live_windows.pop(str(window_cls), {}).values())
 
 
 wh = WindowHandler()
@@ -158,6 +424,7 @@ if currently_using_maya:
 
         def __init__(self, parent=None):
             super(DockableWidget, self).__init__(parent=parent)
+            wh.register_window(self)  # so the windows can be found, eg. by the command server
             self.setAttribute(QtCore.Qt.WA_DeleteOnClose, True)
             self.setWindowTitle('Custom Maya Mixin Workspace Control')
             self.window_index = 0
@@ -168,8 +435,16 @@ if currently_using_maya:
 
     def create_dockable_widget(widget_class,
                                restore=False, restore_script="create_dockable_widget(restore=True)",
-                               force_refresh=False, window_index=None
+                               force_refresh=False, window_index=None,
+                               staged_restore=False, restore_step_budget=None
                                ):
+        """
+        :param staged_restore: when restoring, create an empty window and fill it when maya is idle.
+                               widget_class needs to support a 'staged' init argument and iter_staged_restore()
+        :param restore_step_budget: milliseconds of each idle step spent on filling restored windows
+        """
+        staged_restore = restore and staged_restore and hasattr(widget_class, "iter_staged_restore")
+
         if restore:
             # Grab the created workspace control with the following.
             restored_control = omui.MQtUtil.getCurrentParent()
@@ -182,13 +457,16 @@ if currently_using_maya:
                     break
 
             if window_index is None:
-                print("Failed to find free window_index. Has limit: {} been reached?".format(wh.window_index_limit))
+                log.error("Failed to find free window_index. Has limit: {} been reached?".format(wh.window_index_limit))
                 return
 
         restore_script = restore_script.format(window_index)
 
         # widget_instance = wh.__dict__.get(widget_class.docking_object_name)
-        widget_instance = widget_class(window_index=window_index)  # type: DockableWidget
+        if staged_restore:
+            widget_instance = widget_class(window_index=window_index, staged=True)  # type: DockableWidget
+        else:
+            widget_instance = widget_class(window_index=window_index)  # type: DockableWidget
         widget_instance.setObjectName("{}_{}".format(widget_class.docking_object_name, window_index))
         wh.windows[window_index] = widget_instance
 
@@ -196,6 +474,9 @@ if currently_using_maya:
             # Add custom mixin widget to the workspace control
             mixin_ptr = omui.MQtUtil.findControl(widget_instance.objectName())
             omui.MQtUtil.addWidgetToMayaLayout(long(mixin_ptr), long(restored_control))
+
+            if staged_restore:
+                wh.restore_queue.add(widget_instance, step_budget=restore_step_budget)
         else:
             # build from scratch
             workspace_control_name = widget_instance.objectName() + "WorkspaceControl"
@@ -225,6 +506,7 @@ else:
         def __init__(self, parent=get_app_window()):
             delete_window(self)
             super(DockableWidget, self).__init__(parent=parent)
+            wh.register_window(self)
             self.setObjectName(self.docking_object_name)  # this one is important
             self.window_index = 0
 
@@ -234,7 +516,8 @@ else:
 
     def create_dockable_widget(widget_class,
                                restore=False, restore_script="create_dockable_widget(restore=True)",
-                               force_refresh=False, window_index=None
+                               force_refresh=False, window_index=None,
+                               staged_restore=False, restore_step_budget=None
                                ):
 
         existing_app = QtWidgets.QApplication.instance()
@@ -368,13 +651,44 @@ def open_color_picker(current_color=None, color_signal=None):
 class ContentResizeButton(QtWidgets.QPushButton):
     TEXT_PADDING_MULTIPLIER = 0.9
 
+    # icon from the icon cache, see set_icon_path
+    _icon_path = None
+    _icon_bucket_size = None
+
     def resizeEvent(self, event):
         self.update_icon_size()
         self.update_button_text_size()
 
+    def set_icon_path(self, icon_path):
+        """Use shared icon from the icon cache, the image is loaded in the background"""
+        self._icon_path = icon_path
+        self._icon_bucket_size = None
+        icon_cache.request_icon(icon_path, self._on_icon_loaded)
+
+    def _on_icon_loaded(self, icon):
+        self._icon_bucket_size = None
+        self.update_icon_size()
+        self.update_button_text_size()
+
     def update_icon_size(self):
         min_size = min(self.size().width(), self.size().height())
-        self.setIconSize(QtCore.QSize(min_size * 0.9, min_size * 0.9))
+        icon_size = int(min_size * 0.9)
+        self.setIconSize(QtCore.QSize(icon_size, icon_size))
+
+        if self._icon_path is None:
+            return
+
+        # only swap the pixmap when the size moves to another bucket
+        bucket_size = icon_cache.get_bucket_size(icon_size)
+        if bucket_size == self._icon_bucket_size:
+            return
+
+        pixmap = icon_cache.get_pixmap(self._icon_path, icon_size)
+        if pixmap is None:  # still loading
+            return
+
+        self._icon_bucket_size = bucket_size
+        self.setIcon(QtGui.QIcon(pixmap))
 
     def update_button_text_size(self):
         # reset font size so .fontMetrics() make sense